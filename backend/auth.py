@@ -1,12 +1,72 @@
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from typing import Any, Optional
+import base64
+import calendar
+import hashlib
+import hmac
+import struct
+import threading
+import time
+import uuid
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
 from config import settings
-from constants import TEST_USERS
+from constants import TEST_USERS, UserBehavior
+from metrics import TOKEN_CACHE_REQUESTS
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+
+class VerifiedTokenCache:
+    """Bounded LRU of values derived from already-verified tokens.
+
+    Each entry expires at its token's own `exp` claim, so a cached token is
+    never honoured past the moment a full decode would have rejected it.
+    Hits and misses are exported as token_cache_requests_total{cache=name}."""
+
+    def __init__(self, name: str, max_entries: int):
+        self.name = name
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = TOKEN_CACHE_REQUESTS.labels(name, "hit")
+        self._misses = TOKEN_CACHE_REQUESTS.labels(name, "miss")
+
+    def get(self, token: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None:
+                value, expires_at = entry
+                if time.time() < expires_at:
+                    self._entries.move_to_end(token)
+                    self._hits.inc()
+                    return value
+                del self._entries[token]
+        self._misses.inc()
+        return None
+
+    def put(self, token: str, value: Any, expires_at: Optional[float]) -> None:
+        if self.max_entries <= 0 or expires_at is None:
+            return
+        with self._lock:
+            self._entries[token] = (value, float(expires_at))
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Verified JWT payloads, keyed by the raw token string.
+token_cache = VerifiedTokenCache("jwt_payload", settings.token_cache_size)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -35,14 +95,89 @@ def authenticate_user(username: str, password: str) -> dict:
     
     return user
 
+# ---------- compact tokens ----------
+#
+# Our claims are always sub/behavior/sid/exp, so instead of a JWT (JSON
+# header + JSON claims + generic verification) the compact format packs them
+# into a fixed binary layout and signs it with HMAC-SHA256:
+#
+#   "op1." + base64url( body | mac )
+#   body = version:u8 | exp:u32 | behavior:u8 | sid:16 bytes | len:u8 | sub
+#   mac  = first 16 bytes of HMAC-SHA256(compact key, body)
+#
+# The compact key is derived from settings.secret_key, so a compact MAC can
+# never be confused with a JWT signature. decode_access_token accepts both
+# formats whatever Settings.token_format says, so switching format does not
+# invalidate tokens already handed out.
+
+COMPACT_TOKEN_PREFIX = "op1."
+_COMPACT_VERSION = 1
+_COMPACT_HEADER = struct.Struct(">BIB16sB")
+_COMPACT_MAC_SIZE = 16
+# Behaviors are encoded by position: only ever append to UserBehavior.
+_BEHAVIORS = list(UserBehavior)
+_BEHAVIOR_INDEX = {behavior.value: index for index, behavior in enumerate(_BEHAVIORS)}
+_compact_key = hmac.new(settings.secret_key.encode("utf-8"), b"omnipizza-compact-token-v1", hashlib.sha256).digest()
+
+
+def _compact_mac(body: bytes) -> bytes:
+    return hmac.new(_compact_key, body, hashlib.sha256).digest()[:_COMPACT_MAC_SIZE]
+
+
+def create_compact_token(data: dict, expire: datetime) -> str:
+    """Compact token for the {"sub", "behavior", "sid"} login claims."""
+    behavior = data["behavior"]
+    behavior = behavior.value if hasattr(behavior, "value") else str(behavior)
+    username = data["sub"].encode("utf-8")
+    body = _COMPACT_HEADER.pack(
+        _COMPACT_VERSION,
+        calendar.timegm(expire.utctimetuple()),
+        _BEHAVIOR_INDEX[behavior],
+        uuid.UUID(hex=data["sid"]).bytes,
+        len(username),
+    ) + username
+    encoded = base64.urlsafe_b64encode(body + _compact_mac(body)).rstrip(b"=")
+    return COMPACT_TOKEN_PREFIX + encoded.decode("ascii")
+
+
+def decode_compact_token(token: str) -> Optional[dict]:
+    """Claims of a valid, unexpired compact token, or None."""
+    encoded = token[len(COMPACT_TOKEN_PREFIX):]
+    try:
+        raw = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+    except ValueError:
+        return None
+    if len(raw) < _COMPACT_HEADER.size + _COMPACT_MAC_SIZE:
+        return None
+    body, mac = raw[:-_COMPACT_MAC_SIZE], raw[-_COMPACT_MAC_SIZE:]
+    if not hmac.compare_digest(mac, _compact_mac(body)):
+        return None
+
+    version, exp, behavior, sid, length = _COMPACT_HEADER.unpack_from(body)
+    username = body[_COMPACT_HEADER.size:]
+    if version != _COMPACT_VERSION or behavior >= len(_BEHAVIORS) or len(username) != length:
+        return None
+    if exp <= time.time():
+        return None
+    return {
+        "sub": username.decode("utf-8"),
+        "behavior": _BEHAVIORS[behavior].value,
+        "sid": sid.hex(),
+        "exp": exp,
+    }
+
+
 def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
-    """Create JWT access token"""
+    """Create an access token in Settings.token_format ("jwt" | "compact")"""
     to_encode = data.copy()
     
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.access_token_expire_minutes)
+
+    if settings.token_format == "compact":
+        return create_compact_token(to_encode, expire)
     
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
@@ -50,13 +185,28 @@ def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     return encoded_jwt
 
 def decode_access_token(token: str) -> dict:
-    """Decode JWT access token"""
+    """Decode a JWT or compact access token; repeat tokens are served from
+    token_cache without re-running signature and claims verification."""
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
+    if token.startswith(COMPACT_TOKEN_PREFIX):
+        payload = decode_compact_token(token)
+        if payload is not None:
+            token_cache.put(token, payload, payload["exp"])
+            return payload
+        raise _credentials_exception()
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+        token_cache.put(token, payload, payload.get("exp"))
         return payload
     except JWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"}
-        )
+        raise _credentials_exception()
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"}
+    )
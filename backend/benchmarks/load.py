@@ -0,0 +1,344 @@
+"""
+In-process load benchmark for the OmniPizza API
+
+Drives `main.app` through httpx's ASGI transport (no sockets, no server
+process) across the flows our suites exercise: login, catalog per market
+and language, cart seed + read, checkout and order history, once per
+TEST_USERS behavior. Every scenario is measured in --runs separate
+passes over the whole set; each reported statistic is the median across
+passes, so one slow moment on the machine does not move the result.
+Reports throughput and p50/p95/p99 latency per scenario.
+
+    cd backend
+    python -m benchmarks.load                                      # run + print table
+    python -m benchmarks.load --update-baseline --baseline b.json  # record
+    python -m benchmarks.load --check --baseline b.json            # gate
+    python -m benchmarks.load -k catalog -n 500                    # subset, more samples
+
+The gate compares flows, not single scenarios, and not milliseconds:
+  - every scenario is bracketed by a calibration workload (fixed JSON and
+    sort work that imports nothing from the app), and its p95 is recorded
+    in those units, so a machine that is slower or busier than the one
+    that recorded the baseline moves the unit, not the score;
+  - a flow's score (login, catalog, cart_seed, cart_read, checkout,
+    order_history) is the geometric mean of its scenarios' scores across
+    behaviors and markets. Single-scenario p95s at concurrency 8 move by
+    up to ~2x between clean runs; flow scores stayed within ~13%, so the
+    default 30% tolerance catches a 30-50% regression of any flow without
+    flaking.
+--check fails when a flow's score grows past the tolerance, or when any
+scenario gets an unexpected status code. Baselines are not committed:
+record one on the machine that runs the gate (typically from the target
+branch, just before checking the candidate) and pass it with --baseline.
+
+Chaos latency (performance_glitch_user's delay) is zeroed unless
+--chaos-latency is passed, so the numbers measure server work, not sleeps.
+"""
+
+import argparse
+import asyncio
+import fnmatch
+import json
+import math
+import os
+import statistics
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from benchmarks.common import environment, read_json, summarize, write_json
+
+PASSWORD = "pizza123"
+MARKET_LANGUAGES = {"MX": ["es", "en"], "US": ["en"], "CH": ["de", "fr"], "JP": ["ja"], "SA": ["ar"]}
+CHECKOUT_BODY = {
+    "country_code": "MX",
+    "items": [{"pizza_id": "p01", "quantity": 2, "size": "large", "toppings": ["bacon"]}],
+    "name": "Bench User",
+    "address": "Av. Reforma 123",
+    "phone": "5512345678",
+    "colonia": "Centro",
+    "propina": 10,
+}
+# Calibration workload: pure Python, nothing from the app, roughly the mix
+# of work a request does (dict building, JSON, sorting).
+CALIBRATION_PAYLOAD = [
+    {"id": f"p{i:03}", "name": {"en": f"Pizza {i}", "es": f"Pizza {i}"}, "price": i * 1.25, "tags": list(range(i % 7))}
+    for i in range(200)
+]
+CART_BODY = {"items": [{"pizza_id": "p01", "quantity": 2, "size": "medium"}, {"pizza_id": "p03", "quantity": 1}]}
+
+
+class Scenario:
+    def __init__(
+        self,
+        name: str,
+        call: Callable[[Any], Awaitable[Any]],
+        expected_status: tuple = (200,),
+    ):
+        self.name = name
+        self.call = call
+        self.expected_status = expected_status
+
+
+def build_scenarios(tokens: Dict[str, Dict[str, Any]]) -> List[Scenario]:
+    from constants import TEST_USERS
+
+    scenarios: List[Scenario] = []
+    for username, user in TEST_USERS.items():
+        behavior = user["behavior"].value
+        if behavior == "locked_out":
+            scenarios.append(Scenario(
+                f"{behavior}/login",
+                lambda client, u=username: client.post("/api/auth/login", json={"username": u, "password": PASSWORD}),
+                expected_status=(403,),
+            ))
+            continue
+
+        auth = {"Authorization": f"Bearer {tokens[username]['access_token']}"}
+        scenarios.append(Scenario(
+            f"{behavior}/login",
+            lambda client, u=username: client.post("/api/auth/login", json={"username": u, "password": PASSWORD}),
+        ))
+        for country, languages in MARKET_LANGUAGES.items():
+            for lang in languages:
+                headers = {**auth, "X-Country-Code": country, "X-Language": lang}
+                scenarios.append(Scenario(
+                    f"{behavior}/catalog/{country}/{lang}",
+                    lambda client, h=headers: client.get("/api/pizzas", headers=h),
+                ))
+        scenarios.append(Scenario(
+            f"{behavior}/cart_seed",
+            lambda client, h=auth: client.post("/api/cart", json=CART_BODY, headers=h),
+        ))
+        scenarios.append(Scenario(
+            f"{behavior}/cart_read",
+            lambda client, h={**auth, "X-Country-Code": "MX"}: client.get("/api/cart", headers=h),
+        ))
+        # error_user / security_glitch_user fail half their checkouts on purpose.
+        checkout_status = (200, 500) if behavior in ("error", "security_glitch") else (200,)
+        scenarios.append(Scenario(
+            f"{behavior}/checkout",
+            lambda client, h=auth: client.post("/api/checkout", json=CHECKOUT_BODY, headers=h),
+            expected_status=checkout_status,
+        ))
+        scenarios.append(Scenario(
+            f"{behavior}/order_history",
+            lambda client, h=auth: client.get("/api/orders", params={"limit": 50}, headers=h),
+        ))
+    return scenarios
+
+
+def calibration_ms(repeats: int = 31) -> float:
+    """Median time of the fixed calibration workload, in milliseconds."""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(5):
+            json.loads(json.dumps(CALIBRATION_PAYLOAD))
+            sorted(CALIBRATION_PAYLOAD, key=lambda pizza: pizza["price"], reverse=True)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def flow_of(name: str) -> str:
+    """"standard/catalog/MX/es" -> "catalog"."""
+    return name.split("/")[1]
+
+
+async def run_scenario(client, scenario: Scenario, iterations: int, concurrency: int, warmup: int) -> Dict[str, Any]:
+    for _ in range(warmup):
+        await scenario.call(client)
+    unit_before = calibration_ms()
+
+    samples: List[float] = []
+    unexpected: Dict[int, int] = {}
+    remaining = iterations
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            response = await scenario.call(client)
+            samples.append(time.perf_counter() - start)
+            if response.status_code not in scenario.expected_status:
+                unexpected[response.status_code] = unexpected.get(response.status_code, 0) + 1
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - wall_start
+
+    result = summarize(samples)
+    result["unit_ms"] = (unit_before + calibration_ms()) / 2
+    result["p95_units"] = result["p95_ms"] / result["unit_ms"]
+    result["throughput_rps"] = len(samples) / wall if wall > 0 else 0.0
+    result["unexpected_status"] = {str(k): v for k, v in unexpected.items()}
+    return result
+
+
+def combine_runs(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """One scenario's runs as one result: the median of each statistic
+    across runs, with every run's p95 kept in `p95_ms_runs`."""
+    combined: Dict[str, Any] = {
+        key: statistics.median(run[key] for run in runs)
+        for key in ("mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms", "throughput_rps", "unit_ms", "p95_units")
+    }
+    combined["count"] = sum(run["count"] for run in runs)
+    combined["p95_ms_runs"] = [run["p95_ms"] for run in runs]
+    unexpected: Dict[str, int] = {}
+    for run in runs:
+        for code, count in run["unexpected_status"].items():
+            unexpected[code] = unexpected.get(code, 0) + count
+    combined["unexpected_status"] = unexpected
+    return combined
+
+
+async def run(args) -> Dict[str, Dict[str, Any]]:
+    import httpx
+    from constants import TEST_USERS
+    from main import app
+
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            tokens = {}
+            for username, user in TEST_USERS.items():
+                if user["behavior"].value == "locked_out":
+                    continue
+                response = await client.post("/api/auth/login", json={"username": username, "password": PASSWORD})
+                tokens[username] = response.json()
+
+            scenarios = [
+                scenario for scenario in build_scenarios(tokens)
+                if not args.k or any(fnmatch.fnmatch(scenario.name, f"*{pattern}*") for pattern in args.k)
+            ]
+            # Whole passes, not back-to-back repeats: a scenario's runs are
+            # a pass apart, so a noisy stretch hits one run of many scenarios
+            # rather than every run of one.
+            passes: Dict[str, List[Dict[str, Any]]] = {scenario.name: [] for scenario in scenarios}
+            for _ in range(args.runs):
+                for scenario in scenarios:
+                    passes[scenario.name].append(await run_scenario(
+                        client, scenario, args.iterations, args.concurrency, args.warmup
+                    ))
+
+            results = {}
+            for name, runs in passes.items():
+                results[name] = combine_runs(runs)
+                if not args.quiet:
+                    print_row(name, results[name])
+            return results
+    finally:
+        await app.router.shutdown()
+
+
+def print_header() -> None:
+    print(f"{'scenario':44} {'n':>6} {'rps':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'p95 u':>7}")
+
+
+def print_row(name: str, result: Dict[str, Any]) -> None:
+    flag = "  unexpected=" + json.dumps(result["unexpected_status"]) if result["unexpected_status"] else ""
+    print(
+        f"{name:44} {result['count']:>6} {result['throughput_rps']:>9.0f} "
+        f"{result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+        f"{result['p95_units']:>7.2f}{flag}"
+    )
+
+
+def flow_scores(scenarios: Dict[str, Dict[str, Any]], names) -> Dict[str, float]:
+    """Geometric mean of p95_units per flow, over the scenarios in `names`."""
+    logs: Dict[str, List[float]] = {}
+    for name in names:
+        logs.setdefault(flow_of(name), []).append(math.log(scenarios[name]["p95_units"]))
+    return {flow: math.exp(statistics.mean(values)) for flow, values in logs.items()}
+
+
+def check_regressions(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    tolerance: float,
+) -> List[str]:
+    """Flows whose score grew by more than `tolerance` (fraction) over the
+    baseline, comparing only scenarios both runs have; unexpected status
+    codes always fail."""
+    failures = [
+        f"{name}: unexpected status codes {result['unexpected_status']}"
+        for name, result in results.items() if result["unexpected_status"]
+    ]
+    shared = [name for name in results if name in baseline]
+    current, reference = flow_scores(results, shared), flow_scores(baseline, shared)
+    for flow, score in current.items():
+        if score > reference[flow] * (1 + tolerance):
+            failures.append(
+                f"{flow}: p95 score {score:.2f} > baseline {reference[flow]:.2f} "
+                f"(+{score / reference[flow] - 1:.0%}, +{tolerance:.0%} allowed)"
+            )
+    return failures
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--iterations", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="concurrent in-flight requests")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per scenario")
+    parser.add_argument("--runs", type=int, default=3, help="passes over the scenarios; results are medians across them")
+    parser.add_argument("-k", action="append", help="only scenarios whose name contains this (repeatable)")
+    parser.add_argument("--baseline", help="baseline JSON path (required by --check / --update-baseline)")
+    parser.add_argument("--check", action="store_true", help="exit 1 if a flow regresses past the baseline")
+    parser.add_argument("--update-baseline", action="store_true", help="write these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed flow score growth, as a fraction")
+    parser.add_argument("--output", help="also write the full results JSON here")
+    parser.add_argument("--chaos-latency", action="store_true", help="keep performance_glitch_user's injected delay")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args(argv)
+    if (args.check or args.update_baseline) and not args.baseline:
+        parser.error("--check and --update-baseline need --baseline PATH")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    if not args.chaos_latency:
+        # Must be set before config.Settings is first imported.
+        os.environ["LATENCY_PROFILES"] = json.dumps({"performance_glitch": {"distribution": "fixed", "seconds": 0}})
+
+    if not args.quiet:
+        print_header()
+    results = asyncio.run(run(args))
+
+    payload = {"environment": environment(), "config": {
+        "iterations": args.iterations, "concurrency": args.concurrency, "warmup": args.warmup,
+        "runs": args.runs,
+    }, "scenarios": results}
+    if args.output:
+        write_json(args.output, payload)
+    if args.update_baseline:
+        write_json(args.baseline, payload)
+        print(f"baseline written to {args.baseline}")
+
+    if args.check:
+        if not os.path.exists(args.baseline):
+            print(f"no baseline at {args.baseline}; run with --update-baseline first")
+            return 1
+        baseline = read_json(args.baseline)
+        if baseline.get("config") != payload["config"]:
+            print(f"warning: baseline recorded with {baseline.get('config')}, not {payload['config']}")
+        failures = check_regressions(results, baseline["scenarios"], args.tolerance)
+        if not args.quiet:
+            shared = [name for name in results if name in baseline["scenarios"]]
+            reference = flow_scores(baseline["scenarios"], shared)
+            print(f"\n{'flow':16} {'baseline':>9} {'current':>9} {'change':>8}")
+            for flow, score in flow_scores(results, shared).items():
+                print(f"{flow:16} {reference[flow]:>9.2f} {score:>9.2f} {score / reference[flow] - 1:>+8.0%}")
+        if failures:
+            print("\nREGRESSIONS:")
+            for failure in failures:
+                print(f"  {failure}")
+            return 1
+        print(f"\nno regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+"""
+Microbenchmarks for the InMemoryDB hot functions
+
+Times get_catalog, get_enriched_cart, calculate_order_total, create_order
+and get_user_orders (full history and one page) directly, without HTTP,
+across catalog sizes, cart sizes and order-store sizes. Results are
+written as JSON so runs can be compared over time.
+
+    cd backend
+    python -m benchmarks.micro                          # full matrix, up to 1M orders
+    python -m benchmarks.micro --quick                  # small sizes, a few seconds
+    python -m benchmarks.micro -k user_orders --store-sizes 0,1000000
+    python -m benchmarks.micro --output results/micro-$(git rev-parse --short HEAD).json
+
+Each case is timed like `timeit`: the loop count is calibrated so one
+repeat takes at least --min-time seconds, the GC is disabled while
+timing, and per-call min/median/mean/stdev are reported over --repeat
+repeats. Compare `min_us` between runs; it is the least noisy figure.
+"""
+
+import argparse
+import contextlib
+import fnmatch
+import gc
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.common import BACKEND_DIR, environment, write_json
+
+DEFAULT_OUTPUT = os.path.join(BACKEND_DIR, "benchmarks", "results", "micro.json")
+CATALOG_SIZES = [15, 150, 1500]
+CART_SIZES = [1, 10, 100, 1000]
+STORE_SIZES = [0, 10_000, 100_000, 1_000_000]
+HISTORY_SIZES = [10, 100, 1000]
+SIZES = ["small", "medium", "large", "family"]
+TOPPINGS = ["bacon", "extra_cheese", "mushrooms", "onion"]
+COUNTRIES = ["MX", "US", "CH", "JP", "SA"]
+BEHAVIORS = ["standard", "problem", "a11y_glitch"]
+POPULATION_USERS = 10_000
+
+
+# ---------- timing ----------
+
+def measure(fn: Callable[[], Any], repeat: int, min_time: float) -> Dict[str, Any]:
+    number = 1
+    while True:
+        elapsed = _time_loop(fn, number)
+        if elapsed >= min_time or number >= 1 << 24:
+            break
+        number *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    per_call = [_time_loop(fn, number) / number * 1e6 for _ in range(repeat)]
+    return {
+        "number": number,
+        "repeat": repeat,
+        "min_us": min(per_call),
+        "median_us": statistics.median(per_call),
+        "mean_us": statistics.fmean(per_call),
+        "stdev_us": statistics.stdev(per_call) if len(per_call) > 1 else 0.0,
+    }
+
+
+def _time_loop(fn: Callable[[], Any], number: int) -> float:
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        return time.perf_counter() - start
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+# ---------- fixtures ----------
+
+@contextlib.contextmanager
+def synthetic_catalog(size: int):
+    """Swap in a catalog of `size` pizzas (copies of the real ones under new
+    ids) for every module that reads it, and restore the original after."""
+    import catalog_cache
+    import constants
+
+    original = list(constants.PIZZA_CATALOG)
+    catalog = []
+    for index in range(size):
+        pizza = dict(original[index % len(original)])
+        pizza["id"] = f"p{index + 1:02d}" if index < len(original) else f"bench{index:05d}"
+        catalog.append(pizza)
+
+    catalog_cache.replace_catalog(catalog)
+    try:
+        yield catalog
+    finally:
+        catalog_cache.replace_catalog(original)
+
+
+def make_cart(size: int, catalog: List[Dict[str, Any]], rng: random.Random) -> List[Dict[str, Any]]:
+    return [
+        {
+            "pizza_id": rng.choice(catalog)["id"],
+            "quantity": rng.randint(1, 5),
+            "size": rng.choice(SIZES),
+            "toppings": rng.sample(TOPPINGS, rng.randint(0, 2)),
+        }
+        for _ in range(size)
+    ]
+
+
+def make_order(username: str, country_code: str, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # Shape of routers.checkout._build_order_data; totals are placeholders
+    # since only storage cost matters here.
+    return {
+        "username": username,
+        "country_code": country_code,
+        "items": items,
+        "customer_info": {"name": "Bench User", "address": "Av. Reforma 123", "phone": "5512345678"},
+        "subtotal": 100.0,
+        "delivery_fee": 2.5,
+        "tax_rate": 0.16,
+        "tip_percentage": 10.0,
+        "tax": 16.0,
+        "tip": 10.0,
+        "total": 128.5,
+        "currency": "MXN",
+    }
+
+
+def fresh_db(storage_name: str, tmpdir: str):
+    from database import InMemoryDB
+    from storage import MemoryStorage, RetentionPolicy, SQLiteStorage
+
+    # No retention: the store must hold exactly the population we build.
+    if storage_name == "sqlite":
+        path = os.path.join(tmpdir, f"micro-{time.time_ns()}.db")
+        return InMemoryDB(SQLiteStorage(path, RetentionPolicy()))
+    return InMemoryDB(MemoryStorage(RetentionPolicy()))
+
+
+def populate(db, count: int, rng: random.Random, batch: int = 10_000) -> None:
+    """`count` orders spread over POPULATION_USERS users. Orders share one
+    items list to keep a million of them within a few hundred MB."""
+    from constants import PIZZA_CATALOG
+
+    items = make_cart(2, PIZZA_CATALOG, rng)
+    for start in range(0, count, batch):
+        db.create_orders([
+            make_order(f"user{rng.randrange(POPULATION_USERS):05d}", rng.choice(COUNTRIES), items)
+            for _ in range(min(batch, count - start))
+        ])
+
+
+# ---------- suites ----------
+
+def bench_catalog(args, emit) -> None:
+    from constants import CountryCode
+
+    for catalog_size in args.catalog_sizes:
+        with synthetic_catalog(catalog_size):
+            for behavior in BEHAVIORS:
+                for country in ("MX", "JP"):
+                    db = fresh_db("memory", args.tmpdir)
+                    code = CountryCode(country)
+                    emit(
+                        "get_catalog",
+                        {"catalog_size": catalog_size, "behavior": behavior, "country": country},
+                        lambda: db.get_catalog(code, behavior, None),
+                    )
+
+
+def bench_cart(args, emit) -> None:
+    from constants import CountryCode
+
+    rng = random.Random(args.seed)
+    for catalog_size in args.catalog_sizes:
+        with synthetic_catalog(catalog_size) as catalog:
+            for cart_size in args.cart_sizes:
+                cart = make_cart(cart_size, catalog, rng)
+                db = fresh_db("memory", args.tmpdir)
+                db.set_test_cart("bench_user", cart)
+                for behavior in ("standard", "a11y_glitch"):
+                    emit(
+                        "get_enriched_cart",
+                        {"catalog_size": catalog_size, "cart_size": cart_size, "behavior": behavior},
+                        lambda: db.get_enriched_cart("bench_user", CountryCode.MX, behavior, None),
+                    )
+                for country in ("MX", "JP"):
+                    code = CountryCode(country)
+                    emit(
+                        "calculate_order_total",
+                        {"catalog_size": catalog_size, "cart_size": cart_size, "country": country},
+                        lambda: db.calculate_order_total(cart, code, 10.0),
+                    )
+
+
+def bench_orders(args, emit) -> None:
+    from constants import PIZZA_CATALOG
+
+    rng = random.Random(args.seed)
+    for store_size in args.store_sizes:
+        db = fresh_db(args.storage, args.tmpdir)
+        build_start = time.perf_counter()
+        populate(db, store_size, rng)
+        build_seconds = time.perf_counter() - build_start
+
+        items = make_cart(2, PIZZA_CATALOG, rng)
+        histories = {}
+        for history in args.history_sizes:
+            username = f"history{history}"
+            for _ in range(history):
+                db.create_order(make_order(username, "MX", items))
+            histories[history] = username
+
+        base = {"storage": args.storage, "store_size": store_size, "populate_seconds": round(build_seconds, 3)}
+        emit(
+            "create_order",
+            base,
+            lambda: db.create_order(make_order("bench_user", "MX", items)),
+        )
+        for history, username in histories.items():
+            emit(
+                "get_user_orders",
+                {**base, "user_orders": history},
+                lambda: db.get_user_orders(username),
+            )
+            emit(
+                "get_user_orders_page",
+                {**base, "user_orders": history, "limit": 50},
+                lambda: db.get_user_orders_page(username, 50, None),
+            )
+        del db
+        gc.collect()
+
+
+SUITES = {"catalog": bench_catalog, "cart": bench_cart, "orders": bench_orders}
+
+
+# ---------- entry point ----------
+
+def _sizes(value: str) -> List[int]:
+    return [int(part.replace("_", "")) for part in value.split(",") if part]
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suite", action="append", choices=sorted(SUITES), help="suites to run (default: all)")
+    parser.add_argument("-k", action="append", help="only cases whose name contains this (repeatable)")
+    parser.add_argument("--catalog-sizes", type=_sizes, default=CATALOG_SIZES)
+    parser.add_argument("--cart-sizes", type=_sizes, default=CART_SIZES)
+    parser.add_argument("--store-sizes", type=_sizes, default=STORE_SIZES)
+    parser.add_argument("--history-sizes", type=_sizes, default=HISTORY_SIZES)
+    parser.add_argument("--storage", choices=["memory", "sqlite"], default="memory", help="backend for the orders suite")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.05, help="minimum seconds per repeat")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--quick", action="store_true", help="small sizes only, for a smoke run")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="results JSON path")
+    parser.add_argument("--tmpdir", default=None, help="directory for SQLite files (default: system temp)")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.catalog_sizes = [15]
+        args.cart_sizes = [1, 100]
+        args.store_sizes = [0, 10_000]
+        args.history_sizes = [100]
+        args.repeat = 3
+        args.min_time = 0.01
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import tempfile
+
+    args = parse_args(argv)
+    random.seed(args.seed)  # a11y_glitch picks its mode with the global RNG
+    results: List[Dict[str, Any]] = []
+
+    def emit(name: str, params: Dict[str, Any], fn: Callable[[], Any]) -> None:
+        if args.k and not any(fnmatch.fnmatch(name, f"*{pattern}*") for pattern in args.k):
+            return
+        timing = measure(fn, args.repeat, args.min_time)
+        results.append({"name": name, "params": params, **timing})
+        label = " ".join(f"{key}={value}" for key, value in params.items() if key != "populate_seconds")
+        print(f"{name:24} {label:62} {timing['min_us']:>12.2f} us  (median {timing['median_us']:.2f})")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        args.tmpdir = args.tmpdir or tmpdir
+        for suite in args.suite or list(SUITES):
+            SUITES[suite](args, emit)
+
+    write_json(args.output, {
+        "environment": environment(),
+        "generated_at": datetime.utcnow().isoformat(),
+        "config": {
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "min_time": args.min_time,
+            "storage": args.storage,
+        },
+        "results": results,
+    })
+    print(f"results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+import asyncio
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import anyio.to_thread
+from prometheus_client import Counter, Gauge
+from starlette.responses import JSONResponse
+
+from config import settings
+from constants import BULKHEADS
+from middleware import peek_behavior
+from server_timing import phase
+
+# Admission control per test-user behavior.
+#
+# Every request on a worker shares one event loop and one threadpool, so a
+# burst of performance_glitch_user or chaos traffic would otherwise queue in
+# front of standard_user requests. Each behavior gets its own bulkhead: a
+# concurrency limit plus a bounded wait queue. Past the limit a request
+# waits in its own bulkhead's queue only; past the queue it is refused at
+# once with 429, and a wait longer than queue_timeout ends in 503. Either
+# way the client gets Retry-After, and the other bulkheads are untouched.
+#
+# An admitted request holds at most one threadpool thread at a time (sync
+# routes, SQLite calls), so isolation also needs a thread for every slot:
+# size_threadpool() raises AnyIO's default limit of 40 to the sum of the
+# bulkhead limits at startup. Otherwise 40 glitch requests could take every
+# thread and standard_user requests, though admitted, would queue for one.
+
+BULKHEAD_IN_FLIGHT = Gauge(
+    'bulkhead_in_flight', 'Requests admitted and running, per bulkhead',
+    ['bulkhead'],
+)
+BULKHEAD_QUEUE_DEPTH = Gauge(
+    'bulkhead_queue_depth', 'Requests waiting for admission, per bulkhead',
+    ['bulkhead'],
+)
+BULKHEAD_REJECTIONS = Counter(
+    'bulkhead_rejections_total', 'Requests refused by admission control',
+    ['bulkhead', 'reason'],
+)
+
+# Routes that chaos clients call to hurt the server; they share one bulkhead
+# whoever calls them.
+CHAOS_PATHS = frozenset({"/api/debug/latency-spike", "/api/debug/cpu-load"})
+# Never queued or refused: probes and scrapes must work under overload.
+EXEMPT_PATHS = frozenset({"/health", "/ready", "/api/debug/metrics"})
+
+
+class Rejected(Exception):
+    def __init__(self, status_code: int, reason: str):
+        self.status_code = status_code
+        self.reason = reason
+
+
+class Bulkhead:
+    """Concurrency limit with a bounded FIFO wait queue. Not thread-safe:
+    used from the event loop only."""
+
+    def __init__(self, name: str, limit: int, queue: int = 0,
+                 queue_timeout: float = 0.0, retry_after: int = 1):
+        self.name = name
+        self.limit = limit
+        self.queue = queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self._waiters: deque = deque()
+        self._in_flight_gauge = BULKHEAD_IN_FLIGHT.labels(name)
+        self._queue_gauge = BULKHEAD_QUEUE_DEPTH.labels(name)
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def _update_gauges(self) -> None:
+        self._in_flight_gauge.set(self.in_flight)
+        self._queue_gauge.set(len(self._waiters))
+
+    def _reject(self, status_code: int, reason: str) -> Rejected:
+        BULKHEAD_REJECTIONS.labels(self.name, reason).inc()
+        return Rejected(status_code, reason)
+
+    async def acquire(self) -> None:
+        """Take a slot, waiting in the queue if needed; raises Rejected."""
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            self._update_gauges()
+            return
+        if len(self._waiters) >= self.queue:
+            raise self._reject(429, "queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._update_gauges()
+        try:
+            await asyncio.wait((waiter,), timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            if waiter.done():
+                # The slot was handed over as we were cancelled: pass it on.
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+                self._update_gauges()
+            raise
+        if waiter.done():
+            # release() popped us and transferred its slot; in_flight unchanged.
+            return
+        self._waiters.remove(waiter)
+        self._update_gauges()
+        raise self._reject(503, "queue_timeout")
+
+    def release(self) -> None:
+        """Free a slot, handing it straight to the oldest waiter if any."""
+        if self._waiters:
+            self._waiters.popleft().set_result(None)
+        else:
+            self.in_flight -= 1
+        self._update_gauges()
+
+
+def _merged_bulkheads() -> Dict[str, Dict[str, Any]]:
+    """Built-in BULKHEADS overlaid with `settings.bulkheads` (env
+    `BULKHEADS` as JSON), bucket by bucket."""
+    merged = {name: dict(spec) for name, spec in BULKHEADS.items()}
+    for name, spec in settings.bulkheads.items():
+        merged[name] = {**merged.get(name, merged["default"]), **spec}
+    return merged
+
+
+_SPECS = _merged_bulkheads()
+_bulkheads: Dict[str, Bulkhead] = {}
+
+
+def get_bulkhead(name: str) -> Bulkhead:
+    """The bulkhead for `name`; behaviors without their own spec share the
+    "default" one."""
+    if name not in _SPECS:
+        name = "default"
+    bulkhead = _bulkheads.get(name)
+    if bulkhead is None:
+        bulkhead = _bulkheads[name] = Bulkhead(name, **_SPECS[name])
+    return bulkhead
+
+
+def size_threadpool() -> int:
+    """Let the shared threadpool run one call per bulkhead slot; never
+    shrinks it. Call on the running loop: AnyIO keeps one limiter per loop.
+    Returns the resulting thread limit."""
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    if settings.bulkheads_enabled:
+        limiter.total_tokens = max(limiter.total_tokens, sum(spec["limit"] for spec in _SPECS.values()))
+    return limiter.total_tokens
+
+
+def _bearer_token(headers) -> Optional[str]:
+    for name, value in headers:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            return token.strip() if scheme.lower() == "bearer" and token else None
+    return None
+
+
+def classify(scope) -> Optional[str]:
+    """Bulkhead name for an HTTP scope, or None when it is exempt."""
+    path = scope["path"]
+    if path in EXEMPT_PATHS:
+        return None
+    if path in CHAOS_PATHS:
+        return "chaos"
+    token = _bearer_token(scope.get("headers") or ())
+    behavior = peek_behavior(token) if token else None
+    if behavior is None:
+        return "anonymous"
+    # Early, so metrics label requests refused before get_current_user runs.
+    scope.setdefault("state", {})["behavior"] = behavior
+    return behavior.value if hasattr(behavior, "value") else str(behavior)
+
+
+class BulkheadMiddleware:
+    """Pure ASGI middleware: holds a bulkhead slot for the whole request,
+    including a streamed body."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.bulkheads_enabled:
+            await self.app(scope, receive, send)
+            return
+        with phase("admission", "admission.classify"):
+            name = classify(scope)
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        bulkhead = get_bulkhead(name)
+        try:
+            with phase("admission", f"admission.{name}"):
+                await bulkhead.acquire()
+        except Rejected as exc:
+            response = JSONResponse(
+                status_code=exc.status_code,
+                content={
+                    "error": f"Server busy for {bulkhead.name} requests ({exc.reason})",
+                    "status_code": exc.status_code,
+                    "timestamp": datetime.utcnow().isoformat()
+                },
+                headers={"Retry-After": str(bulkhead.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            bulkhead.release()
@@ -0,0 +1,228 @@
+import hashlib
+import json
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import TypeAdapter
+
+import constants
+from catalog_store import CatalogStore
+from constants import COUNTRY_CONFIG, CURRENCY_RATES, PIZZA_CATALOG, CountryCode
+from compression import CompressedVariants
+import database
+from database import db, _resolve_language
+from http_cache import body_etag
+from models import CountryInfo, PizzaResponse
+import pricing
+
+# Pre-rendered /api/pizzas bodies, one per (country, language, variant).
+# get_catalog() is deterministic for every behavior except a11y_glitch (which
+# picks a random failure mode per call), and every deterministic behavior
+# other than problem_user renders exactly what standard_user sees. So the
+# whole cacheable space is 5 countries x N languages x {standard, problem},
+# each stored as the final JSON bytes — a hit skips the catalog copy, the
+# translation, the price conversion and the PizzaResponse validation.
+# The /api/countries body depends on the same config and is kept here too.
+# Each body carries its strong ETag, hashed once at render time, and its
+# gzip/brotli variants, compressed once on first request (compression.py).
+# Filtered and paged requests (?category=, ?q=, ?limit=, ?cursor=) go
+# through the indexed CatalogStore (catalog_store.py) instead, built here
+# once per catalog version.
+
+CatalogKey = Tuple[str, str, str]
+
+
+class CachedBody(CompressedVariants):
+    def __init__(self, body: bytes):
+        super().__init__(body, body_etag(body))
+
+
+_lock = threading.Lock()
+_bodies: Dict[CatalogKey, CachedBody] = {}
+_countries: Optional[CachedBody] = None
+_store: Optional[CatalogStore] = None
+_version = 0
+_COUNTRY_LIST = TypeAdapter(List[CountryInfo])
+
+
+def _fingerprint() -> str:
+    # Same across workers and restarts for the same catalog/config, so
+    # ETags built on it stay valid after a redeploy that changed nothing.
+    source = json.dumps(
+        [PIZZA_CATALOG, COUNTRY_CONFIG, CURRENCY_RATES],
+        sort_keys=True, default=str, ensure_ascii=False,
+    )
+    return hashlib.blake2b(source.encode("utf-8"), digest_size=8).hexdigest()
+
+
+_content_version = _fingerprint()
+
+
+def _catalog_languages():
+    langs = set()
+    for pizza in PIZZA_CATALOG:
+        for field in ("name", "description"):
+            value = pizza.get(field)
+            if isinstance(value, dict):
+                langs.update(value.keys())
+    return langs or {"en"}
+
+
+_LANGUAGES = _catalog_languages()
+
+
+def _variant(behavior) -> Optional[str]:
+    behavior = behavior.value if hasattr(behavior, "value") else str(behavior)
+    if behavior == "a11y_glitch":
+        return None
+    return "problem" if behavior == "problem" else "standard"
+
+
+def cache_key(country_code: CountryCode, behavior, language: Optional[str]) -> Optional[CatalogKey]:
+    """Key for the pre-rendered body, or None when the response is not
+    deterministic. Unknown languages resolve to the "en" fallback, so junk
+    X-Language values share one entry instead of growing the cache."""
+    variant = _variant(behavior)
+    if variant is None:
+        return None
+    lang = _resolve_language(country_code, language)
+    if lang not in _LANGUAGES:
+        lang = "en"
+    return (country_code.value, lang, variant)
+
+
+def _render(key: CatalogKey) -> bytes:
+    country_value, lang, variant = key
+    country = CountryCode(country_value)
+    catalog = db.get_catalog(country_code=country, behavior=variant, language=lang)
+    response = PizzaResponse(
+        pizzas=catalog,
+        country_code=country.value,
+        currency=COUNTRY_CONFIG[country]["currency"],
+    )
+    return response.model_dump_json().encode("utf-8")
+
+
+def get_catalog_entry(country_code: CountryCode, behavior, language: Optional[str]) -> Optional[CachedBody]:
+    """Serialized PizzaResponse (and its ETag) for this request, rendered on
+    first use. Returns None for non-deterministic (a11y_glitch) requests."""
+    key = cache_key(country_code, behavior, language)
+    if key is None:
+        return None
+    entry = _bodies.get(key)
+    if entry is None:
+        with _lock:
+            entry = _bodies.get(key)
+            if entry is None:
+                entry = CachedBody(_render(key))
+                _bodies[key] = entry
+    return entry
+
+
+def get_store() -> CatalogStore:
+    """Category and text indexes over PIZZA_CATALOG, built on first use."""
+    global _store
+    store = _store
+    if store is None:
+        with _lock:
+            if _store is None:
+                _store = CatalogStore(PIZZA_CATALOG)
+            store = _store
+    return store
+
+
+def get_catalog_body(country_code: CountryCode, behavior, language: Optional[str]) -> Optional[bytes]:
+    entry = get_catalog_entry(country_code, behavior, language)
+    return entry.body if entry is not None else None
+
+
+def _country_infos() -> List[CountryInfo]:
+    countries = []
+    for code, config in COUNTRY_CONFIG.items():
+        decimal_places = config.get("decimal_places", 2)
+
+        countries.append(CountryInfo(
+            code=code.value,
+            currency=config["currency"],
+            currency_symbol=config["currency_symbol"],
+            required_fields=config["required_fields"],
+            optional_fields=config["optional_fields"],
+            tip_field=config["tip_field"],
+            tip_mode="percentage",
+            tip_percentages=config["tip_percentages"],
+            tax_rate=config["tax_rate"],
+            delivery_fee=pricing.convert_usd_amount(
+                config["delivery_fee_usd"],
+                CURRENCY_RATES[config["currency"]],
+                decimal_places,
+            ),
+            languages=config["languages"],
+            decimal_places=decimal_places
+        ))
+    return countries
+
+
+def get_countries_entry() -> CachedBody:
+    """Serialized List[CountryInfo] for /api/countries, rendered on first use."""
+    global _countries
+    entry = _countries
+    if entry is None:
+        with _lock:
+            if _countries is None:
+                _countries = CachedBody(_COUNTRY_LIST.dump_json(_country_infos()))
+            entry = _countries
+    return entry
+
+
+def get_countries_body() -> bytes:
+    return get_countries_entry().body
+
+
+def warm(encodings: Tuple[str, ...] = ()) -> int:
+    """Render every country x language x variant body (and the countries
+    body) up front, plus their `encodings` variants; returns the number of
+    cached catalog entries."""
+    get_store()
+    entries = [get_countries_entry()]
+    for country in CountryCode:
+        for lang in _LANGUAGES:
+            for variant in ("standard", "problem"):
+                entries.append(get_catalog_entry(country, variant, lang))
+    for entry in entries:
+        for encoding in encodings:
+            entry.representation(encoding)
+    return len(_bodies)
+
+
+def invalidate() -> None:
+    """Drop every pre-rendered body (and pricing.py's unit-price tables).
+    Call after PIZZA_CATALOG, COUNTRY_CONFIG or CURRENCY_RATES change."""
+    global _version, _LANGUAGES, _countries, _store, _content_version
+    with _lock:
+        _version += 1
+        _bodies.clear()
+        _countries = None
+        _store = None
+        _LANGUAGES = _catalog_languages()
+        _content_version = _fingerprint()
+    pricing.invalidate()
+
+
+def replace_catalog(pizzas: List[dict]) -> None:
+    """Swap the menu (e.g. one read by catalog_store.load_catalog_file) in
+    place, so every module holding PIZZA_CATALOG / PIZZA_BY_ID sees it, and
+    drop everything derived from the old one."""
+    constants.PIZZA_CATALOG[:] = pizzas
+    database.PIZZA_BY_ID.clear()
+    database.PIZZA_BY_ID.update((pizza["id"], pizza) for pizza in pizzas)
+    invalidate()
+
+
+def version() -> int:
+    return _version
+
+
+def content_version() -> str:
+    """Fingerprint of the catalog, market config and rates. Responses that
+    embed prices or currency data (cart, orders) fold it into their ETags."""
+    return _content_version
@@ -0,0 +1,176 @@
+import base64
+import binascii
+import bisect
+import json
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+# Indexed view of the pizza catalog for /api/pizzas filtering and paging.
+#
+# Items keep their catalog order (a position per item). Two indexes map to
+# sorted position lists:
+#   - category: exact, case-insensitive category value;
+#   - text: an inverted index over the name and description in every
+#     language. Text is NFKD-normalized with combining marks dropped and
+#     casefolded ("Hawaïenne" -> "hawaienne", Arabic diacritics removed).
+#     Words split on non-word characters; runs of Japanese/CJK characters,
+#     which have no spaces, are indexed as character bigrams instead.
+# A query token matches every indexed word it is a prefix of ("marg"
+# finds Margherita); all tokens must match. So a query costs the size of
+# the postings it touches, and a page costs its own size: never a scan of
+# the whole menu. Without filters the matches are the lazy range of every
+# position, so an unfiltered page is a slice of the menu.
+#
+# Pages are addressed by an opaque cursor (the last item id returned), so a
+# walk survives the menu being reloaded with items added; a cursor whose item
+# is gone is rejected.
+
+REQUIRED_FIELDS = ("id", "base_price", "category", "image", "name", "description")
+TEXT_FIELDS = ("name", "description")
+
+_WORD = re.compile(r"\w+")
+_CJK = re.compile(r"[぀-ヿ㐀-䶿一-鿿豈-﫿ｦ-ﾟ]+")
+
+
+def normalize(text: str) -> str:
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for word in _WORD.findall(normalize(text)):
+        start = 0
+        for run in _CJK.finditer(word):
+            if run.start() > start:
+                tokens.append(word[start:run.start()])
+            chars = run.group()
+            if len(chars) == 1:
+                tokens.append(chars)
+            else:
+                tokens.extend(chars[i:i + 2] for i in range(len(chars) - 1))
+            start = run.end()
+        if start < len(word):
+            tokens.append(word[start:])
+    return tokens
+
+
+def _texts(value) -> Iterable[str]:
+    if isinstance(value, dict):
+        return (text for text in value.values() if isinstance(text, str))
+    return (value,) if isinstance(value, str) else ()
+
+
+class CatalogStore:
+    def __init__(self, pizzas: List[Dict[str, Any]]):
+        self.pizzas = pizzas
+        self.positions: Dict[str, int] = {}
+        self.categories: Dict[str, List[int]] = {}
+        postings: Dict[str, List[int]] = {}
+
+        for position, pizza in enumerate(pizzas):
+            self.positions[pizza["id"]] = position
+            self.categories.setdefault(str(pizza["category"]).casefold(), []).append(position)
+            words: Set[str] = set()
+            for field in TEXT_FIELDS:
+                for text in _texts(pizza.get(field)):
+                    words.update(tokenize(text))
+            for word in words:
+                postings.setdefault(word, []).append(position)
+
+        self._postings = postings
+        self._vocabulary = sorted(postings)
+
+    def _prefix_matches(self, token: str) -> Set[int]:
+        matches: Set[int] = set()
+        index = bisect.bisect_left(self._vocabulary, token)
+        while index < len(self._vocabulary) and self._vocabulary[index].startswith(token):
+            matches.update(self._postings[self._vocabulary[index]])
+            index += 1
+        return matches
+
+    def search(self, category: Optional[str] = None, q: Optional[str] = None) -> Sequence[int]:
+        """Positions of the items matching every given filter, in catalog
+        order. A blank `category`, or a `q` with no words in it, filters
+        nothing."""
+        tokens = set(tokenize(q)) if q else set()
+        candidates: Optional[Set[int]] = None
+        if category and category.strip():
+            in_category = self.categories.get(category.strip().casefold(), [])
+            if not tokens:
+                return in_category
+            candidates = set(in_category)
+
+        # Smallest expansions first, so intersections shrink quickly.
+        for matches in sorted((self._prefix_matches(token) for token in tokens), key=len):
+            candidates = matches if candidates is None else candidates & matches
+            if not candidates:
+                return []
+
+        if candidates is None:
+            return range(len(self.pizzas))
+        return sorted(candidates)
+
+    def page(self, matches: Sequence[int], limit: Optional[int] = None,
+             cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Items of one page of `matches` and the cursor of the next one (None
+        on the last page). Raises ValueError for a cursor that does not decode
+        to a catalog item."""
+        start = 0
+        if cursor is not None:
+            position = self.positions.get(decode_cursor(cursor))
+            if position is None:
+                raise ValueError("cursor does not refer to a catalog item")
+            if isinstance(matches, range):
+                start = position + 1
+            else:
+                start = bisect.bisect_right(matches, position)
+        end = len(matches) if limit is None else min(start + limit, len(matches))
+        items = [self.pizzas[position] for position in matches[start:end]]
+        next_cursor = encode_cursor(items[-1]["id"]) if items and end < len(matches) else None
+        return items, next_cursor
+
+
+def encode_cursor(pizza_id: str) -> str:
+    return base64.urlsafe_b64encode(pizza_id.encode("utf-8")).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError("malformed cursor")
+
+
+def _validate(pizzas: List[Any], source: str) -> None:
+    seen: Set[str] = set()
+    for index, pizza in enumerate(pizzas):
+        if not isinstance(pizza, dict):
+            raise ValueError(f"{source}: item {index} is not an object")
+        missing = [field for field in REQUIRED_FIELDS if field not in pizza]
+        if missing:
+            raise ValueError(f"{source}: item {index} is missing {', '.join(missing)}")
+        if pizza["id"] in seen:
+            raise ValueError(f"{source}: duplicate pizza id {pizza['id']!r}")
+        if not isinstance(pizza["base_price"], (int, float)) or pizza["base_price"] < 0:
+            raise ValueError(f"{source}: item {pizza['id']!r} has an invalid base_price")
+        seen.add(pizza["id"])
+
+
+def load_catalog_file(path: str) -> List[Dict[str, Any]]:
+    """Read a menu in PIZZA_CATALOG's shape: a JSON array (or an object
+    with a "pizzas" array), or JSON lines for .jsonl / .ndjson files."""
+    with open(path, encoding="utf-8") as handle:
+        if path.endswith((".jsonl", ".ndjson")):
+            pizzas = [json.loads(line) for line in handle if line.strip()]
+        else:
+            data = json.load(handle)
+            pizzas = data.get("pizzas") if isinstance(data, dict) else data
+    if not isinstance(pizzas, list) or not pizzas:
+        raise ValueError(f"{path}: expected a non-empty list of pizzas")
+    _validate(pizzas, path)
+    return pizzas
@@ -0,0 +1,81 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+# Execution helpers for the chaos endpoints (routers/debug_chaos.py).
+#
+# Chaos must only hurt the request that asked for it. Latency spikes are
+# awaited, so other requests keep being served; CPU load runs in a small
+# process pool, so it burns other cores instead of the event loop (and, in
+# a separate process, does not hold our GIL either). Both are capped: past
+# the cap a request is refused with 429 instead of piling up.
+#
+# Workers are spawned, never forked: the server process runs the journal
+# writer, profiler sampler, trace export and threadpool threads, and a fork
+# can copy a lock one of them holds into a child that then deadlocks on it.
+# Kept free of app imports: spawned workers import this module to unpickle
+# `fibonacci`.
+
+
+def fibonacci(n: int) -> int:
+    """Deliberately naive: exponential time is the point."""
+    if n <= 1:
+        return n
+    return fibonacci(n - 1) + fibonacci(n - 2)
+
+
+class ConcurrencyCap:
+    """Non-blocking counter of in-flight work units."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self, units: int = 1) -> bool:
+        with self._lock:
+            if self.in_flight + units > self.limit:
+                return False
+            self.in_flight += units
+            return True
+
+    def release(self, units: int = 1) -> None:
+        with self._lock:
+            self.in_flight -= units
+
+
+class CpuPool:
+    """Lazily started process pool; work is capped at `max_tasks` queued or
+    running tasks across all requests."""
+
+    def __init__(self, workers: int, max_tasks: int):
+        self.workers = workers
+        self.cap = ConcurrencyCap(max_tasks)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+        return self._executor
+
+    async def fibonacci(self, n: int, parallelism: int) -> List[int]:
+        """Run `parallelism` fibonacci(n) tasks in the pool. The caller must
+        hold `parallelism` units of `cap`."""
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        return await asyncio.gather(*(
+            loop.run_in_executor(executor, fibonacci, n) for _ in range(parallelism)
+        ))
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
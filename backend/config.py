@@ -1,3 +1,5 @@
+from typing import Any, Dict, Literal, Optional
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -9,7 +11,67 @@ class Settings(BaseSettings):
     secret_key: str = "omnipizza-super-secret-key-for-testing-only"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    # Issued token format: "jwt" or "compact" (auth.create_compact_token).
+    # Both are always accepted, so this can be flipped without logouts; any
+    # other value fails when Settings loads.
+    token_format: Literal["jwt", "compact"] = "jwt"
+    # Max verified tokens kept in auth.VerifiedTokenCache (0 disables)
+    token_cache_size: int = 4096
     
+    # Chaos latency: per-behavior overrides merged over constants.LATENCY_PROFILES
+    latency_profiles: Dict[str, Dict[str, Any]] = {}
+
+    # Admission control (bulkhead.py): per-bucket overrides merged over
+    # constants.BULKHEADS
+    bulkheads_enabled: bool = True
+    bulkheads: Dict[str, Dict[str, Any]] = {}
+
+    # Chaos endpoints (chaos.py); past a cap requests get 429
+    chaos_max_latency_spikes: int = 200  # concurrent /api/debug/latency-spike
+    chaos_cpu_workers: int = 2           # process pool size for /api/debug/cpu-load
+    chaos_max_cpu_tasks: int = 8         # fibonacci tasks queued or running
+
+    # Menu data file (catalog_store.load_catalog_file: JSON array or JSON
+    # lines, PIZZA_CATALOG's shape); the built-in catalog when unset
+    catalog_path: Optional[str] = None
+
+    # Storage backend (storage.py): "memory" (single worker) or "sqlite"
+    # (one WAL-mode file shared by every uvicorn worker on the host)
+    storage_backend: str = "memory"
+    sqlite_path: str = "omnipizza.db"
+
+    # Retention (storage.RetentionPolicy); 0 disables a bound
+    retention_max_orders: int = 1_000_000
+    retention_order_max_age_seconds: float = 7 * 24 * 3600
+    retention_max_sessions: int = 100_000
+    retention_session_idle_seconds: float = 24 * 3600
+    retention_max_profiles: int = 100_000
+    retention_profile_idle_seconds: float = 24 * 3600
+
+    # Durable order journal (journal.py); disabled unless journal_dir is set
+    journal_dir: Optional[str] = None
+    journal_fsync: bool = True
+    journal_snapshot_every: int = 100_000
+    journal_commit_interval_ms: float = 5.0
+
+    # On-demand profiling (profiler.py): requests carrying
+    # `X-Debug-Profile: <debug_key>` are sampled; disabled while unset
+    debug_key: Optional[str] = None
+    profile_interval_ms: float = 1.0
+    profile_max_seconds: float = 30.0
+    profile_buffer_size: int = 50
+
+    # Server-Timing response header (server_timing.py)
+    server_timing_enabled: bool = True
+
+    # Tracing (tracing.py): spans per request, W3C traceparent in,
+    # traceresponse out; trace_file adds a rotating JSON-lines export
+    tracing_enabled: bool = True
+    trace_buffer_size: int = 500
+    trace_file: Optional[str] = None
+    trace_file_max_bytes: int = 10 * 1024 * 1024
+    trace_file_backups: int = 3
+
     # CORS
     cors_origins: list = ["*"]
     
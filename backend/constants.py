@@ -85,6 +85,32 @@ SECURITY_GLITCH_LEAK_MESSAGES = [
     "Unhandled exception: /home/deploy/omnipizza/backend/.env not found (SECRET_KEY missing)"
 ]
 
+# Latency injection per behavior (latency.py). Each spec names a
+# distribution - fixed | uniform | lognormal | p99_tail - and its parameters;
+# "routes" holds per-route-template overrides for the same behavior.
+# Settings.latency_profiles (env LATENCY_PROFILES, JSON) overlays this.
+LATENCY_PROFILES = {
+    "performance_glitch": {
+        "distribution": "fixed",
+        "seconds": 3.0,
+    },
+}
+
+# Admission control per bulkhead (bulkhead.py). A request is assigned to the
+# bulkhead of its user's behavior; unauthenticated requests use "anonymous"
+# and the CPU/latency chaos endpoints use "chaos". `limit` requests run at
+# once, up to `queue` more wait at most `queue_timeout` seconds (then 503),
+# and the rest are refused at once (429); both carry Retry-After.
+# Settings.bulkheads (env BULKHEADS, JSON) overlays this.
+BULKHEADS = {
+    "default": {"limit": 64, "queue": 128, "queue_timeout": 2.0, "retry_after": 1},
+    "standard": {"limit": 256, "queue": 512, "queue_timeout": 5.0, "retry_after": 1},
+    "anonymous": {"limit": 128, "queue": 256, "queue_timeout": 2.0, "retry_after": 1},
+    "performance_glitch": {"limit": 32, "queue": 32, "queue_timeout": 1.0, "retry_after": 3},
+    "error": {"limit": 32, "queue": 32, "queue_timeout": 1.0, "retry_after": 1},
+    "chaos": {"limit": 16, "queue": 0, "queue_timeout": 0.0, "retry_after": 5},
+}
+
 # Country-specific configurations
 COUNTRY_CONFIG = {
     CountryCode.MX: {
@@ -1,4 +1,4 @@
-from typing import List, Dict, Any, Optional
+from typing import Callable, List, Dict, Any, Iterator, Optional, Tuple
 from constants import (
     PIZZA_CATALOG, COUNTRY_CONFIG, CURRENCY_RATES, CountryCode,
     A11Y_GLITCH_MODES, A11Y_GLITCH_LANGS,
@@ -6,40 +6,22 @@ from constants import (
 import uuid
 from datetime import datetime
 import random
-import math
-
-SIZE_UPCHARGE_USD = {
-    "small": 0,
-    "medium": 3,
-    "large": 4,
-    "family": 5,
-}
-TOPPING_UPCHARGE_USD = 1
+from config import settings
+from pricing import (
+    SIZE_UPCHARGE_USD, TOPPING_UPCHARGE_USD,
+    convert_usd_amount, round_currency_amount,
+    order_total, order_totals, quote_lines,
+)
+from starlette.concurrency import run_in_threadpool
+
+from server_timing import timed
+from storage import MemoryStorage, create_storage
+
 # Index the catalog by id once so per-item lookups are O(1) instead of a
 # linear scan of PIZZA_CATALOG on every cart item.
 PIZZA_BY_ID: Dict[str, Dict[str, Any]] = {pizza["id"]: pizza for pizza in PIZZA_CATALOG}
 
 
-def convert_usd_amount(
-    usd_amount: float,
-    conversion_rate: float,
-    decimal_places: int,
-) -> float:
-    converted = usd_amount * conversion_rate
-    if decimal_places == 0:
-        return float(round(converted))
-    return round(converted, decimal_places)
-
-
-def round_currency_amount(
-    amount: float,
-    decimal_places: int,
-) -> float:
-    if decimal_places == 0:
-        return float(round(amount))
-    return round(amount, decimal_places)
-
-
 _DEFAULT_LANG_BY_COUNTRY = {"MX": "es", "US": "en", "CH": "de", "JP": "ja", "SA": "ar"}
 
 
@@ -83,15 +65,59 @@ def _convert_price(base_price_usd: float, conversion_rate: float, decimal_places
 
 
 class InMemoryDB:
-    """In-memory database that resets on each restart"""
-
-    def __init__(self):
-        self.orders: Dict[str, Dict[str, Any]] = {}
-        self.sessions: Dict[str, Dict[str, Any]] = {}
-        self.user_profiles: Dict[str, Dict[str, Any]] = {}
+    """In-memory database that resets on each restart.
+
+    Records live in a storage backend (storage.py): process-local dicts by
+    default, or a SQLite file shared by every worker when
+    Settings.storage_backend is "sqlite". Public data-access methods are
+    reported as the `db` phase of the Server-Timing header."""
+
+    def __init__(self, storage=None):
+        self.storage = storage if storage is not None else MemoryStorage()
+        # Optional durable log (journal.OrderJournal). Every mutation below
+        # records the resulting state, not the operation, so replaying a
+        # record twice is harmless.
+        self.journal = None
+
+    async def run(self, method: Callable, *args, **kwargs):
+        """Call a storage-touching `method` from an async handler. The
+        process-local store is called in place (it is only ever mutated on
+        the event loop, which journal snapshots rely on); a backend that
+        blocks on I/O (SQLite) is called in the threadpool."""
+        if not self.storage.blocking:
+            return method(*args, **kwargs)
+        return await run_in_threadpool(method, *args, **kwargs)
+
+    def _record(self, record: Dict[str, Any]) -> None:
+        if self.journal is not None:
+            self.journal.append(record)
+
+    def export_state(self) -> Dict[str, Any]:
+        return self.storage.export_state()
+
+    def load_state(self, state: Dict[str, Any]) -> None:
+        self.storage.load_state(state)
+
+    def apply_record(self, record: Dict[str, Any]) -> None:
+        """Replay one journal record written by _record()."""
+        op = record["op"]
+        if op == "order":
+            order = record["order"]
+            if not self.storage.has_order(order["order_id"]):
+                self.storage.add_order(order)
+        elif op == "session":
+            self.storage.put_session(record["username"], record["session"])
+        elif op == "session_reset":
+            self.storage.delete_session(record["username"])
+        elif op == "profile":
+            self.storage.put_profile(record["session_id"], record["profile"])
+
+    def _save_profile(self, session_id: str, profile: Dict[str, Any]) -> None:
+        self.storage.put_profile(session_id, profile)
+        self._record({"op": "profile", "session_id": session_id, "profile": dict(profile)})
 
     def _ensure_user_profile(self, session_id: str, username: str) -> Dict[str, Any]:
-        profile = self.user_profiles.get(session_id)
+        profile = self.storage.get_profile(session_id)
         if profile is None:
             profile = {
                 "username": username,
@@ -102,42 +128,50 @@ class InMemoryDB:
                 "notes": "",
                 "birthday": "",
             }
-            self.user_profiles[session_id] = profile
+            self.storage.put_profile(session_id, profile)
         return profile
 
+    @timed("db")
     def get_user_profile(self, session_id: str, username: str) -> Dict[str, Any]:
         return self._ensure_user_profile(session_id, username)
 
+    @timed("db")
     def update_user_profile(self, session_id: str, username: str, patch: Dict[str, Any]) -> Dict[str, Any]:
         profile = self._ensure_user_profile(session_id, username)
         for key, value in patch.items():
             if value is None:
                 continue
             profile[key] = value
+        self._save_profile(session_id, profile)
         return profile
 
+    @timed("db")
     def reset_user_profile(self, session_id: str, username: str) -> Dict[str, Any]:
         """Reset the current session's editable profile to the deterministic
         default. Profiles are keyed by session_id (a per-login JWT claim), so
         this only clears the caller's own session and cannot affect a
         concurrent session logged in under the same username."""
-        self.user_profiles.pop(session_id, None)
-        return self._ensure_user_profile(session_id, username)
+        self.storage.delete_profile(session_id)
+        profile = self._ensure_user_profile(session_id, username)
+        self._record({"op": "profile", "session_id": session_id, "profile": dict(profile)})
+        return profile
 
+    @timed("db")
     def seed_user_profile(self, session_id: str, username: str, fields: Dict[str, Any]) -> Dict[str, Any]:
         """Replace the profile with a deterministic baseline: default values
         overlaid with `fields`. Unspecified fields revert to default, so the
         result depends only on this call, not on prior saves."""
-        self.user_profiles.pop(session_id, None)
+        self.storage.delete_profile(session_id)
         profile = self._ensure_user_profile(session_id, username)
         for key, value in fields.items():
             if value is None:
                 continue
             profile[key] = value
+        self._save_profile(session_id, profile)
         return profile
 
     def _ensure_session(self, username: str) -> Dict[str, Any]:
-        session = self.sessions.get(username)
+        session = self.storage.get_session(username)
         if session is None:
             session = {
                 "username": username,
@@ -145,41 +179,117 @@ class InMemoryDB:
                 "cart_items": [],
                 "updated_at": datetime.utcnow(),
             }
-            self.sessions[username] = session
+            self.storage.put_session(username, session)
         return session
 
-    def create_order(self, order_data: Dict[str, Any]) -> str:
+    def _save_session(self, username: str, session: Dict[str, Any]) -> None:
+        self.storage.put_session(username, session)
+        self._record({"op": "session", "username": username, "session": dict(session)})
+
+    def _stamp_order(self, order_data: Dict[str, Any], timestamp: datetime) -> str:
         order_id = f"ORDER-{uuid.uuid4().hex[:8].upper()}"
         order_data["order_id"] = order_id
-        order_data["timestamp"] = datetime.utcnow()
+        order_data["timestamp"] = timestamp
         order_data["status"] = "pending"
-        self.orders[order_id] = order_data
         return order_id
 
+    @timed("db")
+    def create_order(self, order_data: Dict[str, Any]) -> str:
+        order_id = self._stamp_order(order_data, datetime.utcnow())
+        self.storage.add_order(order_data)
+        self._record({"op": "order", "order": order_data})
+        return order_id
+
+    @timed("db")
+    def create_orders(self, orders_data: List[Dict[str, Any]]) -> List[str]:
+        """Insert many orders in one storage call (a single transaction on
+        the SQLite backend). Orders are stamped in place, as create_order does."""
+        timestamp = datetime.utcnow()
+        order_ids = [self._stamp_order(order_data, timestamp) for order_data in orders_data]
+        self.storage.add_orders(orders_data)
+        for order_data in orders_data:
+            self._record({"op": "order", "order": order_data})
+        return order_ids
+
+    @timed("db")
     def get_order(self, order_id: str) -> Dict[str, Any]:
-        return self.orders.get(order_id)
+        return self.storage.get_order(order_id)
 
+    @timed("db")
+    def order_count(self) -> int:
+        return self.storage.order_count()
+
+    @timed("db")
     def get_user_orders(self, username: str) -> List[Dict[str, Any]]:
-        return [order for order in self.orders.values() if order.get("username") == username]
+        orders, _ = self.storage.user_orders(username)
+        return orders
 
+    @timed("db")
+    def get_user_orders_page(
+        self,
+        username: str,
+        limit: int,
+        cursor: Optional[int] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """One page of the user's orders, oldest first, starting after
+        `cursor`. Returns (orders, next_cursor); next_cursor is None on the
+        last page. Cost depends on `limit`, not on the user's order count."""
+        return self.storage.user_orders(username, after=cursor, limit=limit)
+
+    def iter_user_orders(
+        self,
+        username: str,
+        country_code: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        chunk_size: int = 500,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """The user's orders, oldest first, as one list of matching orders per
+        storage page of `chunk_size`; a page with no matches yields an empty
+        list, so a caller gets control back after every page even when a
+        filter matches nothing. Walks the history with the page cursor, so
+        memory stays bounded by one page however long the history is, and
+        orders created mid-walk are picked up rather than skipped. `since` is
+        inclusive, `until` exclusive (naive UTC, like order timestamps)."""
+        cursor = None
+        while True:
+            orders, cursor = self.storage.user_orders(username, after=cursor, limit=chunk_size)
+            matching = [
+                order for order in orders
+                if (country_code is None or order["country_code"] == country_code)
+                and (since is None or order["timestamp"] >= since)
+                and (until is None or order["timestamp"] < until)
+            ]
+            yield matching
+            if cursor is None:
+                return
+
+    @timed("db")
     def set_test_market(self, username: str, country_code: CountryCode) -> Dict[str, Any]:
         session = self._ensure_session(username)
         session["country_code"] = country_code.value
         session["updated_at"] = datetime.utcnow()
+        self._save_session(username, session)
         return session
 
+    @timed("db")
     def set_test_cart(self, username: str, items: List[Dict[str, Any]]) -> Dict[str, Any]:
         session = self._ensure_session(username)
         session["cart_items"] = [item.copy() for item in items]
         session["updated_at"] = datetime.utcnow()
+        self._save_session(username, session)
         return session
 
+    @timed("db")
     def reset_test_session(self, username: str) -> None:
-        self.sessions.pop(username, None)
+        self.storage.delete_session(username)
+        self._record({"op": "session_reset", "username": username})
 
+    @timed("db")
     def get_test_session(self, username: str) -> Dict[str, Any]:
         return self._ensure_session(username)
 
+    @timed("db")
     def get_enriched_cart(
         self,
         username: str,
@@ -232,12 +342,15 @@ class InMemoryDB:
         return enriched
 
     # ✅ UPDATED: supports language + translation
+    @timed("db")
     def get_catalog(
         self,
         country_code: CountryCode,
         behavior: str = "standard",
-        language: Optional[str] = None
+        language: Optional[str] = None,
+        pizzas: Optional[List[Dict[str, Any]]] = None,
     ) -> List[Dict[str, Any]]:
+        """Localized, priced copies of `pizzas` (default: the whole catalog)."""
         country_config = COUNTRY_CONFIG[country_code]
         currency = country_config["currency"]
         currency_symbol = country_config["currency_symbol"]
@@ -249,7 +362,7 @@ class InMemoryDB:
 
         catalog: List[Dict[str, Any]] = []
 
-        for pizza in PIZZA_CATALOG:
+        for pizza in PIZZA_CATALOG if pizzas is None else pizzas:
             pizza_copy = pizza.copy()
 
             if behavior == "a11y_glitch":
@@ -273,57 +386,38 @@ class InMemoryDB:
 
         return catalog
 
+    @timed("db")
     def calculate_order_total(
         self,
         items: List[Dict[str, Any]],
         country_code: CountryCode,
         tip_percentage: float = 0.0
     ) -> Dict[str, float]:
-        country_config = COUNTRY_CONFIG[country_code]
-        currency = country_config["currency"]
-        conversion_rate = CURRENCY_RATES[currency]
-        tax_rate = country_config["tax_rate"]
-        decimal_places = country_config.get("decimal_places", 2)
-        delivery_fee = convert_usd_amount(
-            country_config["delivery_fee_usd"],
-            conversion_rate,
-            decimal_places,
-        )
-
-        subtotal = 0.0
-        for item in items:
-            pizza = PIZZA_BY_ID.get(item["pizza_id"])
-            if pizza:
-                converted_price = pizza["base_price"] * conversion_rate
-                if decimal_places == 0:
-                    base_price = round(converted_price)
-                else:
-                    base_price = round(converted_price, decimal_places)
-
-                rate = base_price / pizza["base_price"] if pizza["base_price"] > 0 else 1
-                size_key = str(item.get("size", "small")).lower()
-                size_add = math.ceil(SIZE_UPCHARGE_USD.get(size_key, 0) * rate)
-                topping_unit = math.ceil(TOPPING_UPCHARGE_USD * rate)
-                toppings = item.get("toppings") or []
-                toppings_add = topping_unit * len(toppings)
-                unit_price = base_price + size_add + toppings_add
-
-                subtotal += unit_price * item["quantity"]
-
-        subtotal = round_currency_amount(subtotal, decimal_places)
-        tax = round_currency_amount(subtotal * tax_rate, decimal_places)
-        tip = round_currency_amount(subtotal * (tip_percentage / 100), decimal_places)
-        total = round_currency_amount(subtotal + delivery_fee + tax + tip, decimal_places)
+        # Unit prices come from pricing.py's per-market tables, precomputed
+        # from the catalog and rates instead of re-derived for every item.
+        return order_total(items, country_code, tip_percentage)
 
+    @timed("db")
+    def calculate_order_totals(
+        self,
+        carts: List[Tuple[List[Dict[str, Any]], CountryCode, float]],
+    ) -> List[Dict[str, float]]:
+        """Batch form of calculate_order_total over (items, country_code,
+        tip_percentage) carts; same results, priced with NumPy."""
+        return order_totals(carts)
+
+    @timed("db")
+    def quote_order(
+        self,
+        items: List[Dict[str, Any]],
+        country_code: CountryCode,
+        tip_percentage: float = 0.0,
+    ) -> Dict[str, Any]:
+        """calculate_order_total plus the per-item breakdown; no side effects."""
         return {
-            "subtotal": subtotal,
-            "delivery_fee": round_currency_amount(delivery_fee, decimal_places),
-            "tax_rate": tax_rate,
-            "tip_percentage": round(tip_percentage, 2),
-            "tax": tax,
-            "tip": tip,
-            "total": total,
-            "currency": currency
+            **self.calculate_order_total(items, country_code, tip_percentage),
+            "currency_symbol": COUNTRY_CONFIG[country_code]["currency_symbol"],
+            "items": quote_lines(items, country_code),
         }
 
     def should_trigger_error(self, behavior: str) -> bool:
@@ -331,4 +425,4 @@ class InMemoryDB:
             return random.random() < 0.5
         return False
 
-db = InMemoryDB()
+db = InMemoryDB(create_storage(settings))
@@ -0,0 +1,82 @@
+import hashlib
+from typing import Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from compression import negotiate
+from fast_json import FastJSONResponse
+
+# Conditional GET helpers (ETag / If-None-Match / Cache-Control).
+#
+# ETags are strong and derived from content versions that are cheap to read
+# up front (a pre-rendered body's hash, a session's updated_at, the catalog
+# content fingerprint), so a handler can answer 304 before it builds or
+# serializes anything. Routes read If-None-Match from the Request rather
+# than declaring a Header parameter, which keeps the OpenAPI contract as is.
+
+# Same for every caller, changes only on deploy / catalog_cache.invalidate().
+PUBLIC_STATIC = "public, max-age=300"
+# Per-user state: may be stored, but must be revalidated on every use.
+PRIVATE_REVALIDATE = "private, no-cache"
+# Non-deterministic bodies (a11y_glitch_user): never reuse.
+NO_STORE = "no-store"
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag over the given version components."""
+    raw = "\x1f".join(str(part) for part in parts).encode("utf-8")
+    return f'"{hashlib.blake2b(raw, digest_size=12).hexdigest()}"'
+
+
+def body_etag(body: bytes) -> str:
+    """Strong ETag over an already serialized body."""
+    return f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match check (RFC 9110 13.1.2: weak comparison, "*" matches)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def set_cache_headers(
+    response: Response,
+    cache_control: str,
+    etag: Optional[str] = None,
+    vary: Optional[str] = None,
+) -> Response:
+    if etag is not None:
+        response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    if vary is not None:
+        response.headers["Vary"] = vary
+    return response
+
+
+def not_modified(etag: str, cache_control: str, vary: Optional[str] = None) -> Response:
+    """304 carrying the validators a 200 would have sent."""
+    return set_cache_headers(Response(status_code=304), cache_control, etag, vary)
+
+
+def cached_response(request: Request, entry, cache_control: str, vary: Optional[str] = None) -> Response:
+    """Serve a pre-rendered body (compression.CompressedVariants) in the
+    negotiated encoding, compressed once and then reused, or 304 if the
+    client already holds it."""
+    body, etag, encoding = entry.representation(negotiate(request.headers.get("accept-encoding")))
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_control, vary)
+    response = FastJSONResponse(body)
+    if encoding is not None:
+        response.headers["Content-Encoding"] = encoding
+    return set_cache_headers(response, cache_control, etag, vary)
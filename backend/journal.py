@@ -0,0 +1,262 @@
+import asyncio
+import json
+import logging
+import os
+import pickle
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("omnipizza.journal")
+
+# Optional durability for InMemoryDB (enabled by Settings.journal_dir).
+#
+# Layout of journal_dir:
+#   snapshot.pkl          compact pickle of InMemoryDB.export_state(), plus the
+#                         generation of the first journal file still to replay
+#   journal.<gen>.ndjson  one JSON record per line, appended by the writer
+#
+# Requests never touch the disk: InMemoryDB._record() only enqueues. A single
+# writer thread drains the queue, writes everything pending as one batch and
+# fsyncs once per batch (group commit), so checkout latency does not depend
+# on disk latency. Every `snapshot_every` records the writer rolls to a new
+# journal generation, snapshots the DB and deletes the older generations, so
+# startup replay is one pickle load plus a bounded tail of journal lines.
+#
+# Handlers mutate the stores on the event loop, so the snapshot's copy is
+# taken there too (the writer schedules export_state() on the loop and waits
+# for it) and only pickling and disk I/O happen on the writer thread. Stop
+# the journal with close() off the loop (run_in_executor), so a snapshot
+# already under way can still get its copy.
+
+SNAPSHOT_FILE = "snapshot.pkl"
+_DATETIME_FIELDS = ("timestamp", "updated_at")
+
+
+def _journal_name(generation: int) -> str:
+    return f"journal.{generation:08d}.ndjson"
+
+
+def _journal_generations(directory: str) -> List[int]:
+    generations = []
+    for name in os.listdir(directory):
+        if name.startswith("journal.") and name.endswith(".ndjson"):
+            try:
+                generations.append(int(name.split(".")[1]))
+            except ValueError:
+                continue
+    return sorted(generations)
+
+
+def _encode_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if hasattr(value, "value"):
+        return value.value
+    raise TypeError(f"Cannot journal value of type {type(value).__name__}")
+
+
+def _restore_datetimes(obj: Dict[str, Any]) -> Dict[str, Any]:
+    for field in _DATETIME_FIELDS:
+        value = obj.get(field)
+        if isinstance(value, str):
+            obj[field] = datetime.fromisoformat(value)
+    return obj
+
+
+def _decode_record(line: str) -> Dict[str, Any]:
+    record = json.loads(line)
+    for key in ("order", "session"):
+        if key in record:
+            _restore_datetimes(record[key])
+    return record
+
+
+class OrderJournal:
+    def __init__(
+        self,
+        db,
+        directory: str,
+        fsync: bool = True,
+        snapshot_every: int = 100_000,
+        commit_interval: float = 0.005,
+        max_batch: int = 1000,
+    ):
+        self.db = db
+        self.directory = directory
+        self.fsync = fsync
+        self.snapshot_every = snapshot_every
+        self.commit_interval = commit_interval
+        self.max_batch = max_batch
+        self.generation = 0
+        self._records_since_snapshot = 0
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._file = None
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # ---------- startup ----------
+
+    def restore(self) -> int:
+        """Load the latest snapshot and replay every newer journal line into
+        the DB. Returns the number of journal records replayed."""
+        os.makedirs(self.directory, exist_ok=True)
+        start = time.perf_counter()
+
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE)
+        first_generation = 0
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, "rb") as f:
+                snapshot = pickle.load(f)
+            self.db.load_state(snapshot["state"])
+            first_generation = snapshot["generation"]
+
+        replayed = 0
+        generations = [g for g in _journal_generations(self.directory) if g >= first_generation]
+        for generation in generations:
+            with open(os.path.join(self.directory, _journal_name(generation)), encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = _decode_record(line)
+                    except ValueError:
+                        # Torn final write from a crash mid-batch: stop here.
+                        logger.warning("journal.replay truncated generation=%d", generation)
+                        break
+                    self.db.apply_record(record)
+                    replayed += 1
+
+        self.generation = max(generations + [first_generation]) + 1
+        self._records_since_snapshot = replayed
+        logger.info(
+            "journal.restore orders=%d records=%d duration_ms=%.1f",
+            self.db.order_count(), replayed, (time.perf_counter() - start) * 1000,
+        )
+        return replayed
+
+    def start(self) -> None:
+        """Start the writer. Called on the event loop, the loop is where
+        snapshots copy the DB; started without one (scripts, tests), they
+        copy it from the writer thread."""
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._loop = None
+        self._file = open(os.path.join(self.directory, _journal_name(self.generation)), "a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._run, name="order-journal", daemon=True)
+        self._thread.start()
+        self.db.journal = self
+
+    # ---------- request path ----------
+
+    def append(self, record: Dict[str, Any]) -> None:
+        self._queue.put(record)
+
+    # ---------- writer thread ----------
+
+    def _run(self) -> None:
+        while True:
+            record = self._queue.get()
+            if record is None:
+                return
+            batch = [record]
+            deadline = time.monotonic() + self.commit_interval
+            stop = False
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                try:
+                    record = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is None:
+                    stop = True
+                    break
+                batch.append(record)
+            try:
+                self._write_batch(batch)
+                if self._records_since_snapshot >= self.snapshot_every:
+                    self._snapshot()
+            except Exception:
+                logger.exception("journal.write_failed records=%d", len(batch))
+            if stop:
+                return
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        lines = "".join(
+            json.dumps(record, default=_encode_default, ensure_ascii=False, separators=(",", ":")) + "\n"
+            for record in batch
+        )
+        self._file.write(lines)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._records_since_snapshot += len(batch)
+
+    def _snapshot(self) -> None:
+        # Roll to a new generation first: records enqueued from here on go to
+        # the new file, which is replayed on top of the snapshot. A record
+        # whose effect is already in the snapshot is replayed harmlessly,
+        # since records carry resulting state rather than operations.
+        self._file.close()
+        self.generation += 1
+        self._file = open(os.path.join(self.directory, _journal_name(self.generation)), "a", encoding="utf-8")
+
+        state = self._export_state()
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE)
+        tmp_path = snapshot_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"generation": self.generation, "state": state}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, snapshot_path)
+
+        for generation in _journal_generations(self.directory):
+            if generation < self.generation:
+                os.remove(os.path.join(self.directory, _journal_name(generation)))
+        self._records_since_snapshot = 0
+        logger.info("journal.snapshot generation=%d orders=%d", self.generation, len(state["orders"]))
+
+    def _export_state(self) -> Dict[str, Any]:
+        if self._loop is None or self._loop.is_closed():
+            return self.db.export_state()
+
+        async def export():
+            return self.db.export_state()
+
+        return asyncio.run_coroutine_threadsafe(export(), self._loop).result()
+
+    # ---------- shutdown ----------
+
+    def close(self) -> None:
+        """Flush everything still queued and stop the writer. Blocks until
+        the last batch is on disk: call it off the event loop."""
+        if self._thread is None:
+            return
+        self.db.journal = None
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        self._file.close()
+
+
+def open_journal(db, settings) -> Optional[OrderJournal]:
+    """Restore `db` from settings.journal_dir and start journaling into it.
+    Returns None when journaling is disabled."""
+    if not settings.journal_dir:
+        return None
+    if db.storage.shared:
+        # A shared backend is already durable and snapshots only cover the
+        # process-local store.
+        logger.warning("journal.disabled storage_backend=%s is already durable", settings.storage_backend)
+        return None
+    journal = OrderJournal(
+        db,
+        settings.journal_dir,
+        fsync=settings.journal_fsync,
+        snapshot_every=settings.journal_snapshot_every,
+        commit_interval=settings.journal_commit_interval_ms / 1000,
+    )
+    journal.restore()
+    journal.start()
+    return journal
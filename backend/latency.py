@@ -0,0 +1,98 @@
+import asyncio
+import math
+import random
+from typing import Any, Dict, Optional
+
+from config import settings
+from constants import LATENCY_PROFILES
+
+# Delays are awaited with asyncio.sleep, never time.sleep: a chaos user's
+# request parks on the event loop while every other request on the worker
+# keeps being served. Only the caller that owns the behavior is slowed down.
+
+DISTRIBUTIONS = ("fixed", "uniform", "lognormal", "p99_tail")
+
+
+def _behavior_key(behavior) -> str:
+    return behavior.value if hasattr(behavior, "value") else str(behavior)
+
+
+def _merged_profiles() -> Dict[str, Dict[str, Any]]:
+    """Built-in LATENCY_PROFILES overlaid with `settings.latency_profiles`
+    (env `LATENCY_PROFILES` as JSON), behavior by behavior."""
+    merged = {behavior: dict(spec) for behavior, spec in LATENCY_PROFILES.items()}
+    for behavior, spec in settings.latency_profiles.items():
+        merged[behavior] = {**merged.get(behavior, {}), **spec}
+    for behavior, spec in merged.items():
+        _validate_spec(behavior, spec)
+        for route, route_spec in (spec.get("routes") or {}).items():
+            _validate_spec(f"{behavior} {route}", route_spec)
+    return merged
+
+
+def _validate_spec(name: str, spec: Dict[str, Any]) -> None:
+    distribution = spec.get("distribution", "fixed")
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(
+            f"Unknown latency distribution '{distribution}' for {name}. "
+            f"Valid values: {', '.join(DISTRIBUTIONS)}"
+        )
+
+
+_PROFILES = _merged_profiles()
+
+
+def resolve_profile(behavior, route: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Return the latency spec for `behavior` on `route` (a route template
+    such as "/api/checkout"), or None when the behavior injects no delay.
+    A per-route entry replaces the behavior-wide spec for that route only."""
+    profile = _PROFILES.get(_behavior_key(behavior))
+    if not profile:
+        return None
+    route_spec = (profile.get("routes") or {}).get(route) if route else None
+    if route_spec is not None:
+        return route_spec
+    return profile if "distribution" in profile else None
+
+
+def sample_delay(spec: Dict[str, Any], rng: random.Random = random) -> float:
+    """Draw one delay in seconds from `spec`, clamped to [0, max_seconds].
+
+    fixed     -> seconds
+    uniform   -> uniform(low, high)
+    lognormal -> lognormal with the given median and sigma
+    p99_tail  -> seconds, except tail_seconds with probability tail_probability
+    """
+    distribution = spec.get("distribution", "fixed")
+    if distribution == "fixed":
+        delay = float(spec.get("seconds", 0.0))
+    elif distribution == "uniform":
+        delay = rng.uniform(float(spec.get("low", 0.0)), float(spec.get("high", 0.0)))
+    elif distribution == "lognormal":
+        median = float(spec.get("median", 0.0))
+        if median <= 0:
+            return 0.0
+        delay = rng.lognormvariate(math.log(median), float(spec.get("sigma", 0.5)))
+    elif distribution == "p99_tail":
+        if rng.random() < float(spec.get("tail_probability", 0.01)):
+            delay = float(spec.get("tail_seconds", 0.0))
+        else:
+            delay = float(spec.get("seconds", 0.0))
+    else:
+        raise ValueError(f"Unknown latency distribution '{distribution}'")
+
+    max_seconds = spec.get("max_seconds")
+    if max_seconds is not None:
+        delay = min(delay, float(max_seconds))
+    return max(delay, 0.0)
+
+
+async def inject_latency(behavior, route: Optional[str] = None) -> float:
+    """Await the configured delay for this behavior/route; returns the delay."""
+    spec = resolve_profile(behavior, route)
+    if spec is None:
+        return 0.0
+    delay = sample_delay(spec)
+    if delay > 0:
+        await asyncio.sleep(delay)
+    return delay
@@ -1,19 +1,33 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from datetime import datetime
-from prometheus_client import Counter, Histogram
 
 from config import settings
+from bulkhead import BulkheadMiddleware, size_threadpool
+import catalog_cache
+from catalog_store import load_catalog_file
+from compression import CompressionMiddleware
+from database import db
+from http_cache import PUBLIC_STATIC, cached_response
+from journal import open_journal
+from metrics import PrometheusMiddleware
+from profiler import ProfilingMiddleware
+from server_timing import ServerTimingMiddleware, TimedJSONResponse, TimedRoute
+from tracing import TracingMiddleware, collector as trace_collector
+import warmup
 from test_api import router as test_api_router
 from routers.auth import router as auth_router
 from routers.catalog import router as catalog_router
 from routers.checkout import router as checkout_router
-from routers.debug_chaos import router as debug_chaos_router
+from routers.debug_chaos import router as debug_chaos_router, cpu_pool as chaos_cpu_pool
 
-# Prometheus metrics
-REQUEST_COUNT = Counter('http_requests_total', 'Total HTTP requests', ['method', 'endpoint', 'status'])
-REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'HTTP request latency', ['method', 'endpoint'])
+# Menu from a data file instead of constants.PIZZA_CATALOG; a malformed
+# file fails the boot rather than serving a partial menu
+if settings.catalog_path:
+    catalog_cache.replace_catalog(load_catalog_file(settings.catalog_path))
 
 # Create FastAPI app
 app = FastAPI(
@@ -22,8 +36,23 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/api/docs",
     redoc_url="/api/redoc",
-    openapi_url="/api/openapi.json"
+    openapi_url="/api/openapi.json",
+    default_response_class=TimedJSONResponse,
 )
+app.router.route_class = TimedRoute
+# /api/openapi.json is served from warmup's pre-serialized bytes (below)
+# instead of FastAPI's route, which re-serializes the schema on every hit.
+app.router.routes[:] = [
+    route for route in app.router.routes if getattr(route, "path", None) != app.openapi_url
+]
+
+# Per-behavior admission control (bulkhead.py); innermost, so refusals still
+# get CORS headers and are counted by PrometheusMiddleware
+app.add_middleware(BulkheadMiddleware)
+
+# Server-Timing phase breakdown (server_timing.py); outside the bulkhead so
+# admission queueing is reported too
+app.add_middleware(ServerTimingMiddleware)
 
 # CORS configuration
 app.add_middleware(
@@ -32,14 +61,59 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets web clients read validators for their own If-None-Match polling,
+    # and when to retry after a 429/503 from admission control.
+    expose_headers=["ETag", "Retry-After", "X-Profile-Id", "Server-Timing", "traceresponse"],
 )
 
+# gzip/brotli for responses not already compressed by catalog_cache
+app.add_middleware(CompressionMiddleware)
+
+# Per-request sampling profiler (profiler.py); a header scan unless opted in
+app.add_middleware(ProfilingMiddleware)
+
+# Request tracing (tracing.py)
+app.add_middleware(TracingMiddleware)
+
+# Prometheus request metrics (metrics.py); outermost, so it times CORS too
+app.add_middleware(PrometheusMiddleware)
+
 app.include_router(test_api_router)
 app.include_router(auth_router)
 app.include_router(catalog_router)
 app.include_router(checkout_router)
 app.include_router(debug_chaos_router)
 
+@app.on_event("startup")
+async def start_warmup():
+    # In the background: /health answers at once, /ready once warm-up is done.
+    app.state.warmup = asyncio.get_running_loop().run_in_executor(None, warmup.run, app)
+
+@app.on_event("startup")
+async def size_bulkhead_threadpool():
+    # One thread per bulkhead slot, so admitted requests never wait for one.
+    size_threadpool()
+
+@app.on_event("startup")
+async def restore_journal():
+    # No-op unless JOURNAL_DIR is set; replays snapshot + journal into db.
+    app.state.journal = open_journal(db, settings)
+
+@app.on_event("shutdown")
+async def close_journal():
+    if app.state.journal is not None:
+        # Off the loop: a snapshot in progress needs the loop for its copy.
+        await asyncio.get_running_loop().run_in_executor(None, app.state.journal.close)
+
+@app.on_event("shutdown")
+async def close_trace_export():
+    # Off the loop: waits for the TRACE_FILE writer to drain its queue.
+    await asyncio.get_running_loop().run_in_executor(None, trace_collector.close)
+
+@app.on_event("shutdown")
+async def stop_chaos_pool():
+    chaos_cpu_pool.shutdown()
+
 # Root endpoint
 @app.get("/")
 async def root():
@@ -59,6 +133,21 @@ async def health_check():
         "environment": settings.environment
     }
 
+# Readiness: 503 until the startup warm-up has finished (warmup.py)
+@app.get("/ready")
+async def readiness_check():
+    if not warmup.state.ready:
+        return JSONResponse(
+            status_code=503,
+            content=warmup.state.to_dict(),
+            headers={"Retry-After": "1"}
+        )
+    return warmup.state.to_dict()
+
+@app.get(app.openapi_url, include_in_schema=False)
+async def openapi_json(request: Request):
+    return cached_response(request, warmup.openapi_entry(app), PUBLIC_STATIC)
+
 # Exception handlers
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
@@ -68,7 +157,8 @@ async def http_exception_handler(request, exc):
             "error": exc.detail,
             "status_code": exc.status_code,
             "timestamp": datetime.utcnow().isoformat()
-        }
+        },
+        headers=getattr(exc, "headers", None)
     )
 
 @app.exception_handler(Exception)
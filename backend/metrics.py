@@ -0,0 +1,91 @@
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from constants import CountryCode
+
+# Prometheus metrics, recorded by PrometheusMiddleware for every request.
+# `endpoint` is the matched route template ("/api/orders/{order_id}"), never
+# the raw path, and country/behavior are mapped onto their fixed value sets,
+# so the number of series stays bounded however clients call the API.
+REQUEST_COUNT = Counter(
+    'http_requests_total', 'Total HTTP requests',
+    ['method', 'endpoint', 'status', 'behavior', 'country'],
+)
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency',
+    ['method', 'endpoint', 'behavior', 'country'],
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    'http_requests_in_progress', 'HTTP requests currently being served',
+    ['method'],
+)
+TOKEN_CACHE_REQUESTS = Counter(
+    'token_cache_requests_total', 'Verified-token cache lookups',
+    ['cache', 'result'],
+)
+STORAGE_EVICTIONS = Counter(
+    'storage_evictions_total', 'Records evicted by the retention policy',
+    ['store', 'reason'],
+)
+STORAGE_ENTRIES = Gauge(
+    'storage_entries', 'Records currently held by the storage backend',
+    ['store'],
+)
+
+UNMATCHED_ENDPOINT = "unmatched"
+_COUNTRY_CODES = {c.value for c in CountryCode}
+_METHODS = {"GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"}
+
+
+def _country_label(headers) -> str:
+    for name, value in headers:
+        if name == b"x-country-code":
+            code = value.decode("latin-1").upper()
+            return code if code in _COUNTRY_CODES else "invalid"
+    return "none"
+
+
+def _behavior_label(scope) -> str:
+    # Set by middleware.get_current_user once the bearer token is verified.
+    behavior = (scope.get("state") or {}).get("behavior")
+    if behavior is None:
+        return "anonymous"
+    return behavior.value if hasattr(behavior, "value") else str(behavior)
+
+
+class PrometheusMiddleware:
+    """Pure ASGI middleware: no request/response objects are built, it only
+    wraps `send` to capture the status code."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"] if scope["method"] in _METHODS else "OTHER"
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            in_progress.dec()
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or UNMATCHED_ENDPOINT
+            behavior = _behavior_label(scope)
+            country = _country_label(scope.get("headers") or ())
+            REQUEST_COUNT.labels(method, endpoint, str(status_code), behavior, country).inc()
+            REQUEST_LATENCY.labels(method, endpoint, behavior, country).observe(duration)
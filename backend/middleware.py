@@ -1,12 +1,19 @@
-from fastapi import Header, HTTPException, status, Depends
+from fastapi import Header, HTTPException, Request, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional
 from constants import CountryCode, TEST_USERS
-from auth import decode_access_token
-import time
+from auth import decode_access_token, VerifiedTokenCache
+from config import settings
+from latency import inject_latency
+from server_timing import phase
 
 security = HTTPBearer()
 
+# Fully built current-user dicts, keyed by token. A hit skips the decode and
+# the per-request dict rebuild; entries expire with the token. Handlers must
+# treat the returned dict as read-only, since repeat requests share it.
+current_user_cache = VerifiedTokenCache("current_user", settings.token_cache_size)
+
 def require_country_header(x_country_code: Optional[str] = Header(None)) -> str:
     """Middleware to require X-Country-Code header"""
     valid_values = ", ".join(c.value for c in CountryCode)
@@ -25,9 +32,21 @@ def require_country_header(x_country_code: Optional[str] = Header(None)) -> str:
             detail=f"Invalid country code: {x_country_code}. Valid values: {valid_values}"
         )
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+def get_current_user(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+) -> dict:
     """Get current authenticated user from JWT token"""
-    token = credentials.credentials
+    with phase("auth"):
+        return _resolve_current_user(request, credentials.credentials)
+
+def _resolve_current_user(request: Request, token: str) -> dict:
+    current_user = current_user_cache.get(token)
+    if current_user is not None:
+        # Exposed to metrics.PrometheusMiddleware for the `behavior` label.
+        request.state.behavior = current_user["behavior"]
+        return current_user
+
     payload = decode_access_token(token)
     
     username = payload.get("sub")
@@ -44,17 +63,36 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
             detail="User not found"
         )
 
+    request.state.behavior = user["behavior"]
+
     # Copy rather than mutate the shared TEST_USERS entry: session_id is
     # per-login (from the JWT's "sid" claim), not part of the static user
     # config, and every request for this username reads the same dict object.
-    return {**user, "session_id": payload.get("sid")}
+    current_user = {**user, "session_id": payload.get("sid")}
+    current_user_cache.put(token, current_user, payload.get("exp"))
+    return current_user
 
-def apply_user_behavior(user: dict = Depends(get_current_user)):
-    """Apply user-specific behavior delays"""
-    behavior = user.get("behavior")
-    
-    # Performance glitch: 3 second delay
-    if behavior == "performance_glitch":
-        time.sleep(3.0)
-    
+def peek_behavior(token: str):
+    """Behavior of the user behind `token`, or None if it does not verify.
+
+    For code that runs before routing (bulkhead.BulkheadMiddleware); errors
+    are left for get_current_user to report. Both lookups are cached."""
+    current_user = current_user_cache.get(token)
+    if current_user is not None:
+        return current_user["behavior"]
+    try:
+        payload = decode_access_token(token)
+    except HTTPException:
+        return None
+    user = TEST_USERS.get(payload.get("sub"))
+    return user["behavior"] if user is not None else None
+
+async def apply_user_behavior(request: Request, user: dict = Depends(get_current_user)):
+    """Apply user-specific behavior delays (see latency.py / LATENCY_PROFILES).
+
+    Async so the delay is awaited: a performance_glitch_user request waits
+    on its own, without blocking the event loop for every other caller."""
+    route = request.scope.get("route")
+    with phase("behavior"):
+        await inject_latency(user.get("behavior"), getattr(route, "path", None))
     return user
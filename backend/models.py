@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field, validator
-from typing import Optional, List, Dict, Any, Literal
+from pydantic import BaseModel, Field, WrapValidator, validator
+from typing import Annotated, Optional, List, Dict, Any, Literal
 from datetime import datetime
 from constants import CountryCode
 
@@ -55,6 +55,7 @@ class PizzaResponse(BaseModel):
     pizzas: List[Pizza]
     country_code: str
     currency: str
+    next_cursor: Optional[str] = None
 
 # Cart Models
 class CartItem(BaseModel):
@@ -140,6 +141,53 @@ class OrderSummary(BaseModel):
     items: List[Dict[str, Any]]
     timestamp: datetime
 
+# A batch entry: documented as a CheckoutRequest, but passed through raw so
+# the handler can validate entries one by one.
+CheckoutBatchEntry = Annotated[CheckoutRequest, WrapValidator(lambda value, handler: value)]
+
+class CheckoutBatchRequest(BaseModel):
+    """Bulk checkout. Each entry is a `POST /api/checkout` body; entries are
+    validated one by one so a bad entry fails alone, not the whole batch."""
+    orders: List[CheckoutBatchEntry] = Field(..., min_length=1, max_length=10000)
+
+class CheckoutBatchResult(BaseModel):
+    index: int
+    status_code: int
+    order: Optional[OrderSummary] = None
+    error: Optional[str] = None
+
+class CheckoutBatchResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[CheckoutBatchResult]
+
+# Quote Models
+class QuoteRequest(BaseModel):
+    """Price a cart without creating an order."""
+    country_code: CountryCode
+    items: List[CartItem]
+    tip_percentage: float = Field(0.0, ge=0, le=100)
+
+class QuoteLine(BaseModel):
+    pizza_id: str
+    size: str
+    quantity: int
+    topping_count: int
+    unit_price: float
+    line_total: float
+
+class QuoteResponse(BaseModel):
+    subtotal: float
+    delivery_fee: float
+    tax_rate: float
+    tip_percentage: float
+    tax: float
+    tip: float
+    total: float
+    currency: str
+    currency_symbol: str
+    items: List[QuoteLine]
+
 # Country Info Model
 class CountryInfo(BaseModel):
     code: str
@@ -0,0 +1,219 @@
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from constants import PIZZA_CATALOG, COUNTRY_CONFIG, CURRENCY_RATES, CountryCode
+
+SIZE_UPCHARGE_USD = {
+    "small": 0,
+    "medium": 3,
+    "large": 4,
+    "family": 5,
+}
+TOPPING_UPCHARGE_USD = 1
+
+
+def convert_usd_amount(
+    usd_amount: float,
+    conversion_rate: float,
+    decimal_places: int,
+) -> float:
+    converted = usd_amount * conversion_rate
+    if decimal_places == 0:
+        return float(round(converted))
+    return round(converted, decimal_places)
+
+
+def round_currency_amount(
+    amount: float,
+    decimal_places: int,
+) -> float:
+    if decimal_places == 0:
+        return float(round(amount))
+    return round(amount, decimal_places)
+
+
+# Column for sizes outside SIZE_UPCHARGE_USD: no upcharge, as before.
+_SIZES = list(SIZE_UPCHARGE_USD) + [None]
+_SIZE_INDEX = {size: index for index, size in enumerate(_SIZES)}
+_UNKNOWN_SIZE = _SIZE_INDEX[None]
+
+
+class CountryPriceTable:
+    """Unit prices for one market, precomputed from the catalog and rates.
+
+    A unit price is `base_plus_size[pizza, size] + topping_unit[pizza] * n`
+    for n toppings, where every term is computed exactly as the original
+    per-item code did (converted + rounded base, ceil'd upcharges at the
+    base's effective rate), and added in the same order, so totals are
+    bit-for-bit identical to the scalar formula."""
+
+    def __init__(self, country_code: CountryCode):
+        config = COUNTRY_CONFIG[country_code]
+        self.currency = config["currency"]
+        self.tax_rate = config["tax_rate"]
+        self.decimal_places = config.get("decimal_places", 2)
+        conversion_rate = CURRENCY_RATES[self.currency]
+        self.delivery_fee = convert_usd_amount(config["delivery_fee_usd"], conversion_rate, self.decimal_places)
+
+        self.pizza_index: Dict[str, int] = {}
+        # Python numbers for the scalar path, arrays for the batch path.
+        self._units: Dict[Tuple[str, Optional[str]], Tuple[Any, int]] = {}
+        base_plus_size = np.zeros((len(PIZZA_CATALOG), len(_SIZES)), dtype=np.float64)
+        topping_unit = np.zeros(len(PIZZA_CATALOG), dtype=np.int64)
+
+        for index, pizza in enumerate(PIZZA_CATALOG):
+            self.pizza_index[pizza["id"]] = index
+            converted_price = pizza["base_price"] * conversion_rate
+            if self.decimal_places == 0:
+                base_price = round(converted_price)
+            else:
+                base_price = round(converted_price, self.decimal_places)
+
+            rate = base_price / pizza["base_price"] if pizza["base_price"] > 0 else 1
+            pizza_topping_unit = math.ceil(TOPPING_UPCHARGE_USD * rate)
+            topping_unit[index] = pizza_topping_unit
+            for size in _SIZES:
+                size_add = math.ceil(SIZE_UPCHARGE_USD.get(size, 0) * rate)
+                self._units[(pizza["id"], size)] = (base_price + size_add, pizza_topping_unit)
+                base_plus_size[index, _SIZE_INDEX[size]] = base_price + size_add
+
+        self.base_plus_size = base_plus_size
+        self.topping_unit = topping_unit
+
+    def unit_price(self, pizza_id: str, size, topping_count: int):
+        """Unit price in local currency, or None for an unknown pizza."""
+        size_key = str(size).lower()
+        entry = self._units.get((pizza_id, size_key if size_key in SIZE_UPCHARGE_USD else None))
+        if entry is None:
+            return None
+        base_plus_size, pizza_topping_unit = entry
+        return base_plus_size + pizza_topping_unit * topping_count
+
+    def totals(self, subtotal: float, tip_percentage: float) -> Dict[str, float]:
+        decimal_places = self.decimal_places
+        subtotal = round_currency_amount(subtotal, decimal_places)
+        tax = round_currency_amount(subtotal * self.tax_rate, decimal_places)
+        tip = round_currency_amount(subtotal * (tip_percentage / 100), decimal_places)
+        total = round_currency_amount(subtotal + self.delivery_fee + tax + tip, decimal_places)
+
+        return {
+            "subtotal": subtotal,
+            "delivery_fee": round_currency_amount(self.delivery_fee, decimal_places),
+            "tax_rate": self.tax_rate,
+            "tip_percentage": round(tip_percentage, 2),
+            "tax": tax,
+            "tip": tip,
+            "total": total,
+            "currency": self.currency
+        }
+
+
+_TABLES: Dict[CountryCode, CountryPriceTable] = {}
+
+
+def get_table(country_code: CountryCode) -> CountryPriceTable:
+    table = _TABLES.get(country_code)
+    if table is None:
+        table = _TABLES[country_code] = CountryPriceTable(country_code)
+    return table
+
+
+def invalidate() -> None:
+    """Drop every price table. Call after PIZZA_CATALOG, COUNTRY_CONFIG or
+    CURRENCY_RATES change."""
+    _TABLES.clear()
+
+
+def order_total(
+    items: List[Dict[str, Any]],
+    country_code: CountryCode,
+    tip_percentage: float = 0.0,
+) -> Dict[str, float]:
+    """Price one cart (scalar path behind InMemoryDB.calculate_order_total)."""
+    table = get_table(country_code)
+    subtotal = 0.0
+    for item in items:
+        unit_price = table.unit_price(
+            item["pizza_id"], item.get("size", "small"), len(item.get("toppings") or [])
+        )
+        if unit_price is not None:
+            subtotal += unit_price * item["quantity"]
+    return table.totals(subtotal, tip_percentage)
+
+
+def quote_lines(items: List[Dict[str, Any]], country_code: CountryCode) -> List[Dict[str, Any]]:
+    """Per-item breakdown for a cart: unit and line price in local currency,
+    from the memoized (pizza, size) table entries. Unknown pizzas are left
+    out, exactly as order_total leaves them out of the subtotal."""
+    table = get_table(country_code)
+    lines = []
+    for item in items:
+        toppings = item.get("toppings") or []
+        unit_price = table.unit_price(item["pizza_id"], item.get("size", "small"), len(toppings))
+        if unit_price is None:
+            continue
+        lines.append({
+            "pizza_id": item["pizza_id"],
+            "size": item.get("size", "small"),
+            "quantity": item["quantity"],
+            "topping_count": len(toppings),
+            "unit_price": round_currency_amount(unit_price, table.decimal_places),
+            "line_total": round_currency_amount(unit_price * item["quantity"], table.decimal_places),
+        })
+    return lines
+
+
+def order_totals(
+    carts: Sequence[Tuple[List[Dict[str, Any]], CountryCode, float]],
+) -> List[Dict[str, float]]:
+    """Price many (items, country_code, tip_percentage) carts at once.
+
+    Per market, every line is gathered into flat index arrays and priced
+    with one vectorized table lookup, then laid out as a carts x items
+    matrix. Subtotals are summed column by column, which keeps each cart's
+    left-to-right float summation order (np.sum is pairwise and would not
+    match the scalar result). Rounding stays on Python floats for the same
+    reason. Returns one totals dict per cart, in input order."""
+    results: List[Optional[Dict[str, float]]] = [None] * len(carts)
+    by_country: Dict[CountryCode, List[int]] = {}
+    for position, (_, country_code, _) in enumerate(carts):
+        by_country.setdefault(country_code, []).append(position)
+
+    for country_code, positions in by_country.items():
+        table = get_table(country_code)
+        rows, cols, pizzas, sizes, toppings, quantities = [], [], [], [], [], []
+        width = 1
+        for row, position in enumerate(positions):
+            items = carts[position][0]
+            width = max(width, len(items))
+            for col, item in enumerate(items):
+                pizza = table.pizza_index.get(item["pizza_id"])
+                if pizza is None:
+                    continue
+                size_key = str(item.get("size", "small")).lower()
+                rows.append(row)
+                cols.append(col)
+                pizzas.append(pizza)
+                sizes.append(_SIZE_INDEX[size_key] if size_key in SIZE_UPCHARGE_USD else _UNKNOWN_SIZE)
+                toppings.append(len(item.get("toppings") or []))
+                quantities.append(item["quantity"])
+
+        lines = np.zeros((len(positions), width), dtype=np.float64)
+        if rows:
+            pizza_idx = np.asarray(pizzas, dtype=np.intp)
+            unit_prices = (
+                table.base_plus_size[pizza_idx, np.asarray(sizes, dtype=np.intp)]
+                + table.topping_unit[pizza_idx] * np.asarray(toppings, dtype=np.int64)
+            )
+            lines[np.asarray(rows), np.asarray(cols)] = unit_prices * np.asarray(quantities, dtype=np.float64)
+
+        subtotals = np.zeros(len(positions), dtype=np.float64)
+        for col in range(width):
+            subtotals += lines[:, col]
+
+        for row, position in enumerate(positions):
+            results[position] = table.totals(float(subtotals[row]), carts[position][2])
+
+    return results
@@ -0,0 +1,177 @@
+import asyncio
+import hmac
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+from config import settings
+
+# Opt-in sampling profiler, switched on per request.
+#
+# A request that carries `X-Debug-Profile: <settings.debug_key>` gets a
+# sampler thread for its lifetime. Every `profile_interval_ms` the sampler
+# grabs the event-loop thread's stack, but keeps it only while this request's
+# task is the one running, so concurrent requests do not leak in. Busy
+# threadpool workers (sync dependencies such as get_current_user) are
+# sampled too, under their own root frame; those samples may include other
+# requests' sync work under load. The result, in collapsed-stack format
+# ("frame;frame;frame count" lines, for flamegraph.pl or speedscope), goes
+# into a bounded ring buffer read by /api/debug/profiles.
+#
+# Off (no header, or no debug_key configured) the cost is one header scan.
+
+PROFILE_HEADER = b"x-debug-profile"
+MAX_STACK_DEPTH = 128
+_WORKER_THREAD_PREFIX = "AnyIO worker thread"
+_IDLE_MODULES = ("threading.py", "queue.py")
+
+_profiles: Deque[Dict[str, Any]] = deque(maxlen=max(settings.profile_buffer_size, 1))
+
+
+def recent_profiles() -> List[Dict[str, Any]]:
+    """Summaries of the buffered profiles, newest first."""
+    return [
+        {key: value for key, value in profile.items() if key != "stacks"}
+        for profile in reversed(_profiles)
+    ]
+
+
+def get_profile(profile_id: str) -> Optional[Dict[str, Any]]:
+    for profile in _profiles:
+        if profile["id"] == profile_id:
+            return profile
+    return None
+
+
+def collapsed(profile: Dict[str, Any]) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in profile["stacks"].most_common())
+
+
+def clear() -> None:
+    _profiles.clear()
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def _collapse(frame, root: str) -> str:
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    names.append(root)
+    return ";".join(reversed(names))
+
+
+def _is_idle(frame) -> bool:
+    # An idle worker parks in queue.get -> Condition.wait.
+    return os.path.basename(frame.f_code.co_filename) in _IDLE_MODULES
+
+
+class Sampler(threading.Thread):
+    def __init__(self, loop: asyncio.AbstractEventLoop, task: asyncio.Task, interval: float, max_seconds: float):
+        super().__init__(name="omnipizza-profiler", daemon=True)
+        self.loop = loop
+        self.task = task
+        self.loop_thread_id = threading.get_ident()
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._done = threading.Event()
+
+    def run(self) -> None:
+        deadline = time.perf_counter() + self.max_seconds
+        while not self._done.wait(self.interval) and time.perf_counter() < deadline:
+            self._sample()
+
+    def _sample(self) -> None:
+        frames = sys._current_frames()
+        if self._done.is_set():
+            # The request is over and finish() is waiting on us; not its work.
+            return
+        workers = {
+            thread.ident for thread in threading.enumerate()
+            if thread.name.startswith(_WORKER_THREAD_PREFIX)
+        }
+        self.samples += 1
+        loop_frame = frames.get(self.loop_thread_id)
+        if loop_frame is not None and asyncio.current_task(self.loop) is self.task:
+            self.stacks[_collapse(loop_frame, "event-loop")] += 1
+        for thread_id in workers:
+            frame = frames.get(thread_id)
+            if frame is not None and not _is_idle(frame):
+                self.stacks[_collapse(frame, "threadpool")] += 1
+
+    async def finish(self) -> None:
+        self._done.set()
+        # The thread may be mid-sample; wait for it off the event loop.
+        await self.loop.run_in_executor(None, self.join)
+
+
+def _enabled_for(headers) -> bool:
+    if not settings.debug_key:
+        return False
+    for name, value in headers:
+        if name == PROFILE_HEADER:
+            return hmac.compare_digest(value, settings.debug_key.encode())
+    return False
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware: profiles requests that opt in and tags their
+    response with `X-Profile-Id`."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _enabled_for(scope.get("headers") or ()):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex[:12]
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile_id.encode())
+                ]
+            await send(message)
+
+        sampler = Sampler(
+            asyncio.get_running_loop(),
+            asyncio.current_task(),
+            settings.profile_interval_ms / 1000,
+            settings.profile_max_seconds,
+        )
+        started_at = datetime.utcnow()
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            await sampler.finish()
+            route = scope.get("route")
+            _profiles.append({
+                "id": profile_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": getattr(route, "path", None),
+                "status_code": status_code,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+                "interval_ms": settings.profile_interval_ms,
+                "samples": sampler.samples,
+                "started_at": started_at.isoformat(),
+                "stacks": sampler.stacks,
+            })
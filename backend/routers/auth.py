@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, Request, Response, status, HTTPException
 from typing import List
 import uuid
 import random
@@ -11,8 +11,16 @@ from constants import TEST_USERS, SECURITY_GLITCH_PROFILE_FIELDS, SECURITY_GLITC
 from auth import authenticate_user, create_access_token
 from middleware import get_current_user
 from database import db
+from http_cache import PUBLIC_STATIC, etag_matches, make_etag, not_modified, set_cache_headers
+from server_timing import TimedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
+
+# TEST_USERS is static for the life of the process.
+_TEST_USERS_ETAG = make_etag(*(
+    (user["username"], getattr(user["behavior"], "value", user["behavior"]), user["description"])
+    for user in TEST_USERS.values()
+))
 
 # ==================== AUTH ENDPOINTS ====================
 
@@ -55,7 +63,7 @@ async def login(request: LoginRequest):
     if user["behavior"] == "security_glitch":
         field = random.choice(SECURITY_GLITCH_PROFILE_FIELDS)
         payload = random.choice(SECURITY_GLITCH_PAYLOADS)
-        db.seed_user_profile(sid, user["username"], {field: payload})
+        await db.run(db.seed_user_profile, sid, user["username"], {field: payload})
 
     return LoginResponse(
         access_token=access_token,
@@ -64,8 +72,11 @@ async def login(request: LoginRequest):
     )
 
 @router.get("/api/auth/users", response_model=List[UserProfile], tags=["Authentication"])
-async def get_test_users():
+async def get_test_users(request: Request, response: Response):
     """Get list of available test users for QA purposes"""
+    if etag_matches(request, _TEST_USERS_ETAG):
+        return not_modified(_TEST_USERS_ETAG, PUBLIC_STATIC)
+    set_cache_headers(response, PUBLIC_STATIC, _TEST_USERS_ETAG)
     return [
         UserProfile(
             username=user["username"],
@@ -92,7 +103,7 @@ async def get_profile(current_user: dict = Depends(get_current_user)):
     summary="Get the editable profile for the authenticated user",
 )
 async def get_user_profile(current_user: dict = Depends(get_current_user)):
-    profile = db.get_user_profile(current_user["session_id"], current_user["username"])
+    profile = await db.run(db.get_user_profile, current_user["session_id"], current_user["username"])
     return UserProfileDetails(**profile)
 
 
@@ -106,7 +117,8 @@ async def patch_user_profile(
     patch: UserProfileUpdate,
     current_user: dict = Depends(get_current_user),
 ):
-    updated = db.update_user_profile(
+    updated = await db.run(
+        db.update_user_profile,
         current_user["session_id"],
         current_user["username"],
         patch.dict(exclude_unset=True),
@@ -1,49 +1,47 @@
-from fastapi import APIRouter, Depends, Header, status, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, Header, Query, Request, status, HTTPException
+from typing import List, Optional
 
 from models import PizzaResponse, CountryInfo
-from constants import COUNTRY_CONFIG, CURRENCY_RATES, CountryCode
+from constants import COUNTRY_CONFIG, CountryCode
 from middleware import require_country_header, apply_user_behavior
-from database import db, convert_usd_amount
+from database import db
+from fast_json import FastJSONResponse, pizza_response_payload
+from http_cache import (
+    NO_STORE, PRIVATE_REVALIDATE, PUBLIC_STATIC,
+    cached_response, etag_matches, make_etag, not_modified, set_cache_headers,
+)
+import catalog_cache
+from catalog_store import tokenize
+from server_timing import TimedRoute
+
+router = APIRouter(route_class=TimedRoute)
 
-router = APIRouter()
 
 # ==================== COUNTRY ENDPOINTS ====================
 
 @router.get("/api/countries", response_model=List[CountryInfo], tags=["Countries"])
-async def get_countries():
+async def get_countries(request: Request):
     """Get list of supported countries with their configurations"""
-    countries = []
-    for code, config in COUNTRY_CONFIG.items():
-        decimal_places = config.get("decimal_places", 2)
-
-        countries.append(CountryInfo(
-            code=code.value,
-            currency=config["currency"],
-            currency_symbol=config["currency_symbol"],
-            required_fields=config["required_fields"],
-            optional_fields=config["optional_fields"],
-            tip_field=config["tip_field"],
-            tip_mode="percentage",
-            tip_percentages=config["tip_percentages"],
-            tax_rate=config["tax_rate"],
-            delivery_fee=convert_usd_amount(
-                config["delivery_fee_usd"],
-                CURRENCY_RATES[config["currency"]],
-                decimal_places,
-            ),
-            languages=config["languages"],
-            decimal_places=decimal_places
-        ))
-    return countries
+    # Static per deploy: served from the pre-serialized bytes.
+    return cached_response(request, catalog_cache.get_countries_entry(), PUBLIC_STATIC)
 
 # ==================== PIZZA CATALOG ENDPOINTS ====================
 
+# The body depends on the caller's behavior (via the token) and both headers.
+CATALOG_VARY = "Authorization, X-Country-Code, X-Language"
+# `limit` when a cursor is given without one.
+CATALOG_PAGE_SIZE = 50
+
 @router.get("/api/pizzas", response_model=PizzaResponse, tags=["Pizzas"])
 async def get_pizzas(
+    request: Request,
     country_code: str = Depends(require_country_header),
     current_user: dict = Depends(apply_user_behavior),
     x_language: str = Header("en", alias="X-Language"),
+    category: Optional[str] = Query(None, description="Only pizzas in this category (case-insensitive)"),
+    q: Optional[str] = Query(None, description="Words to find in names and descriptions, in any language; each word matches as a prefix"),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Page size; omit for every match"),
+    cursor: Optional[str] = Query(None, description="`next_cursor` from the previous page"),
 ):
     """
     Get pizza catalog with country-specific pricing and language support
@@ -51,23 +49,82 @@ async def get_pizzas(
     Headers:
     - X-Country-Code: MX | US | CH | JP | SA
     - X-Language: en | es | de | fr | ja | ar
+
+    `category` and `q` filter the catalog server-side. With `limit`, follow
+    `next_cursor` until it is null to walk the matches page by page.
     """
+    # A blank filter (`?q=`, `?q=!!`, `?category=`) is no filter: the full menu.
+    if category is not None and not category.strip():
+        category = None
+    if q is not None and not tokenize(q):
+        q = None
+    if category is not None or q is not None or limit is not None or cursor is not None:
+        return _catalog_page(request, country_code, current_user, x_language, category, q, limit, cursor)
+
     try:
         country = CountryCode(country_code)
 
+        # Deterministic behaviors are served from the pre-rendered bytes;
+        # only a11y_glitch (random per call) renders on every request.
+        entry = catalog_cache.get_catalog_entry(country, current_user["behavior"], x_language)
+        if entry is not None:
+            return cached_response(request, entry, PRIVATE_REVALIDATE, CATALOG_VARY)
+
         catalog = db.get_catalog(
             country_code=country,
             behavior=current_user["behavior"],
             language=x_language,   # ✅ CLAVE
         )
 
-        return PizzaResponse(
-            pizzas=catalog,
-            country_code=country.value,
-            currency=COUNTRY_CONFIG[country]["currency"]
+        return set_cache_headers(FastJSONResponse(pizza_response_payload(
+            catalog,
+            country.value,
+            COUNTRY_CONFIG[country]["currency"],
+        )), NO_STORE)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+
+def _catalog_page(request, country_code, current_user, language, category, q, limit, cursor):
+    # Filtered / paged catalog: the store's indexes pick the matching items,
+    # and only the page is translated, priced and serialized.
+    country = CountryCode(country_code)
+    behavior = current_user["behavior"]
+
+    etag = None
+    key = catalog_cache.cache_key(country, behavior, language)
+    if key is not None:
+        etag = make_etag(catalog_cache.content_version(), *key, category, q, limit, cursor)
+        if etag_matches(request, etag):
+            return not_modified(etag, PRIVATE_REVALIDATE, CATALOG_VARY)
+
+    store = catalog_cache.get_store()
+    if limit is None and cursor is not None:
+        limit = CATALOG_PAGE_SIZE
+    try:
+        pizzas, next_cursor = store.page(store.search(category, q), limit, cursor)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid cursor: {cursor}"
         )
+
+    try:
+        catalog = db.get_catalog(country_code=country, behavior=behavior, language=language, pizzas=pizzas)
+        response = FastJSONResponse(pizza_response_payload(
+            catalog,
+            country.value,
+            COUNTRY_CONFIG[country]["currency"],
+            next_cursor,
+        ))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
         )
+    if etag is None:
+        return set_cache_headers(response, NO_STORE)
+    return set_cache_headers(response, PRIVATE_REVALIDATE, etag, CATALOG_VARY)
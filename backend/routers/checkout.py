@@ -1,52 +1,45 @@
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, Query, Request, Response, status, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Any, Dict, List, Optional
+from pydantic import ValidationError
 
+import asyncio
 import random
-from models import CheckoutRequest, OrderSummary
+from datetime import datetime, timezone
+from models import (
+    CheckoutRequest, OrderSummary,
+    CheckoutBatchRequest, CheckoutBatchResponse,
+    QuoteRequest, QuoteResponse,
+)
 from constants import COUNTRY_CONFIG, CountryCode, SECURITY_GLITCH_LEAK_MESSAGES
 from middleware import apply_user_behavior, get_current_user
 from database import db
+from fast_json import FastJSONResponse, ndjson, order_summary_payload
+from http_cache import PRIVATE_REVALIDATE, etag_matches, make_etag, not_modified, set_cache_headers
+import catalog_cache
+from server_timing import TimedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 # ==================== CHECKOUT ENDPOINT ====================
 
-@router.post("/api/checkout", response_model=OrderSummary, tags=["Orders"])
-async def checkout(
-    request: CheckoutRequest,
-    current_user: dict = Depends(apply_user_behavior)
-):
-    """
-    Process checkout and create order
-    
-    Validates country-specific required fields:
-    - MX: colonia (required)
-    - US: zip_code (required, 5 digits)
-    - CH: plz (required)
-    - JP: prefectura (required)
-    - SA: district (required)
-
-    Market tip fields carry a percentage value:
-    - MX: propina
-    - US: tip
-    - CH: trinkgeld
-    - JP: chip
-    - SA: baksheesh
-    """
-    # Check if error_user/security_glitch_user should trigger an error
-    if db.should_trigger_error(current_user["behavior"]):
-        if current_user["behavior"] == "security_glitch":
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=random.choice(SECURITY_GLITCH_LEAK_MESSAGES)
-            )
-        raise HTTPException(
+def _checkout_error(behavior) -> Optional[HTTPException]:
+    """error_user/security_glitch_user random checkout failure, or None."""
+    if not db.should_trigger_error(behavior):
+        return None
+    if behavior == "security_glitch":
+        return HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Random checkout error triggered for testing purposes"
+            detail=random.choice(SECURITY_GLITCH_LEAK_MESSAGES)
         )
-    
-    # Validate country-specific fields
-    country_config = COUNTRY_CONFIG[request.country_code]
-    
+    return HTTPException(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        detail="Random checkout error triggered for testing purposes"
+    )
+
+
+def _validate_country_fields(request: CheckoutRequest, country_config: Dict[str, Any]) -> None:
     for field in country_config["required_fields"]:
         field_value = getattr(request, field, None)
         if not field_value:
@@ -54,18 +47,16 @@ async def checkout(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Field '{field}' is required for country {request.country_code.value}"
             )
-    
-    # Calculate totals
-    tip_percentage = request.get_tip_percentage()
-    totals = db.calculate_order_total(
-        [item.dict() for item in request.items],
-        request.country_code,
-        tip_percentage
-    )
-    
-    # Create order
+
+
+def _build_order_data(
+    request: CheckoutRequest,
+    username: str,
+    totals: Dict[str, Any],
+    country_config: Dict[str, Any],
+) -> Dict[str, Any]:
     order_data = {
-        "username": current_user["username"],
+        "username": username,
         "country_code": request.country_code.value,
         "items": [item.dict() for item in request.items],
         "customer_info": {
@@ -91,10 +82,10 @@ async def checkout(
                 order_data["customer_info"][field] = value
         elif value:
             order_data["customer_info"][field] = value
+    return order_data
 
-    order_id = db.create_order(order_data)
-    order = db.get_order(order_id)
-    
+
+def _order_summary(order: Dict[str, Any], country_config: Dict[str, Any]) -> OrderSummary:
     return OrderSummary(
         order_id=order["order_id"],
         subtotal=order["subtotal"],
@@ -110,20 +101,261 @@ async def checkout(
         timestamp=order["timestamp"]
     )
 
+
+@router.post("/api/checkout", response_model=OrderSummary, tags=["Orders"])
+async def checkout(
+    request: CheckoutRequest,
+    current_user: dict = Depends(apply_user_behavior)
+):
+    """
+    Process checkout and create order
+    
+    Validates country-specific required fields:
+    - MX: colonia (required)
+    - US: zip_code (required, 5 digits)
+    - CH: plz (required)
+    - JP: prefectura (required)
+    - SA: district (required)
+
+    Market tip fields carry a percentage value:
+    - MX: propina
+    - US: tip
+    - CH: trinkgeld
+    - JP: chip
+    - SA: baksheesh
+    """
+    # Check if error_user/security_glitch_user should trigger an error
+    error = _checkout_error(current_user["behavior"])
+    if error is not None:
+        raise error
+    
+    # Validate country-specific fields
+    country_config = COUNTRY_CONFIG[request.country_code]
+    _validate_country_fields(request, country_config)
+    
+    # Calculate totals
+    tip_percentage = request.get_tip_percentage()
+    totals = db.calculate_order_total(
+        [item.dict() for item in request.items],
+        request.country_code,
+        tip_percentage
+    )
+    
+    # Create order
+    order_data = _build_order_data(request, current_user["username"], totals, country_config)
+    order_id = await db.run(db.create_order, order_data)
+    order = await db.run(db.get_order, order_id)
+    
+    # Fast path: the stored order is already valid, so skip building an
+    # OrderSummary and FastAPI's re-validation of it (see fast_json.py).
+    return FastJSONResponse(order_summary_payload(order, country_config["currency_symbol"]))
+
+
+@router.post("/api/checkout/batch", response_model=CheckoutBatchResponse, tags=["Orders"])
+async def checkout_batch(
+    batch: CheckoutBatchRequest,
+    current_user: dict = Depends(apply_user_behavior)
+):
+    """
+    Create many orders in one call (bulk seeding / scale tests)
+
+    Each entry in `orders` is a `POST /api/checkout` body and goes through
+    the same validation, pricing and chaos rules, but failures are reported
+    per entry instead of failing the whole batch. Valid entries are priced
+    in one pass and inserted together; `results[i]` describes `orders[i]`.
+    """
+    # Validating and pricing up to 10k entries, and rendering their
+    # summaries, takes hundreds of ms: do both in the threadpool. Only the
+    # insert goes through the storage path.
+    results, accepted, orders_data = await run_in_threadpool(
+        _prepare_batch, batch.orders, current_user
+    )
+    await db.run(db.create_orders, orders_data)
+    return FastJSONResponse(await run_in_threadpool(
+        _batch_payload, results, accepted, orders_data
+    ))
+
+
+def _prepare_batch(raw_orders: List[Any], current_user: dict):
+    results: List[Optional[Dict[str, Any]]] = []
+    accepted = []  # (index, request, country_config)
+
+    for index, raw in enumerate(raw_orders):
+        try:
+            request = CheckoutRequest.model_validate(raw)
+        except ValidationError as exc:
+            results.append(_batch_result(
+                index,
+                status.HTTP_422_UNPROCESSABLE_ENTITY,
+                error="; ".join(
+                    f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}"
+                    for err in exc.errors()
+                ),
+            ))
+            continue
+
+        country_config = COUNTRY_CONFIG[request.country_code]
+        try:
+            error = _checkout_error(current_user["behavior"])
+            if error is not None:
+                raise error
+            _validate_country_fields(request, country_config)
+        except HTTPException as exc:
+            results.append(_batch_result(index, exc.status_code, error=exc.detail))
+            continue
+
+        results.append(None)
+        accepted.append((index, request, country_config))
+
+    totals = db.calculate_order_totals([
+        ([item.dict() for item in request.items], request.country_code, request.get_tip_percentage())
+        for _, request, _ in accepted
+    ])
+    orders_data = [
+        _build_order_data(request, current_user["username"], order_totals, country_config)
+        for (_, request, country_config), order_totals in zip(accepted, totals)
+    ]
+    return results, accepted, orders_data
+
+
+def _batch_result(index: int, status_code: int, order=None, error=None) -> Dict[str, Any]:
+    """`CheckoutBatchResult` dump."""
+    return {"index": index, "status_code": status_code, "order": order, "error": error}
+
+
+def _batch_payload(results, accepted, orders_data) -> Dict[str, Any]:
+    """`CheckoutBatchResponse` dump, once the accepted orders are stored."""
+    for (index, _, country_config), order in zip(accepted, orders_data):
+        results[index] = _batch_result(
+            index,
+            status.HTTP_200_OK,
+            order=order_summary_payload(order, country_config["currency_symbol"]),
+        )
+    return {
+        "created": len(accepted),
+        "failed": len(results) - len(accepted),
+        "results": results,
+    }
+
+@router.post("/api/quote", response_model=QuoteResponse, tags=["Orders"])
+async def quote(
+    request: QuoteRequest,
+    current_user: dict = Depends(apply_user_behavior)
+):
+    """
+    Price a cart without creating an order
+
+    Returns the same totals `POST /api/checkout` would charge for these
+    items, plus per-item unit and line prices (size and topping upcharges
+    included). Nothing is stored, so clients can re-quote on every cart
+    edit. Unknown `pizza_id`s are skipped, as at checkout.
+    """
+    return QuoteResponse(**db.quote_order(
+        [item.dict() for item in request.items],
+        request.country_code,
+        request.tip_percentage,
+    ))
+
+
 @router.get("/api/orders", tags=["Orders"])
-async def get_orders(current_user: dict = Depends(get_current_user)):
-    """Get order history for current user"""
-    orders = db.get_user_orders(current_user["username"])
-    return {"orders": orders}
+async def get_orders(
+    current_user: dict = Depends(get_current_user),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Page size; omit for the full history"),
+    cursor: Optional[str] = Query(None, description="`next_cursor` from the previous page"),
+):
+    """Get order history for current user, oldest first.
+
+    Without `limit` the whole history is returned. With `limit`, follow
+    `next_cursor` until it is null to walk the history page by page."""
+    if limit is None and cursor is None:
+        return {"orders": await db.run(db.get_user_orders, current_user["username"]), "next_cursor": None}
+
+    after = None
+    if cursor is not None:
+        # isdigit() alone accepts "²" and other Unicode digits int() rejects.
+        if not (cursor.isascii() and cursor.isdigit()):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid cursor: {cursor}"
+            )
+        after = int(cursor)
+
+    orders, next_cursor = await db.run(db.get_user_orders_page, current_user["username"], limit or 50, after)
+    return {
+        "orders": orders,
+        "next_cursor": str(next_cursor) if next_cursor is not None else None,
+    }
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Order timestamps are naive UTC; accept "...Z"/offset inputs too.
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+# Declared before /api/orders/{order_id} so "export" is not read as an id.
+@router.get(
+    "/api/orders/export",
+    tags=["Orders"],
+    response_class=StreamingResponse,
+    responses={200: {
+        "content": {"application/x-ndjson": {}},
+        "description": "One order per line, oldest first",
+    }},
+)
+async def export_orders(
+    current_user: dict = Depends(get_current_user),
+    country: Optional[CountryCode] = Query(None, description="Only orders placed in this market"),
+    since: Optional[datetime] = Query(None, description="Orders at or after this time (UTC)"),
+    until: Optional[datetime] = Query(None, description="Orders before this time (UTC)"),
+):
+    """Stream the caller's order history as NDJSON, oldest first.
+
+    Orders are read and written in chunks of 500, so memory use does not
+    grow with the history and the first line goes out right away."""
+    since, until = _naive_utc(since), _naive_utc(until)
+    if since is not None and until is not None and since >= until:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="`since` must be earlier than `until`"
+        )
+
+    chunks = db.iter_user_orders(
+        current_user["username"],
+        country_code=country.value if country is not None else None,
+        since=since,
+        until=until,
+    )
+
+    async def stream():
+        # One storage page per step, read off the loop for blocking backends;
+        # pages with no matching orders write nothing but still give other
+        # requests a turn, so a filter that matches nothing cannot hold the
+        # loop for the whole history.
+        while True:
+            chunk = await db.run(next, chunks, None)
+            if chunk is None:
+                return
+            if chunk:
+                yield ndjson(chunk)
+            await asyncio.sleep(0)
+
+    return StreamingResponse(
+        stream(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="orders.ndjson"'},
+    )
 
 @router.get("/api/orders/{order_id}", response_model=OrderSummary, tags=["Orders"])
 async def get_order(
     order_id: str,
+    request: Request,
+    response: Response,
     current_user: dict = Depends(get_current_user)
 ):
     """Get specific order details — returns the same OrderSummary shape as /api/checkout
     so clients can hydrate order state from a single canonical contract."""
-    order = db.get_order(order_id)
+    order = await db.run(db.get_order, order_id)
 
     if not order:
         raise HTTPException(
@@ -137,19 +369,16 @@ async def get_order(
             detail="Access denied"
         )
 
+    # Only checked after the ownership check, so a 304 never confirms that
+    # someone else's order exists. Orders are immutable apart from status.
+    etag = make_etag(
+        "order", order["order_id"], order["timestamp"].isoformat(), order["status"],
+        catalog_cache.content_version(),
+    )
+    if etag_matches(request, etag):
+        return not_modified(etag, PRIVATE_REVALIDATE, "Authorization")
+    set_cache_headers(response, PRIVATE_REVALIDATE, etag, "Authorization")
+
     country_config = COUNTRY_CONFIG[CountryCode(order["country_code"])]
 
-    return OrderSummary(
-        order_id=order["order_id"],
-        subtotal=order["subtotal"],
-        delivery_fee=order["delivery_fee"],
-        tax_rate=order["tax_rate"],
-        tip_percentage=order["tip_percentage"],
-        tax=order["tax"],
-        tip=order["tip"],
-        total=order["total"],
-        currency=order["currency"],
-        currency_symbol=country_config["currency_symbol"],
-        items=order["items"],
-        timestamp=order["timestamp"]
-    )
+    return _order_summary(order, country_config)
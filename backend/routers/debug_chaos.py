@@ -1,24 +1,48 @@
+import asyncio
 import time
 import random
 from datetime import datetime
+from typing import Optional
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Query
 from prometheus_client import generate_latest
 from starlette.responses import Response
 
+import profiler
+import tracing
+from chaos import ConcurrencyCap, CpuPool
 from config import settings
 from constants import TEST_USERS, CountryCode
 from database import db
+from server_timing import TimedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
+
+spike_cap = ConcurrencyCap(settings.chaos_max_latency_spikes)
+cpu_pool = CpuPool(settings.chaos_cpu_workers, settings.chaos_max_cpu_tasks)
+
+
+def _at_capacity(endpoint: str, limit: int) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=f"Too many concurrent {endpoint} requests (limit {limit})",
+        headers={"Retry-After": "1"}
+    )
 
 # ==================== DEBUG/CHAOS ENDPOINTS ====================
 
 @router.get("/api/debug/latency-spike", tags=["Debug"])
-async def latency_spike():
-    """Simulate random latency between 0.5s and 5s"""
-    delay = random.uniform(0.5, 5.0)
-    time.sleep(delay)
+async def latency_spike(
+    duration: Optional[float] = Query(None, ge=0, le=30, description="Fixed delay in seconds (default: random 0.5-5s)"),
+):
+    """Simulate latency without blocking other requests"""
+    delay = duration if duration is not None else random.uniform(0.5, 5.0)
+    if not spike_cap.try_acquire():
+        raise _at_capacity("latency-spike", spike_cap.limit)
+    try:
+        await asyncio.sleep(delay)
+    finally:
+        spike_cap.release()
     return {
         "message": "Latency spike completed",
         "delay_seconds": round(delay, 2),
@@ -26,20 +50,30 @@ async def latency_spike():
     }
 
 @router.get("/api/debug/cpu-load", tags=["Debug"])
-async def cpu_load():
-    """Generate CPU load with Fibonacci calculation"""
-    def fibonacci(n):
-        if n <= 1:
-            return n
-        return fibonacci(n - 1) + fibonacci(n - 2)
-    
-    start_time = time.time()
-    result = fibonacci(35)  # Heavy calculation
-    duration = time.time() - start_time
-    
+async def cpu_load(
+    intensity: int = Query(35, ge=1, le=38, description="Fibonacci n; each +1 costs ~1.6x"),
+    parallelism: int = Query(1, ge=1, le=8, description="Concurrent calculations in the worker pool"),
+):
+    """Generate CPU load with Fibonacci calculations in a bounded process pool"""
+    if parallelism > cpu_pool.cap.limit:
+        raise HTTPException(
+            status_code=400,
+            detail=f"parallelism must be <= {cpu_pool.cap.limit}"
+        )
+    if not cpu_pool.cap.try_acquire(parallelism):
+        raise _at_capacity("cpu-load", cpu_pool.cap.limit)
+    try:
+        start_time = time.time()
+        results = await cpu_pool.fibonacci(intensity, parallelism)
+        duration = time.time() - start_time
+    finally:
+        cpu_pool.cap.release(parallelism)
+
     return {
         "message": "CPU load test completed",
-        "fibonacci_35": result,
+        f"fibonacci_{intensity}": results[0],
+        "intensity": intensity,
+        "parallelism": parallelism,
         "duration_seconds": round(duration, 3),
         "timestamp": datetime.utcnow().isoformat()
     }
@@ -49,6 +83,38 @@ async def metrics():
     """Prometheus-compatible metrics endpoint"""
     return Response(content=generate_latest(), media_type="text/plain")
 
+@router.get("/api/debug/profiles", tags=["Debug"])
+async def list_profiles():
+    """Recently captured request profiles (send X-Debug-Profile to capture one)"""
+    return {
+        "enabled": bool(settings.debug_key),
+        "profiles": profiler.recent_profiles(),
+    }
+
+@router.get("/api/debug/profiles/{profile_id}", tags=["Debug"])
+async def get_profile(profile_id: str):
+    """One profile as collapsed stacks, ready for flamegraph.pl or speedscope"""
+    profile = profiler.get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return Response(content=profiler.collapsed(profile), media_type="text/plain")
+
+@router.get("/api/debug/traces", tags=["Debug"])
+async def list_traces(
+    limit: int = Query(20, ge=1, le=500),
+    name: Optional[str] = Query(None, description="Only traces whose root span name contains this, e.g. /api/checkout"),
+):
+    """Slowest recent traces, slowest first"""
+    return {"traces": tracing.collector.slowest(limit, name)}
+
+@router.get("/api/debug/traces/{trace_id}", tags=["Debug"])
+async def get_trace(trace_id: str):
+    """One trace with all its spans"""
+    trace = tracing.collector.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return trace
+
 @router.get("/api/debug/info", tags=["Debug"])
 async def debug_info():
     """Get debug information about the application"""
@@ -56,7 +122,7 @@ async def debug_info():
         "app_name": settings.app_name,
         "version": settings.app_version,
         "environment": settings.environment,
-        "total_orders": len(db.orders),
+        "total_orders": await db.run(db.order_count),
         "test_users": list(TEST_USERS.keys()),
         "supported_countries": [c.value for c in CountryCode],
         "timestamp": datetime.utcnow().isoformat()
@@ -0,0 +1,186 @@
+import asyncio
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional, Set
+
+from fastapi.routing import APIRoute
+from starlette.responses import JSONResponse
+
+import tracing
+from config import settings
+
+# Server-Timing breakdown of each request (https://w3c.github.io/server-timing/).
+#
+# ServerTimingMiddleware puts a RequestTiming in a context variable; code on
+# the request path adds to named phases with `phase(...)` / `@timed(...)`.
+# Threadpool calls run in a copy of the context, so sync dependencies record
+# into the same object. Phases:
+#
+#   admission      bulkhead classification and queueing (bulkhead.py)
+#   auth           get_current_user: token cache / decode_access_token
+#   behavior       apply_user_behavior: injected latency
+#   db             InMemoryDB data access and pricing
+#   handler        the endpoint function itself (includes db)
+#   validation     request parsing, dependency solving and response-model
+#                  validation/encoding: route time not in the phases above
+#   serialization  JSON rendering of the response body
+#   app            everything up to the response headers
+#
+# A phase that is already running is not re-entered, so nested timed calls
+# (get_enriched_cart -> calculate_order_total) count once. Durations are
+# reported in milliseconds; phases that did not run are omitted. Each phase
+# is also a tracing span (tracing.py), nested calls included.
+
+PHASES = ("admission", "auth", "behavior", "db", "handler", "validation", "serialization")
+
+
+class RequestTiming:
+    __slots__ = ("durations", "active", "serialization_in_handler")
+
+    def __init__(self):
+        self.durations: Dict[str, float] = {}
+        self.active: Set[str] = set()
+        self.serialization_in_handler = 0.0
+
+    def add(self, name: str, seconds: float) -> None:
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def header_value(self, total: float) -> bytes:
+        entries = [
+            f"{name};dur={self.durations[name] * 1000:.3f}"
+            for name in PHASES if name in self.durations
+        ]
+        entries.append(f"app;dur={total * 1000:.3f}")
+        return ", ".join(entries).encode("latin-1")
+
+
+_current: ContextVar[Optional[RequestTiming]] = ContextVar("server_timing", default=None)
+
+
+@contextmanager
+def phase(name: str, span_name: Optional[str] = None):
+    """Time the block as phase `name`, inside a span named `span_name`
+    (default: the phase name)."""
+    with tracing.span(span_name or name):
+        timing = _current.get()
+        if timing is None or name in timing.active:
+            yield
+            return
+        timing.active.add(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            timing.add(name, time.perf_counter() - start)
+            timing.active.discard(name)
+
+
+def timed(name: str) -> Callable:
+    """Decorator form of `phase` for sync functions; the span is named
+    "<phase>.<function>", e.g. "db.get_catalog"."""
+    def decorator(func):
+        span_name = f"{name}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(name, span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TimedJSONResponse(JSONResponse):
+    """The app's default response class: JSONResponse with its rendering
+    recorded as `serialization`."""
+
+    def render(self, content) -> bytes:
+        with phase("serialization"):
+            return super().render(content)
+
+
+class TimedRoute(APIRoute):
+    """Route class that records the endpoint call as `handler` and derives
+    `validation` from the rest of the route's time."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The request handler built by APIRoute looks dependant.call up per
+        # request, and decided sync vs async from the original: keep the kind.
+        call = self.dependant.call
+        span_name = f"handler {call.__name__}"
+        if asyncio.iscoroutinefunction(call):
+            @functools.wraps(call)
+            async def timed_call(**values):
+                with _handler_phase(span_name):
+                    return await call(**values)
+        else:
+            @functools.wraps(call)
+            def timed_call(**values):
+                with _handler_phase(span_name):
+                    return call(**values)
+        self.dependant.call = timed_call
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            timing = _current.get()
+            if timing is None:
+                return await handler(request)
+            start = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                _record_validation(timing, time.perf_counter() - start)
+
+        return timed_handler
+
+
+@contextmanager
+def _handler_phase(span_name: str):
+    with phase("handler", span_name):
+        yield
+    timing = _current.get()
+    if timing is not None:
+        timing.serialization_in_handler = timing.durations.get("serialization", 0.0)
+
+
+def _record_validation(timing: RequestTiming, route_seconds: float) -> None:
+    durations = timing.durations
+    accounted = (
+        durations.get("handler", 0.0)
+        + durations.get("auth", 0.0)
+        + durations.get("behavior", 0.0)
+        + durations.get("serialization", 0.0) - timing.serialization_in_handler
+    )
+    timing.add("validation", max(route_seconds - accounted, 0.0))
+
+
+class ServerTimingMiddleware:
+    """Pure ASGI middleware: adds `Server-Timing` to every response."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.server_timing_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        timing = RequestTiming()
+        token = _current.set(timing)
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timing.header_value(time.perf_counter() - start)))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
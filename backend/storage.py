@@ -0,0 +1,579 @@
+import bisect
+import logging
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from metrics import STORAGE_ENTRIES, STORAGE_EVICTIONS
+
+logger = logging.getLogger("omnipizza.storage")
+
+# Storage backends behind InMemoryDB. InMemoryDB owns the business rules
+# (defaults, pricing, behaviors); a backend only stores and fetches records:
+#   orders    order_id -> order dict, plus a per-user, creation-ordered index
+#   sessions  username -> per-user test session (market + cart)
+#   profiles  session_id -> editable profile
+# Backends hand out records the caller may mutate; a change is only stored
+# once it is written back with put_session / put_profile. A `blocking`
+# backend does disk I/O per call, so async handlers reach it through
+# InMemoryDB.run(), which moves the call to the threadpool.
+
+OrderPage = Tuple[List[Dict[str, Any]], Optional[int]]
+
+
+class RetentionPolicy:
+    """Bounds for the stores; 0 means unlimited. Sessions and profiles are
+    evicted least-recently-used first (capacity) or once idle for longer than
+    their TTL; orders are evicted oldest first (capacity or age)."""
+
+    def __init__(
+        self,
+        max_orders: int = 0,
+        order_max_age_seconds: float = 0,
+        max_sessions: int = 0,
+        session_idle_seconds: float = 0,
+        max_profiles: int = 0,
+        profile_idle_seconds: float = 0,
+    ):
+        self.max_orders = max_orders
+        self.order_max_age_seconds = order_max_age_seconds
+        self.max_sessions = max_sessions
+        self.session_idle_seconds = session_idle_seconds
+        self.max_profiles = max_profiles
+        self.profile_idle_seconds = profile_idle_seconds
+
+    @classmethod
+    def from_settings(cls, settings) -> "RetentionPolicy":
+        return cls(
+            max_orders=settings.retention_max_orders,
+            order_max_age_seconds=settings.retention_order_max_age_seconds,
+            max_sessions=settings.retention_max_sessions,
+            session_idle_seconds=settings.retention_session_idle_seconds,
+            max_profiles=settings.retention_max_profiles,
+            profile_idle_seconds=settings.retention_profile_idle_seconds,
+        )
+
+
+def _order_created_at(order: Dict[str, Any]) -> float:
+    timestamp = order.get("timestamp")
+    if isinstance(timestamp, datetime):
+        # Orders carry naive UTC timestamps (datetime.utcnow()).
+        return timestamp.replace(tzinfo=timezone.utc).timestamp()
+    return time.time()
+
+
+class _IdleStore:
+    """key -> value kept in least-recently-used order with last-touch times.
+    Both eviction rules only ever pop from the front of the OrderedDict, so
+    enforcing them never scans live entries."""
+
+    def __init__(self, name: str, max_entries: int, idle_seconds: float):
+        self.max_entries = max_entries
+        self.idle_seconds = idle_seconds
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._evicted_ttl = STORAGE_EVICTIONS.labels(name, "ttl")
+        self._evicted_capacity = STORAGE_EVICTIONS.labels(name, "capacity")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        self._data[key] = (entry[0], time.monotonic())
+        self._data.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        self._data[key] = (value, time.monotonic())
+        self._data.move_to_end(key)
+        self.evict()
+
+    def pop(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def evict(self) -> None:
+        data = self._data
+        if self.max_entries:
+            while len(data) > self.max_entries:
+                data.popitem(last=False)
+                self._evicted_capacity.inc()
+        if self.idle_seconds:
+            cutoff = time.monotonic() - self.idle_seconds
+            while data:
+                _, touched_at = next(iter(data.values()))
+                if touched_at >= cutoff:
+                    break
+                data.popitem(last=False)
+                self._evicted_ttl.inc()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {k: dict(v[0]) for k, v in list(self._data.items())}
+
+    def load(self, values: Dict[str, Dict[str, Any]]) -> None:
+        now = time.monotonic()
+        self._data = OrderedDict((k, (v, now)) for k, v in values.items())
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class MemoryStorage:
+    """Process-local dicts. Fastest, but every uvicorn worker gets its own
+    copy, so this backend only supports a single worker."""
+
+    shared = False
+    blocking = False
+
+    def __init__(self, retention: Optional[RetentionPolicy] = None):
+        self.retention = retention or RetentionPolicy()
+        self.orders: Dict[str, Dict[str, Any]] = {}
+        self.sessions = _IdleStore("sessions", self.retention.max_sessions, self.retention.session_idle_seconds)
+        self.user_profiles = _IdleStore("profiles", self.retention.max_profiles, self.retention.profile_idle_seconds)
+        # username -> order ids in creation order, plus the parallel list of
+        # their global sequence numbers so a cursor (a sequence number) is
+        # found by bisect instead of scanning every order.
+        self.user_order_ids: Dict[str, List[str]] = {}
+        self.user_order_seqs: Dict[str, List[int]] = {}
+        self.order_seq = 0
+        # (created_at, order_id) in creation order: the expiry queue for
+        # orders. Evicting pops from the left, so each order costs O(1) to
+        # expire. The evicted ids stay in the per-user index as a dead
+        # prefix (counted in _user_order_dead) and are trimmed in bulk.
+        self._order_expiry: deque = deque()
+        self._user_order_dead: Dict[str, int] = {}
+        self._evicted_age = STORAGE_EVICTIONS.labels("orders", "age")
+        self._evicted_capacity = STORAGE_EVICTIONS.labels("orders", "capacity")
+        STORAGE_ENTRIES.labels("orders").set_function(lambda: len(self.orders))
+        STORAGE_ENTRIES.labels("sessions").set_function(lambda: len(self.sessions))
+        STORAGE_ENTRIES.labels("profiles").set_function(lambda: len(self.user_profiles))
+
+    # ---------- orders ----------
+
+    def add_order(self, order: Dict[str, Any]) -> int:
+        order_id = order["order_id"]
+        username = order.get("username")
+        self.order_seq += 1
+        self.orders[order_id] = order
+        self.user_order_ids.setdefault(username, []).append(order_id)
+        self.user_order_seqs.setdefault(username, []).append(self.order_seq)
+        self._order_expiry.append((_order_created_at(order), order_id))
+        self._evict_orders()
+        return self.order_seq
+
+    def add_orders(self, orders: List[Dict[str, Any]]) -> None:
+        for order in orders:
+            self.add_order(order)
+
+    def _evict_orders(self) -> None:
+        expiry = self._order_expiry
+        max_orders = self.retention.max_orders
+        if max_orders:
+            while len(self.orders) > max_orders and expiry:
+                self._drop_order(expiry.popleft()[1])
+                self._evicted_capacity.inc()
+        if self.retention.order_max_age_seconds and expiry:
+            cutoff = time.time() - self.retention.order_max_age_seconds
+            while expiry and expiry[0][0] < cutoff:
+                self._drop_order(expiry.popleft()[1])
+                self._evicted_age.inc()
+
+    def _drop_order(self, order_id: str) -> None:
+        order = self.orders.pop(order_id, None)
+        if order is None:
+            return
+        # Orders expire oldest first, so the evicted id is at the front of
+        # its user's index; trim the dead prefix once it is half the list.
+        username = order.get("username")
+        dead = self._user_order_dead.get(username, 0) + 1
+        order_ids = self.user_order_ids.get(username, [])
+        if dead * 2 >= len(order_ids):
+            del order_ids[:dead]
+            del self.user_order_seqs[username][:dead]
+            dead = 0
+        self._user_order_dead[username] = dead
+
+    def get_order(self, order_id: str) -> Optional[Dict[str, Any]]:
+        return self.orders.get(order_id)
+
+    def has_order(self, order_id: str) -> bool:
+        return order_id in self.orders
+
+    def order_count(self) -> int:
+        return len(self.orders)
+
+    def user_orders(self, username: str, after: Optional[int] = None, limit: Optional[int] = None) -> OrderPage:
+        order_ids = self.user_order_ids.get(username, [])
+        seqs = self.user_order_seqs.get(username, [])
+        start = self._user_order_dead.get(username, 0)
+        if after is not None:
+            start = max(start, bisect.bisect_right(seqs, after))
+        end = len(order_ids) if limit is None else min(start + limit, len(order_ids))
+        page = [self.orders[order_id] for order_id in order_ids[start:end] if order_id in self.orders]
+        next_cursor = seqs[end - 1] if end < len(order_ids) else None
+        return page, next_cursor
+
+    # ---------- sessions ----------
+
+    def get_session(self, username: str) -> Optional[Dict[str, Any]]:
+        return self.sessions.get(username)
+
+    def put_session(self, username: str, session: Dict[str, Any]) -> None:
+        self.sessions.put(username, session)
+
+    def delete_session(self, username: str) -> None:
+        self.sessions.pop(username)
+
+    # ---------- profiles ----------
+
+    def get_profile(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return self.user_profiles.get(session_id)
+
+    def put_profile(self, session_id: str, profile: Dict[str, Any]) -> None:
+        self.user_profiles.put(session_id, profile)
+
+    def delete_profile(self, session_id: str) -> None:
+        self.user_profiles.pop(session_id)
+
+    # ---------- snapshots (journal.py) ----------
+
+    def export_state(self) -> Dict[str, Any]:
+        """Point-in-time copy of every store, safe to pickle while the stores
+        keep changing. Call it where the stores are mutated (the event loop),
+        as journal.py does."""
+        return {
+            "orders": dict(self.orders),
+            "sessions": self.sessions.snapshot(),
+            "user_profiles": self.user_profiles.snapshot(),
+            "user_order_ids": {k: list(v) for k, v in list(self.user_order_ids.items())},
+            "user_order_seqs": {k: list(v) for k, v in list(self.user_order_seqs.items())},
+            "user_order_dead": dict(self._user_order_dead),
+            "order_expiry": list(self._order_expiry),
+            "order_seq": self.order_seq,
+        }
+
+    def load_state(self, state: Dict[str, Any]) -> None:
+        self.orders = state["orders"]
+        self.sessions.load(state["sessions"])
+        self.user_profiles.load(state["user_profiles"])
+        self.user_order_ids = state["user_order_ids"]
+        self.user_order_seqs = state["user_order_seqs"]
+        self._user_order_dead = state.get("user_order_dead", {})
+        self._order_expiry = deque(state.get("order_expiry", ()))
+        self.order_seq = state["order_seq"]
+        self._evict_orders()
+        self.sessions.evict()
+        self.user_profiles.evict()
+
+
+# Version 1 added orders.created_at and sessions/profiles.touched_at
+# (retention). Files from before it are upgraded in place by _migrate().
+SCHEMA_VERSION = 1
+
+_TABLES = (
+    """CREATE TABLE IF NOT EXISTS orders (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_id TEXT NOT NULL UNIQUE,
+        username TEXT,
+        created_at REAL NOT NULL,
+        data BLOB NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS sessions (
+        username TEXT PRIMARY KEY,
+        touched_at REAL NOT NULL,
+        data BLOB NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS profiles (
+        session_id TEXT PRIMARY KEY,
+        touched_at REAL NOT NULL,
+        data BLOB NOT NULL
+    )""",
+)
+_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS orders_by_user ON orders (username, seq)",
+    "CREATE INDEX IF NOT EXISTS sessions_by_touch ON sessions (touched_at)",
+    "CREATE INDEX IF NOT EXISTS profiles_by_touch ON profiles (touched_at)",
+)
+# Key column of the tables whose rows expire by touched_at.
+_TOUCH_KEYS = {"sessions": "username", "profiles": "session_id"}
+_RETENTION_COLUMNS = (("orders", "created_at"), ("sessions", "touched_at"), ("profiles", "touched_at"))
+
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    """Create or upgrade the schema to SCHEMA_VERSION. Runs in one write
+    transaction, so workers starting together upgrade a file exactly once."""
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for statement in _TABLES:
+            conn.execute(statement)
+        now = time.time()
+        for table, column in _RETENTION_COLUMNS:
+            columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if column in columns:
+                continue
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} REAL NOT NULL DEFAULT 0")
+            if table == "orders":
+                # Age existing orders from their own timestamps.
+                conn.executemany(
+                    "UPDATE orders SET created_at = ? WHERE seq = ?",
+                    [
+                        (_order_created_at(pickle.loads(data)), seq)
+                        for seq, data in conn.execute("SELECT seq, data FROM orders").fetchall()
+                    ],
+                )
+            else:
+                # Unknown last use: idle time starts now.
+                conn.execute(f"UPDATE {table} SET {column} = ?", (now,))
+            logger.info("storage.sqlite migrated table=%s added=%s", table, column)
+        for statement in _INDEXES:
+            conn.execute(statement)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _dumps(value: Dict[str, Any]) -> bytes:
+    return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+class SQLiteStorage:
+    """One SQLite file in WAL mode shared by every worker process on the
+    host, so a cart seeded through one worker is visible to all others.
+
+    Connections are pooled per thread (sqlite3 connections must not be
+    shared across threads): the event loop and each threadpool thread open
+    theirs once and reuse it. WAL lets readers proceed while a writer
+    commits; writers across workers serialize on SQLite's file lock."""
+
+    shared = True
+    blocking = True
+
+    # Retention runs as indexed range deletes (orders by seq/created_at,
+    # sessions/profiles by touched_at) once every this many writes, so its
+    # cost is amortized instead of paid per request. Idle time is measured
+    # from the last read or write, as in MemoryStorage: reads record their
+    # touch in memory and the touches are written as one batch when
+    # EVICT_EVERY keys are pending, when the oldest is TOUCH_FLUSH_SECONDS
+    # old, and always right before eviction.
+    EVICT_EVERY = 500
+    TOUCH_FLUSH_SECONDS = 60.0
+
+    def __init__(self, path: str, retention: Optional[RetentionPolicy] = None, busy_timeout_ms: int = 5000):
+        self.path = path
+        self.retention = retention or RetentionPolicy()
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        self._touches: Dict[str, Dict[str, float]] = {table: {} for table in _TOUCH_KEYS}
+        self._touches_since: Optional[float] = None
+        self._touches_lock = threading.Lock()
+        _migrate(self._connection())
+        for store in ("orders", "sessions", "profiles"):
+            STORAGE_ENTRIES.labels(store).set_function(lambda store=store: self._count(store))
+        logger.info("storage.sqlite path=%s", path)
+
+    def _count(self, table: str) -> int:
+        return self._connection().execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def _wrote(self, count: int = 1) -> None:
+        # Writes come from several threadpool threads at once.
+        with self._writes_lock:
+            before = self._writes
+            self._writes += count
+            due = before // self.EVICT_EVERY != self._writes // self.EVICT_EVERY
+        if due:
+            self.evict()
+
+    def _touched(self, table: str, key: str) -> None:
+        # Reads come from several threadpool threads at once.
+        now = time.time()
+        with self._touches_lock:
+            self._touches[table][key] = now
+            if self._touches_since is None:
+                self._touches_since = now
+            due = (
+                sum(len(pending) for pending in self._touches.values()) >= self.EVICT_EVERY
+                or now - self._touches_since >= self.TOUCH_FLUSH_SECONDS
+            )
+        if due:
+            self.flush_touches()
+
+    def flush_touches(self) -> None:
+        """Write pending read touches to touched_at, never moving it back."""
+        with self._touches_lock:
+            touches = self._touches
+            self._touches = {table: {} for table in _TOUCH_KEYS}
+            self._touches_since = None
+        if not any(touches.values()):
+            return
+        conn = self._connection()
+        conn.execute("BEGIN")
+        try:
+            for table, pending in touches.items():
+                conn.executemany(
+                    f"UPDATE {table} SET touched_at = MAX(touched_at, ?) WHERE {_TOUCH_KEYS[table]} = ?",
+                    [(touched_at, key) for key, touched_at in pending.items()],
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def evict(self) -> None:
+        self.flush_touches()
+        conn = self._connection()
+        retention = self.retention
+        now = time.time()
+        if retention.max_orders:
+            deleted = conn.execute(
+                "DELETE FROM orders WHERE seq <= (SELECT MAX(seq) FROM orders) - ?",
+                (retention.max_orders,),
+            ).rowcount
+            STORAGE_EVICTIONS.labels("orders", "capacity").inc(max(deleted, 0))
+        if retention.order_max_age_seconds:
+            deleted = conn.execute(
+                "DELETE FROM orders WHERE created_at < ?",
+                (now - retention.order_max_age_seconds,),
+            ).rowcount
+            STORAGE_EVICTIONS.labels("orders", "age").inc(max(deleted, 0))
+        for table, max_entries, idle_seconds in (
+            ("sessions", retention.max_sessions, retention.session_idle_seconds),
+            ("profiles", retention.max_profiles, retention.profile_idle_seconds),
+        ):
+            if idle_seconds:
+                deleted = conn.execute(
+                    f"DELETE FROM {table} WHERE touched_at < ?", (now - idle_seconds,)
+                ).rowcount
+                STORAGE_EVICTIONS.labels(table, "ttl").inc(max(deleted, 0))
+            if max_entries:
+                deleted = conn.execute(
+                    f"DELETE FROM {table} WHERE touched_at < ("
+                    f"SELECT touched_at FROM {table} ORDER BY touched_at DESC LIMIT 1 OFFSET ?)",
+                    (max_entries - 1,),
+                ).rowcount
+                STORAGE_EVICTIONS.labels(table, "capacity").inc(max(deleted, 0))
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            self._local.conn = conn
+        return conn
+
+    # ---------- orders ----------
+
+    def add_order(self, order: Dict[str, Any]) -> int:
+        cursor = self._connection().execute(
+            "INSERT INTO orders (order_id, username, created_at, data) VALUES (?, ?, ?, ?)",
+            (order["order_id"], order.get("username"), _order_created_at(order), _dumps(order)),
+        )
+        self._wrote()
+        return cursor.lastrowid
+
+    def add_orders(self, orders: List[Dict[str, Any]]) -> None:
+        conn = self._connection()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT INTO orders (order_id, username, created_at, data) VALUES (?, ?, ?, ?)",
+                [
+                    (order["order_id"], order.get("username"), _order_created_at(order), _dumps(order))
+                    for order in orders
+                ],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._wrote(len(orders))
+
+    def get_order(self, order_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            "SELECT data FROM orders WHERE order_id = ?", (order_id,)
+        ).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def has_order(self, order_id: str) -> bool:
+        row = self._connection().execute(
+            "SELECT 1 FROM orders WHERE order_id = ?", (order_id,)
+        ).fetchone()
+        return row is not None
+
+    def order_count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+    def user_orders(self, username: str, after: Optional[int] = None, limit: Optional[int] = None) -> OrderPage:
+        # Fetch one extra row to learn whether another page follows.
+        rows = self._connection().execute(
+            "SELECT seq, data FROM orders WHERE username = ? AND seq > ? ORDER BY seq LIMIT ?",
+            (username, after if after is not None else 0, limit + 1 if limit is not None else -1),
+        ).fetchall()
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = rows[-1][0]
+        return [pickle.loads(data) for _, data in rows], next_cursor
+
+    # ---------- sessions ----------
+
+    def get_session(self, username: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            "SELECT data FROM sessions WHERE username = ?", (username,)
+        ).fetchone()
+        if row is None:
+            return None
+        self._touched("sessions", username)
+        return pickle.loads(row[0])
+
+    def put_session(self, username: str, session: Dict[str, Any]) -> None:
+        self._connection().execute(
+            "INSERT OR REPLACE INTO sessions (username, touched_at, data) VALUES (?, ?, ?)",
+            (username, time.time(), _dumps(session)),
+        )
+        self._wrote()
+
+    def delete_session(self, username: str) -> None:
+        self._connection().execute("DELETE FROM sessions WHERE username = ?", (username,))
+
+    # ---------- profiles ----------
+
+    def get_profile(self, session_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            "SELECT data FROM profiles WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        self._touched("profiles", session_id)
+        return pickle.loads(row[0])
+
+    def put_profile(self, session_id: str, profile: Dict[str, Any]) -> None:
+        self._connection().execute(
+            "INSERT OR REPLACE INTO profiles (session_id, touched_at, data) VALUES (?, ?, ?)",
+            (session_id, time.time(), _dumps(profile)),
+        )
+        self._wrote()
+
+    def delete_profile(self, session_id: str) -> None:
+        self._connection().execute("DELETE FROM profiles WHERE session_id = ?", (session_id,))
+
+
+def create_storage(settings):
+    """Backend selected by Settings.storage_backend: "memory" | "sqlite"."""
+    retention = RetentionPolicy.from_settings(settings)
+    if settings.storage_backend == "memory":
+        return MemoryStorage(retention)
+    if settings.storage_backend == "sqlite":
+        return SQLiteStorage(settings.sqlite_path, retention)
+    raise ValueError(
+        f"Unknown storage backend '{settings.storage_backend}'. Valid values: memory, sqlite"
+    )
@@ -1,9 +1,14 @@
 import logging
-from fastapi import APIRouter, Depends, Header
+from fastapi import APIRouter, Depends, Header, Request, Response
 from typing import Optional
 
+import catalog_cache
 from constants import CountryCode
 from database import db
+from http_cache import (
+    NO_STORE, PRIVATE_REVALIDATE,
+    etag_matches, make_etag, not_modified, set_cache_headers,
+)
 from middleware import get_current_user, require_country_header
 from models import (
     CartResponse,
@@ -13,14 +18,18 @@ from models import (
     TestSessionStateResponse,
     UserProfileDetails,
 )
+from server_timing import TimedRoute
 
 logger = logging.getLogger("omnipizza.test_api")
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
+
+
+async def _session_response(username: str) -> TestSessionStateResponse:
+    return _session_state(username, await db.run(db.get_test_session, username))
 
 
-def _session_response(username: str) -> TestSessionStateResponse:
-    session = db.get_test_session(username)
+def _session_state(username: str, session: dict) -> TestSessionStateResponse:
     return TestSessionStateResponse(
         username=username,
         country_code=session["country_code"],
@@ -46,9 +55,9 @@ async def set_market(
     current_user: dict = Depends(get_current_user),
 ):
     username = current_user["username"]
-    db.set_test_market(username, request.country_code)
+    await db.run(db.set_test_market, username, request.country_code)
     logger.info("session_api.set_market user=%s country=%s", username, request.country_code.value)
-    return _session_response(username)
+    return await _session_response(username)
 
 
 @router.post(
@@ -70,13 +79,19 @@ async def seed_cart(
     current_user: dict = Depends(get_current_user),
 ):
     username = current_user["username"]
-    db.set_test_cart(username, [item.dict() for item in request.items])
+    await db.run(db.set_test_cart, username, [item.dict() for item in request.items])
     logger.info("session_api.seed_cart user=%s item_count=%d", username, len(request.items))
-    return _session_response(username)
+    return await _session_response(username)
+
+
+# The enriched cart depends on the caller (token) and both headers.
+CART_VARY = "Authorization, X-Country-Code, X-Language"
 
 
 @router.get("/api/cart", response_model=CartResponse, tags=["Cart"])
 async def get_cart(
+    request: Request,
+    response: Response,
     current_user: dict = Depends(get_current_user),
     country_code: str = Depends(require_country_header),
     x_language: Optional[str] = Header(None),
@@ -87,8 +102,22 @@ async def get_cart(
         behavior = behavior.value
 
     cc = CountryCode(country_code)
-    session = db.get_test_session(username)
-    enriched = db.get_enriched_cart(username, cc, behavior, x_language)
+    session = await db.run(db.get_test_session, username)
+
+    # Every cart/market change bumps updated_at; prices and names come from
+    # the catalog. a11y_glitch_user's cart text is random, so never cached.
+    if behavior == "a11y_glitch":
+        set_cache_headers(response, NO_STORE)
+    else:
+        etag = make_etag(
+            "cart", username, session["updated_at"].isoformat(), country_code,
+            x_language or "", behavior, catalog_cache.content_version(),
+        )
+        if etag_matches(request, etag):
+            return not_modified(etag, PRIVATE_REVALIDATE, CART_VARY)
+        set_cache_headers(response, PRIVATE_REVALIDATE, etag, CART_VARY)
+
+    enriched = await db.run(db.get_enriched_cart, username, cc, behavior, x_language)
 
     return CartResponse(
         username=username,
@@ -117,7 +146,7 @@ async def seed_profile(
     current_user: dict = Depends(get_current_user),
 ):
     username = current_user["username"]
-    profile = db.seed_user_profile(current_user["session_id"], username, request.dict(exclude_unset=True))
+    profile = await db.run(db.seed_user_profile, current_user["session_id"], username, request.dict(exclude_unset=True))
     logger.info("session_api.seed_profile user=%s", username)
     return UserProfileDetails(**profile)
 
@@ -137,15 +166,23 @@ async def reset_state(
     current_user: dict = Depends(get_current_user),
 ):
     username = current_user["username"]
-    db.reset_test_session(username)
-    db.reset_user_profile(current_user["session_id"], username)
+    await db.run(db.reset_test_session, username)
+    await db.run(db.reset_user_profile, current_user["session_id"], username)
     logger.info("session_api.reset_state user=%s", username)
-    return _session_response(username)
+    return await _session_response(username)
 
 
 @router.get("/api/session", response_model=TestSessionStateResponse, tags=["Session"])
 async def get_state(
+    request: Request,
+    response: Response,
     current_user: dict = Depends(get_current_user),
 ):
     username = current_user["username"]
-    return _session_response(username)
+    session = await db.run(db.get_test_session, username)
+    etag = make_etag("session", username, session["updated_at"].isoformat())
+    if etag_matches(request, etag):
+        return not_modified(etag, PRIVATE_REVALIDATE, "Authorization")
+    set_cache_headers(response, PRIVATE_REVALIDATE, etag, "Authorization")
+    # Same snapshot as the ETag, so the body can't be newer than its tag.
+    return _session_state(username, session)
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Backend modules use flat imports (`from database import db`), so make the
+# backend directory importable however pytest is invoked.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,139 @@
+import asyncio
+
+import anyio.to_thread
+import pytest
+from fastapi.testclient import TestClient
+
+from bulkhead import Bulkhead, Rejected, classify, get_bulkhead, size_threadpool
+from constants import BULKHEADS
+from main import app
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_refuses_when_queue_full():
+    async def scenario():
+        bulkhead = Bulkhead("test_full", limit=1, queue=0)
+        await bulkhead.acquire()
+        with pytest.raises(Rejected) as exc:
+            await bulkhead.acquire()
+        assert exc.value.status_code == 429
+        bulkhead.release()
+        await bulkhead.acquire()
+        assert bulkhead.in_flight == 1
+
+    _run(scenario())
+
+
+def test_queued_request_times_out_with_503():
+    async def scenario():
+        bulkhead = Bulkhead("test_timeout", limit=1, queue=1, queue_timeout=0.01)
+        await bulkhead.acquire()
+        with pytest.raises(Rejected) as exc:
+            await bulkhead.acquire()
+        assert exc.value.status_code == 503
+        assert bulkhead.queue_depth == 0
+
+    _run(scenario())
+
+
+def test_release_hands_slot_to_oldest_waiter():
+    async def scenario():
+        bulkhead = Bulkhead("test_fifo", limit=1, queue=2, queue_timeout=1.0)
+        await bulkhead.acquire()
+        order = []
+
+        async def waiter(tag):
+            await bulkhead.acquire()
+            order.append(tag)
+
+        tasks = [asyncio.create_task(waiter(tag)) for tag in ("a", "b")]
+        await asyncio.sleep(0)
+        assert bulkhead.queue_depth == 2
+        bulkhead.release()
+        bulkhead.release()
+        await asyncio.gather(*tasks)
+        assert order == ["a", "b"]
+        assert bulkhead.in_flight == 1
+
+    _run(scenario())
+
+
+def test_cancelled_waiter_leaves_queue():
+    async def scenario():
+        bulkhead = Bulkhead("test_cancel", limit=1, queue=1, queue_timeout=1.0)
+        await bulkhead.acquire()
+        task = asyncio.create_task(bulkhead.acquire())
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert bulkhead.queue_depth == 0
+        bulkhead.release()
+        assert bulkhead.in_flight == 0
+
+    _run(scenario())
+
+
+def _login(client, username):
+    response = client.post("/api/auth/login", json={"username": username, "password": "pizza123"})
+    return response.json()["access_token"]
+
+
+def test_requests_are_classified_by_behavior():
+    client = TestClient(app)
+    token = _login(client, "performance_glitch_user")
+    scope = {"path": "/api/orders", "headers": [(b"authorization", f"Bearer {token}".encode())]}
+    assert classify(scope) == "performance_glitch"
+    assert classify({"path": "/api/orders", "headers": []}) == "anonymous"
+    assert classify({"path": "/api/debug/cpu-load", "headers": []}) == "chaos"
+    assert classify({"path": "/health", "headers": []}) is None
+
+
+def test_full_bulkhead_refuses_only_its_own_behavior(monkeypatch):
+    with TestClient(app) as client:
+        glitch = _login(client, "performance_glitch_user")
+        standard = _login(client, "standard_user")
+        bulkhead = get_bulkhead("performance_glitch")
+        # Queued requests must still be waiting when ours arrives.
+        monkeypatch.setattr(bulkhead, "queue_timeout", 60.0)
+
+        async def fill():
+            for _ in range(bulkhead.limit):
+                await bulkhead.acquire()
+            waiting = [asyncio.create_task(bulkhead.acquire()) for _ in range(bulkhead.queue)]
+            await asyncio.sleep(0)
+            return waiting
+
+        async def drain(waiting):
+            for task in waiting:
+                task.cancel()
+            await asyncio.gather(*waiting, return_exceptions=True)
+            for _ in range(bulkhead.limit):
+                bulkhead.release()
+
+        # On the app's own loop, where the middleware acquires.
+        waiting = client.portal.call(fill)
+        try:
+            assert bulkhead.queue_depth == bulkhead.queue
+            refused = client.get("/api/orders", headers={"Authorization": f"Bearer {glitch}"})
+            assert refused.status_code == 429
+            assert refused.headers["retry-after"] == str(bulkhead.retry_after)
+
+            allowed = client.get("/api/orders", headers={"Authorization": f"Bearer {standard}"})
+            assert allowed.status_code == 200
+        finally:
+            client.portal.call(drain, waiting)
+        assert (bulkhead.in_flight, bulkhead.queue_depth) == (0, 0)
+
+
+def test_threadpool_has_a_thread_per_bulkhead_slot():
+    async def scenario():
+        limit = size_threadpool()
+        assert anyio.to_thread.current_default_thread_limiter().total_tokens == limit
+        return limit
+
+    slots = sum(get_bulkhead(name).limit for name in BULKHEADS)
+    assert _run(scenario()) >= max(slots, 40)
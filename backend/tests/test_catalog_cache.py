@@ -0,0 +1,92 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import catalog_cache
+import constants
+from constants import COUNTRY_CONFIG, CountryCode, UserBehavior
+from database import db
+from main import app
+from models import PizzaResponse
+
+DETERMINISTIC = [behavior for behavior in UserBehavior if behavior is not UserBehavior.A11Y_GLITCH]
+
+
+def _fresh(country: CountryCode, behavior, language: str) -> bytes:
+    catalog = db.get_catalog(country_code=country, behavior=behavior, language=language)
+    return PizzaResponse(
+        pizzas=catalog, country_code=country.value, currency=COUNTRY_CONFIG[country]["currency"],
+    ).model_dump_json().encode("utf-8")
+
+
+@pytest.mark.parametrize("country", list(CountryCode))
+def test_prerendered_bodies_match_a_fresh_render(country):
+    for language in sorted(catalog_cache._LANGUAGES):
+        for behavior in DETERMINISTIC:
+            entry = catalog_cache.get_catalog_entry(country, behavior, language)
+            assert entry.body == _fresh(country, behavior, language), (country, language, behavior)
+
+
+def test_unknown_language_shares_the_fallback_entry():
+    junk = catalog_cache.get_catalog_entry(CountryCode.US, UserBehavior.STANDARD, "xx-junk")
+    assert junk is catalog_cache.get_catalog_entry(CountryCode.US, UserBehavior.STANDARD, "en")
+
+
+def test_a11y_glitch_is_never_cached():
+    assert catalog_cache.cache_key(CountryCode.US, UserBehavior.A11Y_GLITCH, "en") is None
+    assert catalog_cache.get_catalog_entry(CountryCode.US, UserBehavior.A11Y_GLITCH, "en") is None
+
+    client = TestClient(app)
+    token = client.post(
+        "/api/auth/login", json={"username": "a11y_glitch_user", "password": "pizza123"}
+    ).json()["access_token"]
+    cached = dict(catalog_cache._bodies)
+    response = client.get("/api/pizzas", headers={"Authorization": f"Bearer {token}", "X-Country-Code": "US"})
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "no-store"
+    assert "etag" not in response.headers
+    assert catalog_cache._bodies == cached
+
+
+def test_invalidate_drops_every_body():
+    entry = catalog_cache.get_catalog_entry(CountryCode.MX, UserBehavior.STANDARD, "es")
+    countries = catalog_cache.get_countries_entry()
+    version = catalog_cache.version()
+
+    catalog_cache.invalidate()
+    assert catalog_cache.version() == version + 1
+    assert catalog_cache._bodies == {}
+    rendered = catalog_cache.get_catalog_entry(CountryCode.MX, UserBehavior.STANDARD, "es")
+    assert rendered is not entry and rendered.body == entry.body
+    assert catalog_cache.get_countries_entry() is not countries
+
+
+def test_replace_catalog_serves_the_new_menu():
+    original = [dict(pizza) for pizza in constants.PIZZA_CATALOG]
+    stale = catalog_cache.get_catalog_entry(CountryCode.US, UserBehavior.STANDARD, "en")
+    content_version = catalog_cache.content_version()
+    repriced = [dict(original[0], base_price=original[0]["base_price"] + 5)] + original[1:]
+    try:
+        catalog_cache.replace_catalog(repriced)
+        fresh = catalog_cache.get_catalog_entry(CountryCode.US, UserBehavior.STANDARD, "en")
+        assert fresh.body != stale.body and fresh.etag != stale.etag
+        assert fresh.body == _fresh(CountryCode.US, UserBehavior.STANDARD, "en")
+        assert catalog_cache.content_version() != content_version
+    finally:
+        catalog_cache.replace_catalog(original)
+    restored = catalog_cache.get_catalog_entry(CountryCode.US, UserBehavior.STANDARD, "en")
+    assert restored.body == stale.body
+    assert catalog_cache.content_version() == content_version
+
+
+def test_route_sends_the_prerendered_bytes():
+    client = TestClient(app)
+    token = client.post(
+        "/api/auth/login", json={"username": "standard_user", "password": "pizza123"}
+    ).json()["access_token"]
+    response = client.get("/api/pizzas", headers={
+        "Authorization": f"Bearer {token}", "X-Country-Code": "JP", "X-Language": "ja",
+        "Accept-Encoding": "identity",
+    })
+    entry = catalog_cache.get_catalog_entry(CountryCode.JP, UserBehavior.STANDARD, "ja")
+    assert response.content == entry.body
+    assert response.headers["etag"] == entry.etag
@@ -0,0 +1,160 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import catalog_cache
+import constants
+from catalog_store import CatalogStore, load_catalog_file, tokenize
+from main import app
+
+
+def _ids(store, positions):
+    return [store.pizzas[position]["id"] for position in positions]
+
+
+def test_tokenize_folds_accents_and_splits_cjk_into_bigrams():
+    assert tokenize("Hawaïenne, Vier Käse") == ["hawaienne", "vier", "kase"]
+    assert tokenize("ハワイアン") == ["ハワ", "ワイ", "イア", "アン"]
+
+
+def test_search_matches_any_language_by_prefix():
+    store = CatalogStore(constants.PIZZA_CATALOG)
+    assert _ids(store, store.search(q="marg")) == ["p01"]
+    assert _ids(store, store.search(q="Käse")) == ["p04"]
+    assert _ids(store, store.search(q="ハワイ")) == ["p03"]
+    assert _ids(store, store.search(q="tomate mozz")) == _ids(store, store.search(q="TOMATO mozzarella"))
+    assert store.search(q="marg pepperoni") == []
+
+
+def test_search_by_category_and_text():
+    store = CatalogStore(constants.PIZZA_CATALOG)
+    meat = [pizza["id"] for pizza in constants.PIZZA_CATALOG if pizza["category"] == "meat"]
+    assert _ids(store, store.search(category="MEAT")) == meat
+    assert _ids(store, store.search(category="meat", q="hawai")) == ["p03"]
+    assert store.search(category="meat", q="marg") == []
+    assert store.search(category="dessert") == []
+    everything = range(len(constants.PIZZA_CATALOG))
+    assert store.search(q="") == store.search(q="!!") == store.search(category=" ") == everything
+
+
+def test_cursor_pages_cover_every_match_once():
+    store = CatalogStore(constants.PIZZA_CATALOG)
+    matches = store.search()
+    seen, cursor = [], None
+    while True:
+        items, cursor = store.page(matches, 5, cursor)
+        seen.extend(pizza["id"] for pizza in items)
+        if cursor is None:
+            break
+    assert seen == [pizza["id"] for pizza in constants.PIZZA_CATALOG]
+
+    with pytest.raises(ValueError):
+        store.page(matches, 5, "not a cursor!")
+
+
+class _CountingMenu(list):
+    """A menu that counts the items read from it."""
+
+    reads = 0
+
+    def __getitem__(self, index):
+        self.reads += 1
+        return super().__getitem__(index)
+
+    def __iter__(self):
+        raise AssertionError("the whole menu was iterated")
+
+
+def test_unfiltered_page_reads_only_its_own_items():
+    store = CatalogStore(constants.PIZZA_CATALOG)
+    menu = _CountingMenu(constants.PIZZA_CATALOG * 50_000)
+    store.pizzas = menu
+
+    matches = store.search()
+    assert isinstance(matches, range) and len(matches) == len(menu)
+    first, cursor = store.page(matches, 3)
+    items, _ = store.page(matches, 3, cursor)
+    assert [pizza["id"] for pizza in items] == [pizza["id"] for pizza in menu[3:6]]
+    # Two pages of 3, the slice above, and nothing else.
+    assert menu.reads == 3 + 3 + 1
+
+
+def test_load_catalog_file_formats_and_errors(tmp_path):
+    pizzas = constants.PIZZA_CATALOG[:2]
+    as_json = tmp_path / "menu.json"
+    as_json.write_text(json.dumps({"pizzas": pizzas}))
+    as_jsonl = tmp_path / "menu.jsonl"
+    as_jsonl.write_text("".join(json.dumps(pizza) + "\n" for pizza in pizzas))
+    assert load_catalog_file(str(as_json)) == pizzas
+    assert load_catalog_file(str(as_jsonl)) == pizzas
+
+    duplicate = tmp_path / "duplicate.json"
+    duplicate.write_text(json.dumps([pizzas[0], pizzas[0]]))
+    with pytest.raises(ValueError, match="duplicate pizza id"):
+        load_catalog_file(str(duplicate))
+
+    missing = tmp_path / "missing.json"
+    missing.write_text(json.dumps([{"id": "x1", "base_price": 1}]))
+    with pytest.raises(ValueError, match="missing category"):
+        load_catalog_file(str(missing))
+
+
+@pytest.fixture
+def client():
+    client = TestClient(app)
+    token = client.post(
+        "/api/auth/login", json={"username": "standard_user", "password": "pizza123"}
+    ).json()["access_token"]
+    client.headers.update({"Authorization": f"Bearer {token}", "X-Country-Code": "US"})
+    return client
+
+
+def test_pizzas_filters_and_pages(client):
+    full = client.get("/api/pizzas").json()
+    assert full["next_cursor"] is None
+    assert len(full["pizzas"]) == len(constants.PIZZA_CATALOG)
+
+    veggie = client.get("/api/pizzas", params={"category": "veggie"}).json()
+    assert veggie["pizzas"] == [pizza for pizza in full["pizzas"] if pizza["category"] == "veggie"]
+
+    found = client.get("/api/pizzas", params={"q": "marg"}).json()
+    assert [pizza["id"] for pizza in found["pizzas"]] == ["p01"]
+
+    for blank in ({"q": ""}, {"q": "!!"}, {"category": ""}, {"category": " ", "q": "marg"}):
+        expected = found if blank.get("q") == "marg" else full
+        assert client.get("/api/pizzas", params=blank).json()["pizzas"] == expected["pizzas"]
+
+    pages, params = [], {"limit": 5}
+    while True:
+        page = client.get("/api/pizzas", params=params).json()
+        pages.extend(page["pizzas"])
+        if page["next_cursor"] is None:
+            break
+        params = {"limit": 5, "cursor": page["next_cursor"]}
+    assert pages == full["pizzas"]
+
+
+def test_pizzas_page_revalidates_and_rejects_bad_cursor(client):
+    response = client.get("/api/pizzas", params={"limit": 3})
+    assert response.headers["cache-control"] == "private, no-cache"
+    revalidated = client.get(
+        "/api/pizzas", params={"limit": 3}, headers={"If-None-Match": response.headers["etag"]}
+    )
+    assert revalidated.status_code == 304
+
+    bad = client.get("/api/pizzas", params={"cursor": "%%%"})
+    assert bad.status_code == 400
+
+
+def test_replace_catalog_reindexes():
+    original = list(constants.PIZZA_CATALOG)
+    extra = dict(original[0], id="x01", category="special", name={"en": "Truffle"})
+    try:
+        catalog_cache.replace_catalog(original + [extra])
+        store = catalog_cache.get_store()
+        assert _ids(store, store.search(q="truffle")) == ["x01"]
+        assert _ids(store, store.search(category="special")) == ["x01"]
+    finally:
+        catalog_cache.replace_catalog(original)
+    assert catalog_cache.get_store().search(q="truffle") == []
@@ -0,0 +1,22 @@
+import asyncio
+
+from chaos import ConcurrencyCap, CpuPool, fibonacci
+
+
+def test_concurrency_cap_refuses_past_limit():
+    cap = ConcurrencyCap(3)
+    assert cap.try_acquire(2)
+    assert not cap.try_acquire(2)
+    assert cap.try_acquire()
+    cap.release(3)
+    assert cap.in_flight == 0
+
+
+def test_cpu_pool_runs_off_the_event_loop():
+    pool = CpuPool(workers=1, max_tasks=2)
+    try:
+        assert asyncio.run(pool.fibonacci(20, 2)) == [fibonacci(20)] * 2 == [6765, 6765]
+        # Spawned, not forked from the multithreaded server process.
+        assert pool._executor._mp_context.get_start_method() == "spawn"
+    finally:
+        pool.shutdown()
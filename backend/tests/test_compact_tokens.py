@@ -0,0 +1,69 @@
+"""
+Compact access tokens (auth.create_compact_token) must carry the same
+claims as the JWT they replace, and be rejected when tampered or expired.
+"""
+
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+import auth
+from config import Settings, settings
+from constants import UserBehavior
+
+CLAIMS = {"sub": "a11y_glitch_user", "behavior": UserBehavior.A11Y_GLITCH, "sid": uuid.uuid4().hex}
+
+
+@pytest.fixture
+def token_format(monkeypatch):
+    def use(fmt):
+        monkeypatch.setattr(settings, "token_format", fmt)
+    auth.token_cache.clear()
+    yield use
+    auth.token_cache.clear()
+
+
+def test_compact_claims_match_jwt(token_format):
+    token_format("jwt")
+    jwt_payload = auth.decode_access_token(auth.create_access_token(CLAIMS))
+    token_format("compact")
+    compact = auth.create_access_token(CLAIMS)
+    compact_payload = auth.decode_access_token(compact)
+
+    assert compact.startswith(auth.COMPACT_TOKEN_PREFIX)
+    assert compact_payload == jwt_payload
+
+
+def test_both_formats_accepted_whatever_is_issued(token_format):
+    token_format("jwt")
+    jwt_token = auth.create_access_token(CLAIMS)
+    token_format("compact")
+    assert auth.decode_access_token(jwt_token)["sub"] == CLAIMS["sub"]
+
+
+def test_tampered_compact_token_rejected(token_format):
+    token = auth.create_compact_token(CLAIMS, datetime.utcnow() + timedelta(minutes=5))
+    forged = auth.create_compact_token({**CLAIMS, "behavior": UserBehavior.STANDARD}, datetime.utcnow() + timedelta(minutes=5))
+    # Splice the standard_user body onto the original MAC.
+    spliced = forged[:-22] + token[-22:]
+
+    for bad in (spliced, token[:-1], auth.COMPACT_TOKEN_PREFIX + "!!!"):
+        with pytest.raises(HTTPException) as exc:
+            auth.decode_access_token(bad)
+        assert exc.value.status_code == 401
+
+
+def test_expired_compact_token_rejected(token_format):
+    token = auth.create_compact_token(CLAIMS, datetime.utcnow() - timedelta(seconds=1))
+    with pytest.raises(HTTPException) as exc:
+        auth.decode_access_token(token)
+    assert exc.value.status_code == 401
+
+
+def test_unknown_token_format_fails_at_settings_load(monkeypatch):
+    monkeypatch.setenv("TOKEN_FORMAT", "compcat")
+    with pytest.raises(ValidationError):
+        Settings()
@@ -0,0 +1,45 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from compression import MINIMUM_SIZE, negotiate
+from main import app
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("identity", None),
+    ("gzip, deflate", "gzip"),
+    ("gzip, deflate, br", "br"),
+    ("gzip;q=1.0, br;q=0.5", "gzip"),
+    ("br;q=0, gzip", "gzip"),
+    ("*", "br"),
+    ("*;q=0.1, br;q=0", "gzip"),
+    ("gzip;q=0", None),
+])
+def test_negotiate(header, expected):
+    assert negotiate(header) == expected
+
+
+def test_cached_catalog_variants_decode_to_identity_body():
+    client = TestClient(app)
+    identity = client.get("/api/countries", headers={"Accept-Encoding": "identity"})
+    assert len(identity.content) >= MINIMUM_SIZE
+
+    for encoding in ("gzip", "br"):
+        response = client.get("/api/countries", headers={"Accept-Encoding": encoding})
+        assert response.headers["content-encoding"] == encoding
+        assert "Accept-Encoding" in response.headers["vary"]
+        assert response.headers["etag"] == identity.headers["etag"][:-1] + f'-{encoding}"'
+        # httpx decodes transparently; the decoded body must be the identity one.
+        assert response.content == identity.content
+
+
+def test_dynamic_responses_compressed_on_the_fly():
+    client = TestClient(app)
+    response = client.get("/api/auth/users", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"].startswith("W/")
+
+    small = client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
@@ -0,0 +1,60 @@
+"""
+The fast response path must emit exactly what FastAPI would have emitted
+from the response_model: same keys, same order, same JSON types.
+"""
+
+import json
+import random
+from datetime import datetime
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+
+import catalog_cache
+import fast_json
+from constants import COUNTRY_CONFIG, CountryCode
+from database import db
+from models import OrderSummary, PizzaResponse
+from pricing import order_total
+
+
+def model_bytes(model) -> bytes:
+    # What FastAPI's JSONResponse renders for a response_model.
+    return json.dumps(
+        jsonable_encoder(model), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+@pytest.mark.parametrize("country", list(CountryCode))
+@pytest.mark.parametrize("behavior", ["standard", "problem", "a11y_glitch"])
+def test_pizza_response_payload_matches_model(country, behavior):
+    random.seed(7)
+    catalog = db.get_catalog(country, behavior, None)
+    currency = COUNTRY_CONFIG[country]["currency"]
+    expected = PizzaResponse(pizzas=catalog, country_code=country.value, currency=currency)
+
+    payload = fast_json.pizza_response_payload(catalog, country.value, currency)
+
+    assert fast_json.dumps(payload) == model_bytes(expected)
+
+
+@pytest.mark.parametrize("country", list(CountryCode))
+def test_order_summary_payload_matches_model(country):
+    items = [{"pizza_id": "p01", "quantity": 2, "size": "large", "toppings": ["bacon"]}]
+    order = {
+        "order_id": "ORDER-ABCDEF12",
+        "items": items,
+        "timestamp": datetime(2026, 1, 2, 3, 4, 5, 678901),
+        **order_total(items, country, 10.0),
+    }
+    symbol = COUNTRY_CONFIG[country]["currency_symbol"]
+    expected = OrderSummary(currency_symbol=symbol, **order)
+
+    payload = fast_json.order_summary_payload(order, symbol)
+
+    assert fast_json.dumps(payload) == model_bytes(expected)
+
+
+def test_countries_body_matches_model():
+    body = catalog_cache.get_countries_body()
+    assert json.loads(body) == jsonable_encoder(catalog_cache._country_infos())
@@ -0,0 +1,93 @@
+import asyncio
+import os
+import time
+
+from constants import CountryCode
+from database import InMemoryDB
+from journal import OrderJournal, SNAPSHOT_FILE, _journal_generations, _journal_name
+
+
+def _order(username: str, country_code: str = "MX"):
+    return {
+        "username": username,
+        "country_code": country_code,
+        "items": [{"pizza_id": "p01", "quantity": 1, "size": "large", "toppings": []}],
+        "total": 12.5,
+    }
+
+
+def _mutate(db: InMemoryDB, rounds: int) -> None:
+    for index in range(rounds):
+        db.create_order(_order(f"user{index % 3}"))
+        db.set_test_market(f"user{index % 3}", CountryCode.JP)
+        db.set_test_cart(f"user{index % 3}", [{"pizza_id": "p02", "quantity": index + 1}])
+        db.update_user_profile(f"sid{index}", f"user{index % 3}", {"full_name": f"Name {index}"})
+    db.create_orders([_order("batch_user", "US") for _ in range(4)])
+    db.reset_test_session("user2")
+
+
+def _restored(directory: str) -> InMemoryDB:
+    db = InMemoryDB()
+    OrderJournal(db, directory).restore()
+    return db
+
+
+def test_snapshot_plus_replay_recreates_every_store(tmp_path):
+    directory = str(tmp_path)
+    db = InMemoryDB()
+
+    async def scenario():
+        # Started on a running loop, as in the app: snapshots copy the DB
+        # on the loop while this coroutine keeps mutating it.
+        journal = OrderJournal(db, directory, fsync=False, snapshot_every=7, commit_interval=0.001)
+        journal.restore()
+        journal.start()
+        for _ in range(5):
+            _mutate(db, 4)
+            await asyncio.sleep(0.01)
+        await asyncio.get_running_loop().run_in_executor(None, journal.close)
+
+    asyncio.run(scenario())
+
+    assert os.path.exists(os.path.join(directory, SNAPSHOT_FILE))
+    assert len(_journal_generations(directory)) == 1
+    assert _restored(directory).export_state() == db.export_state()
+
+
+def test_truncated_last_line_is_ignored(tmp_path):
+    directory = str(tmp_path)
+    db = InMemoryDB()
+    journal = OrderJournal(db, directory, fsync=False)
+    journal.restore()
+    journal.start()
+    _mutate(db, 3)
+    journal.close()
+
+    path = os.path.join(directory, _journal_name(_journal_generations(directory)[-1]))
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"op":"order","order":{"order_id":"ORDER-TOR')
+
+    restored = InMemoryDB()
+    replayed = OrderJournal(restored, directory).restore()
+    assert replayed == 3 * 4 + 4 + 1
+    assert restored.export_state() == db.export_state()
+
+
+def test_group_commit_flushes_on_close(tmp_path):
+    directory = str(tmp_path)
+    db = InMemoryDB()
+    # A commit interval far longer than the test: only close() can flush.
+    journal = OrderJournal(db, directory, fsync=False, commit_interval=60)
+    journal.restore()
+    journal.start()
+    for index in range(25):
+        db.create_order(_order(f"user{index}"))
+
+    start = time.perf_counter()
+    journal.close()
+    assert time.perf_counter() - start < 5
+
+    path = os.path.join(directory, _journal_name(journal.generation))
+    with open(path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 25
+    assert _restored(directory).order_count() == 25
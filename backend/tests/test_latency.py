@@ -0,0 +1,111 @@
+import asyncio
+import random
+import statistics
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import latency
+from config import settings
+from latency import resolve_profile, sample_delay
+from main import app
+
+
+def test_fixed_and_clamping():
+    assert sample_delay({"distribution": "fixed", "seconds": 1.5}) == 1.5
+    assert sample_delay({"seconds": 2.0}) == 2.0
+    assert sample_delay({"distribution": "fixed", "seconds": 9.0, "max_seconds": 4.0}) == 4.0
+    assert sample_delay({"distribution": "fixed", "seconds": -1.0}) == 0.0
+    with pytest.raises(ValueError):
+        sample_delay({"distribution": "gaussian"})
+
+
+def test_uniform_is_seeded_and_bounded():
+    spec = {"distribution": "uniform", "low": 0.1, "high": 0.3}
+    draws = [sample_delay(spec, random.Random(7)) for _ in range(3)]
+    assert draws == [random.Random(7).uniform(0.1, 0.3)] * 3
+
+    rng = random.Random(1)
+    assert all(0.1 <= sample_delay(spec, rng) <= 0.3 for _ in range(1000))
+
+
+def test_lognormal_centers_on_its_median():
+    spec = {"distribution": "lognormal", "median": 0.2, "sigma": 0.5, "max_seconds": 1.0}
+    rng = random.Random(3)
+    draws = [sample_delay(spec, rng) for _ in range(4000)]
+    assert statistics.median(draws) == pytest.approx(0.2, rel=0.05)
+    assert max(draws) == 1.0
+    assert sample_delay({"distribution": "lognormal", "median": 0}, rng) == 0.0
+
+
+def test_p99_tail_hits_the_tail_at_its_probability():
+    spec = {"distribution": "p99_tail", "seconds": 0.01, "tail_seconds": 2.0, "tail_probability": 0.05}
+    rng = random.Random(11)
+    draws = [sample_delay(spec, rng) for _ in range(10000)]
+    assert set(draws) == {0.01, 2.0}
+    assert draws.count(2.0) / len(draws) == pytest.approx(0.05, abs=0.01)
+
+
+def test_settings_overlay_constants_per_key(monkeypatch):
+    monkeypatch.setattr(settings, "latency_profiles", {
+        "performance_glitch": {"seconds": 0.5},
+        "error": {"distribution": "uniform", "low": 0.1, "high": 0.2},
+    })
+    merged = latency._merged_profiles()
+    assert merged["performance_glitch"] == {"distribution": "fixed", "seconds": 0.5}
+    assert merged["error"]["distribution"] == "uniform"
+
+    monkeypatch.setattr(settings, "latency_profiles", {
+        "error": {"routes": {"/api/checkout": {"distribution": "bimodal"}}},
+    })
+    with pytest.raises(ValueError, match="error /api/checkout"):
+        latency._merged_profiles()
+
+
+def test_route_overrides_replace_the_behavior_spec(monkeypatch):
+    monkeypatch.setattr(latency, "_PROFILES", {
+        "performance_glitch": {
+            "distribution": "fixed", "seconds": 3.0,
+            "routes": {"/api/checkout": {"distribution": "fixed", "seconds": 0.5}},
+        },
+        # Route-only: no delay anywhere else.
+        "error": {"routes": {"/api/orders": {"distribution": "fixed", "seconds": 1.0}}},
+    })
+    assert resolve_profile("performance_glitch", "/api/checkout")["seconds"] == 0.5
+    assert resolve_profile("performance_glitch", "/api/pizzas")["seconds"] == 3.0
+    assert resolve_profile("performance_glitch")["seconds"] == 3.0
+    assert resolve_profile("error", "/api/orders")["seconds"] == 1.0
+    assert resolve_profile("error", "/api/pizzas") is None
+    assert resolve_profile("standard", "/api/checkout") is None
+
+
+def test_glitch_delay_does_not_hold_up_other_users(monkeypatch):
+    monkeypatch.setattr(latency, "_PROFILES", {"performance_glitch": {"distribution": "fixed", "seconds": 0.5}})
+    client = TestClient(app)
+    tokens = {
+        username: client.post(
+            "/api/auth/login", json={"username": username, "password": "pizza123"}
+        ).json()["access_token"]
+        for username in ("performance_glitch_user", "standard_user")
+    }
+
+    async def timed_catalog(http, username):
+        start = time.perf_counter()
+        response = await http.get("/api/pizzas", headers={
+            "Authorization": f"Bearer {tokens[username]}", "X-Country-Code": "US",
+        })
+        assert response.status_code == 200
+        return time.perf_counter() - start
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+            glitch = asyncio.create_task(timed_catalog(http, "performance_glitch_user"))
+            await asyncio.sleep(0.05)
+            standard = await timed_catalog(http, "standard_user")
+            return await glitch, standard
+
+    glitch, standard = asyncio.run(scenario())
+    assert glitch >= 0.5
+    assert standard < 0.25
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from bulkhead import get_bulkhead
+from main import app
+from metrics import PrometheusMiddleware, UNMATCHED_ENDPOINT
+
+
+def _count(**labels):
+    return REGISTRY.get_sample_value("http_requests_total", labels) or 0.0
+
+
+def _in_progress(method="GET"):
+    return REGISTRY.get_sample_value("http_requests_in_progress", {"method": method}) or 0.0
+
+
+def _login(client, username):
+    return client.post(
+        "/api/auth/login", json={"username": username, "password": "pizza123"}
+    ).json()["access_token"]
+
+
+def test_endpoint_label_is_the_route_template():
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {_login(client, 'standard_user')}", "X-Country-Code": "mx"}
+    labels = {"method": "GET", "endpoint": "/api/orders/{order_id}", "status": "404",
+              "behavior": "standard", "country": "MX"}
+    before = _count(**labels)
+
+    for order_id in ("ORDER-AAA", "ORDER-BBB"):
+        assert client.get(f"/api/orders/{order_id}", headers=headers).status_code == 404
+    assert _count(**labels) == before + 2
+    assert _count(**{**labels, "endpoint": "/api/orders/ORDER-AAA"}) == 0
+
+    unmatched = {"method": "GET", "endpoint": UNMATCHED_ENDPOINT, "status": "404",
+                 "behavior": "anonymous", "country": "invalid"}
+    before = _count(**unmatched)
+    client.get("/no/such/path/123", headers={"X-Country-Code": "ZZ"})
+    assert _count(**unmatched) == before + 1
+
+
+def test_refused_requests_keep_behavior_and_country(monkeypatch):
+    client = TestClient(app)
+    token = _login(client, "performance_glitch_user")
+    bulkhead = get_bulkhead("performance_glitch")
+    monkeypatch.setattr(bulkhead, "limit", 0)
+    monkeypatch.setattr(bulkhead, "queue", 0)
+    labels = {"method": "GET", "endpoint": UNMATCHED_ENDPOINT, "status": "429",
+              "behavior": "performance_glitch", "country": "JP"}
+    before = _count(**labels)
+
+    response = client.get("/api/orders", headers={"Authorization": f"Bearer {token}", "X-Country-Code": "JP"})
+    assert response.status_code == 429
+    # Refused before routing, so no template, but still labeled by caller.
+    assert _count(**labels) == before + 1
+
+
+def test_in_progress_returns_to_zero_after_streamed_and_failed_responses():
+    seen = []
+
+    async def streaming(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"a", "more_body": True})
+        seen.append(_in_progress())
+        await send({"type": "http.response.body", "body": b"b"})
+
+    async def failing(scope, receive, send):
+        seen.append(_in_progress())
+        raise RuntimeError("boom")
+
+    async def sink(message):
+        pass
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    scope = {"type": "http", "method": "GET", "path": "/x", "headers": []}
+    idle = _in_progress()
+    asyncio.run(PrometheusMiddleware(streaming)(dict(scope), receive, sink))
+    assert _in_progress() == idle
+
+    failed = {"method": "GET", "endpoint": UNMATCHED_ENDPOINT, "status": "500",
+              "behavior": "anonymous", "country": "none"}
+    before = _count(**failed)
+    with pytest.raises(RuntimeError):
+        asyncio.run(PrometheusMiddleware(failing)(dict(scope), receive, sink))
+    assert _in_progress() == idle
+    assert _count(**failed) == before + 1
+    assert seen == [idle + 1, idle + 1]
+
+
+def test_in_progress_returns_to_zero_after_order_export():
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {_login(client, 'standard_user')}"}
+    idle = _in_progress()
+    response = client.get("/api/orders/export", headers=headers)
+    assert response.status_code == 200
+    assert _in_progress() == idle
@@ -0,0 +1,92 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from database import db
+from main import app
+
+CHECKOUT = {
+    "country_code": "MX",
+    "items": [{"pizza_id": "p01", "quantity": 1, "size": "large", "toppings": []}],
+    "name": "Juan Pérez",
+    "address": "Av. Insurgentes 123",
+    "phone": "5512345678",
+    "colonia": "Roma Norte",
+    "propina": 10,
+}
+
+
+@pytest.fixture
+def client():
+    client = TestClient(app)
+    token = client.post(
+        "/api/auth/login", json={"username": "standard_user", "password": "pizza123"}
+    ).json()["access_token"]
+    client.headers.update({"Authorization": f"Bearer {token}"})
+    return client
+
+
+def test_order_pages_walk_the_full_history(client):
+    for _ in range(5):
+        assert client.post("/api/checkout", json=CHECKOUT).status_code == 200
+    history = client.get("/api/orders").json()["orders"]
+
+    walked, params = [], {"limit": 2}
+    while True:
+        page = client.get("/api/orders", params=params).json()
+        walked.extend(order["order_id"] for order in page["orders"])
+        if page["next_cursor"] is None:
+            break
+        params = {"limit": 2, "cursor": page["next_cursor"]}
+    assert walked == [order["order_id"] for order in history]
+
+
+def test_export_with_no_matching_orders_is_empty(client, monkeypatch):
+    for _ in range(5):
+        assert client.post("/api/checkout", json=CHECKOUT).status_code == 200
+    pages = []
+    iter_user_orders = db.iter_user_orders
+
+    def recording(*args, **kwargs):
+        for chunk in iter_user_orders(*args, chunk_size=2, **kwargs):
+            pages.append(chunk)
+            yield chunk
+
+    monkeypatch.setattr(db, "iter_user_orders", recording)
+
+    response = client.get("/api/orders/export", params={"country": "JP"})
+    assert response.status_code == 200
+    assert response.content == b""
+    # Every page of the history was read, each as its own (empty) chunk.
+    assert len(pages) >= 3 and not any(pages)
+
+    exported = client.get("/api/orders/export", params={"country": "MX"}).content.splitlines()
+    assert len(exported) == len(client.get("/api/orders").json()["orders"])
+
+
+@pytest.mark.parametrize("cursor", ["abc", "-1", "²", "١٢"])
+def test_non_ascii_digit_cursor_is_a_400(client, cursor):
+    response = client.get("/api/orders", params={"limit": 2, "cursor": cursor})
+    assert response.status_code == 400
+
+
+def test_batch_reports_failures_per_entry(client):
+    missing_colonia = {key: value for key, value in CHECKOUT.items() if key != "colonia"}
+    bad_quantity = {**CHECKOUT, "items": [{"pizza_id": "p01", "quantity": 0}]}
+    response = client.post(
+        "/api/checkout/batch", json={"orders": [CHECKOUT, missing_colonia, bad_quantity, "junk", CHECKOUT]}
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["failed"]) == (2, 3)
+    assert [result["status_code"] for result in body["results"]] == [200, 400, 422, 422, 200]
+    assert "colonia" in body["results"][1]["error"]
+    order_id = body["results"][0]["order"]["order_id"]
+    assert client.get(f"/api/orders/{order_id}").json() == body["results"][0]["order"]
+
+    assert client.post("/api/checkout/batch", json={"orders": []}).status_code == 422
+
+
+def test_batch_entries_are_documented_as_checkout_requests():
+    schema = app.openapi()["components"]["schemas"]["CheckoutBatchRequest"]["properties"]["orders"]
+    assert schema["items"] == {"$ref": "#/components/schemas/CheckoutRequest"}
+    assert (schema["minItems"], schema["maxItems"]) == (1, 10000)
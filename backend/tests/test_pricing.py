@@ -0,0 +1,118 @@
+"""
+Differential tests for pricing.py
+
+The precomputed unit-price tables (scalar path) and the NumPy batch path
+must return exactly the totals of the original per-item formula, kept
+below verbatim as the reference.
+"""
+
+import math
+import random
+
+import pytest
+
+from constants import PIZZA_CATALOG, COUNTRY_CONFIG, CURRENCY_RATES, CountryCode
+from database import PIZZA_BY_ID
+from pricing import (
+    SIZE_UPCHARGE_USD, TOPPING_UPCHARGE_USD,
+    convert_usd_amount, round_currency_amount,
+    order_total, order_totals,
+)
+
+
+def reference_order_total(items, country_code, tip_percentage=0.0):
+    """InMemoryDB.calculate_order_total before the price tables."""
+    country_config = COUNTRY_CONFIG[country_code]
+    currency = country_config["currency"]
+    conversion_rate = CURRENCY_RATES[currency]
+    tax_rate = country_config["tax_rate"]
+    decimal_places = country_config.get("decimal_places", 2)
+    delivery_fee = convert_usd_amount(
+        country_config["delivery_fee_usd"],
+        conversion_rate,
+        decimal_places,
+    )
+
+    subtotal = 0.0
+    for item in items:
+        pizza = PIZZA_BY_ID.get(item["pizza_id"])
+        if pizza:
+            converted_price = pizza["base_price"] * conversion_rate
+            if decimal_places == 0:
+                base_price = round(converted_price)
+            else:
+                base_price = round(converted_price, decimal_places)
+
+            rate = base_price / pizza["base_price"] if pizza["base_price"] > 0 else 1
+            size_key = str(item.get("size", "small")).lower()
+            size_add = math.ceil(SIZE_UPCHARGE_USD.get(size_key, 0) * rate)
+            topping_unit = math.ceil(TOPPING_UPCHARGE_USD * rate)
+            toppings = item.get("toppings") or []
+            toppings_add = topping_unit * len(toppings)
+            unit_price = base_price + size_add + toppings_add
+
+            subtotal += unit_price * item["quantity"]
+
+    subtotal = round_currency_amount(subtotal, decimal_places)
+    tax = round_currency_amount(subtotal * tax_rate, decimal_places)
+    tip = round_currency_amount(subtotal * (tip_percentage / 100), decimal_places)
+    total = round_currency_amount(subtotal + delivery_fee + tax + tip, decimal_places)
+
+    return {
+        "subtotal": subtotal,
+        "delivery_fee": round_currency_amount(delivery_fee, decimal_places),
+        "tax_rate": tax_rate,
+        "tip_percentage": round(tip_percentage, 2),
+        "tax": tax,
+        "tip": tip,
+        "total": total,
+        "currency": currency
+    }
+
+
+PIZZA_IDS = [pizza["id"] for pizza in PIZZA_CATALOG] + ["p404"]
+SIZES = list(SIZE_UPCHARGE_USD) + ["LARGE", "Medium", "xl"]
+TOPPINGS = ["pepperoni", "mushrooms", "onions", "bacon", "pineapple"]
+
+
+def random_cart(rng):
+    items = []
+    for _ in range(rng.randint(0, 12)):
+        item = {"pizza_id": rng.choice(PIZZA_IDS), "quantity": rng.randint(1, 10)}
+        if rng.random() < 0.8:
+            item["size"] = rng.choice(SIZES)
+        if rng.random() < 0.7:
+            item["toppings"] = rng.sample(TOPPINGS, rng.randint(0, len(TOPPINGS)))
+        items.append(item)
+    tip = rng.choice([0, 5, 10, 15, 12.5, rng.uniform(0, 100)])
+    return items, tip
+
+
+def assert_identical(actual, expected):
+    assert actual == expected
+    # == treats 1 and 1.0 alike; the JSON contract must not change type.
+    assert {k: type(v) for k, v in actual.items()} == {k: type(v) for k, v in expected.items()}
+
+
+@pytest.mark.parametrize("country_code", list(CountryCode))
+def test_scalar_tables_match_reference(country_code):
+    rng = random.Random(f"scalar-{country_code.value}")
+    for _ in range(2000):
+        items, tip = random_cart(rng)
+        assert_identical(order_total(items, country_code, tip), reference_order_total(items, country_code, tip))
+
+
+def test_batch_matches_reference_across_markets():
+    rng = random.Random("batch")
+    carts = []
+    for _ in range(5000):
+        items, tip = random_cart(rng)
+        carts.append((items, rng.choice(list(CountryCode)), tip))
+
+    for (items, country_code, tip), totals in zip(carts, order_totals(carts)):
+        assert_identical(totals, reference_order_total(items, country_code, tip))
+
+
+def test_batch_handles_empty_input_and_empty_carts():
+    assert order_totals([]) == []
+    assert order_totals([([], CountryCode.JP, 0)]) == [reference_order_total([], CountryCode.JP, 0)]
@@ -0,0 +1,54 @@
+import threading
+
+from fastapi.testclient import TestClient
+
+import profiler
+from config import settings
+from main import app
+
+
+def test_profiles_only_requests_with_the_debug_key(monkeypatch):
+    monkeypatch.setattr(settings, "debug_key", "s3cret")
+    profiler.clear()
+    client = TestClient(app)
+
+    assert "x-profile-id" not in client.get("/api/countries").headers
+    assert "x-profile-id" not in client.get("/api/countries", headers={"X-Debug-Profile": "nope"}).headers
+
+    response = client.get("/api/countries", headers={"X-Debug-Profile": "s3cret"})
+    profile_id = response.headers["x-profile-id"]
+
+    listing = client.get("/api/debug/profiles").json()
+    assert listing["enabled"] is True
+    [summary] = listing["profiles"]
+    assert summary["id"] == profile_id
+    assert summary["route"] == "/api/countries"
+    assert summary["status_code"] == 200
+
+    stacks = client.get(f"/api/debug/profiles/{profile_id}")
+    assert stacks.headers["content-type"].startswith("text/plain")
+    assert client.get("/api/debug/profiles/missing").status_code == 404
+
+
+def test_disabled_without_a_debug_key(monkeypatch):
+    monkeypatch.setattr(settings, "debug_key", None)
+    client = TestClient(app)
+    response = client.get("/api/countries", headers={"X-Debug-Profile": ""})
+    assert "x-profile-id" not in response.headers
+    assert client.get("/api/debug/profiles").json()["enabled"] is False
+
+
+def test_sampler_is_joined_off_the_event_loop(monkeypatch):
+    monkeypatch.setattr(settings, "debug_key", "s3cret")
+    joins = []
+    join = profiler.Sampler.join
+
+    def recording_join(self, *args):
+        joins.append(threading.get_ident() == self.loop_thread_id)
+        join(self, *args)
+
+    monkeypatch.setattr(profiler.Sampler, "join", recording_join)
+    client = TestClient(app)
+    response = client.get("/api/countries", headers={"X-Debug-Profile": "s3cret"})
+    assert "x-profile-id" in response.headers
+    assert joins == [False]
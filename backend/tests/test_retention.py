@@ -0,0 +1,225 @@
+import pickle
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+import storage
+from storage import MemoryStorage, RetentionPolicy, SCHEMA_VERSION, SQLiteStorage
+
+
+class FakeClock:
+    """Stands in for the `time` module inside storage.py."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(storage, "time", clock)
+    return clock
+
+
+def _order(order_id: str, username: str = "alice", age_seconds: float = 0):
+    timestamp = datetime.utcfromtimestamp(1_000_000.0 - age_seconds)
+    return {"order_id": order_id, "username": username, "timestamp": timestamp}
+
+
+def _ids(orders):
+    return [order["order_id"] for order in orders]
+
+
+# ---------- MemoryStorage ----------
+
+def test_memory_evicts_oldest_orders_past_capacity(clock):
+    store = MemoryStorage(RetentionPolicy(max_orders=4))
+    for index in range(10):
+        store.add_order(_order(f"o{index}", "alice" if index % 3 else "bob"))
+
+    assert store.order_count() == 4
+    assert sorted(store.orders) == ["o6", "o7", "o8", "o9"]
+    # The expiry queue only holds live orders: expired ones left its front.
+    assert [order_id for _, order_id in store._order_expiry] == ["o6", "o7", "o8", "o9"]
+    assert _ids(store.user_orders("alice")[0]) == ["o7", "o8"]
+    assert _ids(store.user_orders("bob")[0]) == ["o6", "o9"]
+
+
+def test_memory_trims_dead_prefix_of_user_index(clock):
+    store = MemoryStorage(RetentionPolicy(max_orders=3))
+    for index in range(20):
+        store.add_order(_order(f"o{index}"))
+
+    # Dead ids are trimmed in bulk, so the index stays within 2x the live orders.
+    assert len(store.user_order_ids["alice"]) <= 2 * 3
+    assert len(store.user_order_seqs["alice"]) == len(store.user_order_ids["alice"])
+    page, cursor = store.user_orders("alice", limit=2)
+    assert _ids(page) == ["o17", "o18"]
+    assert _ids(store.user_orders("alice", after=cursor)[0]) == ["o19"]
+
+
+def test_memory_evicts_orders_by_age(clock):
+    store = MemoryStorage(RetentionPolicy(order_max_age_seconds=3600))
+    store.add_order(_order("old1", age_seconds=7200))
+    store.add_order(_order("old2", age_seconds=4000))
+    store.add_order(_order("new", age_seconds=60))
+
+    assert sorted(store.orders) == ["new"]
+    assert [order_id for _, order_id in store._order_expiry] == ["new"]
+    assert _ids(store.user_orders("alice")[0]) == ["new"]
+
+
+def test_memory_sessions_evict_least_recently_used_and_idle(clock):
+    store = MemoryStorage(RetentionPolicy(max_sessions=2, session_idle_seconds=100))
+    store.put_session("a", {"n": 1})
+    store.put_session("b", {"n": 2})
+    assert store.get_session("a") == {"n": 1}
+    store.put_session("c", {"n": 3})
+    assert store.get_session("b") is None
+    assert store.get_session("a") is not None
+
+    clock.now += 60
+    store.put_session("c", {"n": 4})
+    clock.now += 60
+    store.put_profile("unrelated", {})
+    store.sessions.evict()
+    assert store.get_session("a") is None
+    assert store.get_session("c") == {"n": 4}
+
+
+# ---------- SQLiteStorage ----------
+
+def test_sqlite_range_deletes_orders_by_capacity_and_age(tmp_path, clock):
+    store = SQLiteStorage(str(tmp_path / "db.sqlite"), RetentionPolicy(max_orders=3))
+    for index in range(6):
+        store.add_order(_order(f"o{index}"))
+    store.evict()
+    assert _ids(store.user_orders("alice")[0]) == ["o3", "o4", "o5"]
+
+    store = SQLiteStorage(str(tmp_path / "age.sqlite"), RetentionPolicy(order_max_age_seconds=3600))
+    store.add_order(_order("old", age_seconds=7200))
+    store.add_order(_order("new", age_seconds=60))
+    store.evict()
+    assert _ids(store.user_orders("alice")[0]) == ["new"]
+
+
+def test_sqlite_range_deletes_idle_and_surplus_sessions(tmp_path, clock):
+    store = SQLiteStorage(
+        str(tmp_path / "db.sqlite"),
+        RetentionPolicy(max_sessions=2, session_idle_seconds=100, max_profiles=1),
+    )
+    for name in ("a", "b", "c"):
+        store.put_session(name, {"name": name})
+        clock.now += 10
+    store.put_profile("p1", {})
+    clock.now += 1
+    store.put_profile("p2", {})
+    store.evict()
+    assert [store.get_session(name) is not None for name in ("a", "b", "c")] == [False, True, True]
+    assert store.get_profile("p1") is None and store.get_profile("p2") == {}
+
+    clock.now += 200
+    store.put_session("d", {"name": "d"})
+    store.evict()
+    assert [store.get_session(name) is not None for name in ("b", "c", "d")] == [False, False, True]
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_reads_keep_sessions_and_profiles_alive_on_both_backends(tmp_path, clock, backend):
+    policy = RetentionPolicy(session_idle_seconds=100, profile_idle_seconds=100)
+    if backend == "memory":
+        store = MemoryStorage(policy)
+
+        def evict():
+            store.sessions.evict()
+            store.user_profiles.evict()
+    else:
+        store = SQLiteStorage(str(tmp_path / "db.sqlite"), policy)
+        evict = store.evict
+
+    store.put_session("reader", {"cart": []})
+    store.put_session("idle", {"cart": []})
+    store.put_profile("reader-sid", {})
+    store.put_profile("idle-sid", {})
+    clock.now += 60
+    assert store.get_session("reader") is not None
+    assert store.get_profile("reader-sid") is not None
+    clock.now += 60
+    evict()
+
+    assert store.get_session("reader") == {"cart": []}
+    assert store.get_profile("reader-sid") == {}
+    assert store.get_session("idle") is None and store.get_profile("idle-sid") is None
+
+
+def test_sqlite_flushes_read_touches_in_batches(tmp_path, clock, monkeypatch):
+    store = SQLiteStorage(str(tmp_path / "db.sqlite"))
+    monkeypatch.setattr(store, "EVICT_EVERY", 3)
+    for name in ("a", "b", "c"):
+        store.put_session(name, {})
+    conn = store._connection()
+    written = clock.now
+
+    clock.now += 10
+    store.get_session("a")
+    store.get_session("b")
+    # Pending in memory until the batch fills or ages.
+    assert conn.execute("SELECT MAX(touched_at) FROM sessions").fetchone()[0] == written
+    store.get_profile("missing")
+    store.get_session("c")
+    assert conn.execute("SELECT MIN(touched_at) FROM sessions").fetchone()[0] == written + 10
+
+    clock.now += store.TOUCH_FLUSH_SECONDS
+    store.get_session("a")
+    clock.now += store.TOUCH_FLUSH_SECONDS
+    store.get_session("b")
+    touched = dict(conn.execute("SELECT username, touched_at FROM sessions"))
+    assert touched == {"a": written + 10 + store.TOUCH_FLUSH_SECONDS,
+                       "b": written + 10 + 2 * store.TOUCH_FLUSH_SECONDS, "c": written + 10}
+
+
+def test_sqlite_upgrades_files_without_retention_columns(tmp_path, clock):
+    path = str(tmp_path / "old.sqlite")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE orders (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id TEXT NOT NULL UNIQUE,
+            username TEXT,
+            data BLOB NOT NULL
+        );
+        CREATE INDEX orders_by_user ON orders (username, seq);
+        CREATE TABLE sessions (username TEXT PRIMARY KEY, data BLOB NOT NULL);
+        CREATE TABLE profiles (session_id TEXT PRIMARY KEY, data BLOB NOT NULL);
+    """)
+    conn.execute(
+        "INSERT INTO orders (order_id, username, data) VALUES (?, ?, ?)",
+        ("legacy", "alice", pickle.dumps(_order("legacy", age_seconds=600))),
+    )
+    conn.execute("INSERT INTO sessions (username, data) VALUES (?, ?)", ("alice", pickle.dumps({"cart": []})))
+    conn.commit()
+    conn.close()
+
+    store = SQLiteStorage(path, RetentionPolicy(order_max_age_seconds=3600, session_idle_seconds=100))
+    conn = store._connection()
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    created_at = conn.execute("SELECT created_at FROM orders WHERE order_id = 'legacy'").fetchone()[0]
+    assert created_at == pytest.approx(clock.now - 600)
+
+    store.add_order(_order("new"))
+    store.put_session("bob", {"cart": []})
+    store.put_profile("sid", {})
+    store.evict()
+    assert _ids(store.user_orders("alice")[0]) == ["legacy", "new"]
+    assert store.get_session("alice") == {"cart": []}
+
+    # Reopening an upgraded file is a no-op.
+    SQLiteStorage(path)
+    assert store.order_count() == 2
@@ -0,0 +1,39 @@
+from fastapi.testclient import TestClient
+
+from config import settings
+from main import app
+
+
+def _phases(response):
+    entries = [entry.strip() for entry in response.headers["server-timing"].split(",")]
+    phases = {}
+    for entry in entries:
+        name, _, duration = entry.partition(";dur=")
+        phases[name] = float(duration)
+    return phases
+
+
+def test_authenticated_request_reports_each_phase():
+    client = TestClient(app)
+    token = client.post(
+        "/api/auth/login", json={"username": "standard_user", "password": "pizza123"}
+    ).json()["access_token"]
+
+    response = client.get(
+        "/api/cart", headers={"Authorization": f"Bearer {token}", "X-Country-Code": "US"}
+    )
+    phases = _phases(response)
+    assert {"auth", "db", "handler", "validation", "serialization", "app"} <= set(phases)
+    assert all(duration >= 0 for duration in phases.values())
+    assert phases["app"] >= phases["handler"]
+
+
+def test_unauthenticated_request_has_no_auth_phase():
+    phases = _phases(TestClient(app).get("/api/auth/users"))
+    assert "auth" not in phases and "db" not in phases
+    assert "app" in phases
+
+
+def test_header_can_be_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "server_timing_enabled", False)
+    assert "server-timing" not in TestClient(app).get("/health").headers
@@ -0,0 +1,30 @@
+from fastapi.testclient import TestClient
+
+import test_api
+from database import db
+from main import app
+
+
+def test_session_is_read_once_for_etag_and_body(monkeypatch):
+    client = TestClient(app)
+    token = client.post(
+        "/api/auth/login", json={"username": "standard_user", "password": "pizza123"}
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    client.post("/api/store/market", json={"country_code": "MX"}, headers=headers)
+
+    reads = []
+    get_test_session = db.get_test_session
+
+    def counted(username):
+        reads.append(username)
+        return get_test_session(username)
+
+    monkeypatch.setattr(test_api.db, "get_test_session", counted)
+    response = client.get("/api/session", headers=headers)
+    assert reads == ["standard_user"]
+    assert response.json()["country_code"] == "MX"
+
+    revalidated = client.get("/api/session", headers={**headers, "If-None-Match": response.headers["etag"]})
+    assert revalidated.status_code == 304
+    assert reads == ["standard_user"] * 2
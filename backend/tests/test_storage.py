@@ -0,0 +1,93 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from constants import CountryCode
+from database import InMemoryDB
+from storage import MemoryStorage, SQLiteStorage
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def db(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryDB(MemoryStorage())
+    return InMemoryDB(SQLiteStorage(str(tmp_path / "omnipizza.db")))
+
+
+def _order(username: str, country_code: str = "MX"):
+    return {
+        "username": username,
+        "country_code": country_code,
+        "items": [{"pizza_id": "p01", "quantity": 2, "size": "large", "toppings": []}],
+        "total": 25.0,
+    }
+
+
+def test_orders_round_trip_and_page_in_creation_order(db):
+    ids = [db.create_order(_order("alice")) for _ in range(5)]
+    ids += db.create_orders([_order("alice", "US") for _ in range(3)])
+    db.create_order(_order("bob"))
+
+    assert db.order_count() == 9
+    order = db.get_order(ids[0])
+    assert order["order_id"] == ids[0] and order["status"] == "pending"
+    assert isinstance(order["timestamp"], datetime)
+    assert db.get_order("ORDER-MISSING") is None
+    assert [o["order_id"] for o in db.get_user_orders("alice")] == ids
+
+    walked, cursor = [], None
+    while True:
+        page, cursor = db.get_user_orders_page("alice", 3, cursor)
+        walked.extend(o["order_id"] for o in page)
+        if cursor is None:
+            break
+    assert walked == ids
+
+
+def test_iter_user_orders_filters_by_market_and_time(db):
+    db.create_orders([_order("alice", "MX") for _ in range(4)])
+    db.create_orders([_order("alice", "US") for _ in range(3)])
+
+    chunks = list(db.iter_user_orders("alice", country_code="US", chunk_size=2))
+    # One chunk per page, empty when nothing on the page matches.
+    assert [len(chunk) for chunk in chunks] == [0, 0, 2, 1]
+    assert all(o["country_code"] == "US" for chunk in chunks for o in chunk)
+
+    future = datetime.utcnow() + timedelta(days=1)
+    assert sum(len(chunk) for chunk in db.iter_user_orders("alice", since=future)) == 0
+    assert sum(len(chunk) for chunk in db.iter_user_orders("alice", until=future)) == 7
+
+
+def test_session_market_cart_and_reset(db):
+    assert db.get_test_session("alice")["country_code"] == "MX"
+    db.set_test_market("alice", CountryCode.JP)
+    db.set_test_cart("alice", [{"pizza_id": "p02", "quantity": 3, "size": "small"}])
+
+    session = db.get_test_session("alice")
+    assert session["country_code"] == "JP"
+    assert session["cart_items"] == [{"pizza_id": "p02", "quantity": 3, "size": "small"}]
+    enriched = db.get_enriched_cart("alice", CountryCode.JP, "standard", "ja")
+    assert enriched[0]["pizza_id"] == "p02" and enriched[0]["currency"] == "JPY"
+
+    db.reset_test_session("alice")
+    assert db.get_test_session("alice")["cart_items"] == []
+
+
+def test_profiles_are_per_session(db):
+    db.update_user_profile("sid-1", "alice", {"full_name": "Alice", "phone": None})
+    assert db.get_user_profile("sid-1", "alice")["full_name"] == "Alice"
+    assert db.get_user_profile("sid-2", "alice")["full_name"] == ""
+
+    seeded = db.seed_user_profile("sid-1", "alice", {"notes": "seeded"})
+    assert seeded["notes"] == "seeded" and seeded["full_name"] == ""
+    assert db.reset_user_profile("sid-1", "alice")["notes"] == ""
+
+
+def test_run_calls_blocking_backends_in_the_threadpool(db):
+    async def caller_thread():
+        return threading.get_ident(), await db.run(threading.get_ident)
+
+    loop_thread, call_thread = asyncio.run(caller_thread())
+    assert (call_thread != loop_thread) == db.storage.blocking
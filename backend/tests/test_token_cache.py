@@ -0,0 +1,117 @@
+import time
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import auth
+import middleware
+from auth import VerifiedTokenCache
+from constants import UserBehavior
+from main import app
+
+
+class FakeClock:
+    """Stands in for the `time` module inside auth.py."""
+
+    def __init__(self):
+        self.now = time.time()
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(auth, "time", clock)
+    auth.token_cache.clear()
+    middleware.current_user_cache.clear()
+    yield clock
+    auth.token_cache.clear()
+    middleware.current_user_cache.clear()
+
+
+def test_entry_stops_hitting_at_its_exp(clock):
+    cache = VerifiedTokenCache("test_exp", 4)
+    cache.put("token", {"sub": "alice"}, clock.now + 10)
+
+    clock.now += 9.999
+    assert cache.get("token") == {"sub": "alice"}
+    clock.now += 0.001
+    assert cache.get("token") is None
+    assert len(cache) == 0
+
+
+def test_lru_bound_evicts_least_recently_used(clock):
+    cache = VerifiedTokenCache("test_lru", 2)
+    expires_at = clock.now + 60
+    cache.put("a", 1, expires_at)
+    cache.put("b", 2, expires_at)
+    assert cache.get("a") == 1
+
+    cache.put("c", 3, expires_at)
+    assert len(cache) == 2
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+
+
+def test_disabled_cache_and_tokens_without_exp_are_not_kept(clock):
+    disabled = VerifiedTokenCache("test_disabled", 0)
+    disabled.put("token", 1, clock.now + 60)
+    assert disabled.get("token") is None
+
+    cache = VerifiedTokenCache("test_no_exp", 4)
+    cache.put("token", 1, None)
+    assert cache.get("token") is None
+
+
+def test_cached_user_is_rejected_once_the_token_expires(clock):
+    claims = {"sub": "standard_user", "behavior": UserBehavior.STANDARD, "sid": uuid.uuid4().hex}
+    token = auth.create_compact_token(claims, datetime.utcnow() + timedelta(seconds=30))
+    request = SimpleNamespace(state=SimpleNamespace())
+
+    # Both caches now hold the token: the decoded claims and the user.
+    assert middleware._resolve_current_user(request, token)["session_id"] == claims["sid"]
+    assert middleware.current_user_cache.get(token) is not None
+
+    clock.now += 60
+    with pytest.raises(HTTPException) as exc:
+        middleware._resolve_current_user(request, token)
+    assert exc.value.status_code == 401
+    assert middleware.peek_behavior(token) is None
+
+
+def test_new_login_session_is_not_served_from_cache(clock):
+    client = TestClient(app)
+    first, second = (
+        client.post("/api/auth/login", json={"username": "standard_user", "password": "pizza123"}).json()["access_token"]
+        for _ in range(2)
+    )
+    assert first != second
+
+    seeded = client.post(
+        "/api/profile", json={"full_name": "First Session"}, headers={"Authorization": f"Bearer {first}"}
+    )
+    assert seeded.json()["full_name"] == "First Session"
+    # Each token resolves to its own session, whichever was cached first.
+    for token, full_name in ((second, ""), (first, "First Session"), (second, "")):
+        profile = client.get("/api/users/me/profile", headers={"Authorization": f"Bearer {token}"})
+        assert profile.json()["full_name"] == full_name
+
+
+def test_changed_session_state_is_read_fresh(clock):
+    client = TestClient(app)
+    token = client.post(
+        "/api/auth/login", json={"username": "standard_user", "password": "pizza123"}
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    client.post("/api/store/market", json={"country_code": "MX"}, headers=headers)
+    assert client.get("/api/session", headers=headers).json()["country_code"] == "MX"
+    client.post("/api/store/market", json={"country_code": "JP"}, headers=headers)
+    # The token's user is cached; the session it points at is not.
+    assert middleware.current_user_cache.get(token) is not None
+    assert client.get("/api/session", headers=headers).json()["country_code"] == "JP"
@@ -0,0 +1,83 @@
+import json
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+import tracing
+from main import app
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+TRACEPARENT = f"00-{TRACE_ID}-00f067aa0ba902b7-01"
+
+
+@pytest.mark.parametrize("header, expected", [
+    (TRACEPARENT, (TRACE_ID, "00f067aa0ba902b7", "01")),
+    (TRACEPARENT.upper(), (TRACE_ID, "00f067aa0ba902b7", "01")),
+    (None, None),
+    ("garbage", None),
+    (f"00-{'0' * 32}-00f067aa0ba902b7-01", None),
+    (f"00-{TRACE_ID}-{'0' * 16}-01", None),
+    (f"ff-{TRACE_ID}-00f067aa0ba902b7-01", None),
+])
+def test_parse_traceparent(header, expected):
+    assert tracing.parse_traceparent(header) == expected
+
+
+def test_request_joins_incoming_trace_and_records_spans():
+    client = TestClient(app)
+    token = client.post(
+        "/api/auth/login", json={"username": "standard_user", "password": "pizza123"}
+    ).json()["access_token"]
+    response = client.get("/api/cart", headers={
+        "Authorization": f"Bearer {token}", "X-Country-Code": "US", "traceparent": TRACEPARENT,
+    })
+    assert response.headers["traceresponse"].startswith(f"00-{TRACE_ID}-")
+
+    trace = client.get(f"/api/debug/traces/{TRACE_ID}").json()
+    root, *children = trace["spans"]
+    assert trace["name"] == "GET /api/cart"
+    assert root["parent_id"] == "00f067aa0ba902b7"
+    names = {span["name"] for span in children}
+    assert {"auth", "handler get_cart", "db.get_enriched_cart"} <= names
+    handler = next(span for span in children if span["name"] == "handler get_cart")
+    db_span = next(span for span in children if span["name"] == "db.get_enriched_cart")
+    assert db_span["parent_id"] == handler["span_id"]
+
+    summaries = client.get("/api/debug/traces", params={"name": "/api/cart"}).json()["traces"]
+    assert TRACE_ID in {summary["trace_id"] for summary in summaries}
+    assert all("spans" not in summary for summary in summaries)
+    assert client.get("/api/debug/traces/missing").status_code == 404
+
+
+def test_slowest_first_and_file_export(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    collector = tracing.TraceCollector(2, str(path), max_bytes=1 << 20, backups=1)
+    for name, duration in (("fast", 1.0), ("slow", 9.0), ("medium", 5.0)):
+        root = tracing.Span(name, None)
+        root.end = root.start + duration / 1000
+        collector.export(tracing.Trace(tracing._new_trace_id(), "01", root))
+
+    # Buffer holds the last two; the file has all three once the writer
+    # thread has drained its queue.
+    assert [t["name"] for t in collector.slowest(5)] == ["slow", "medium"]
+    collector.close()
+    lines = path.read_text().splitlines()
+    assert [json.loads(line)["name"] for line in lines] == ["fast", "slow", "medium"]
+
+
+def test_export_serializes_off_the_calling_thread(tmp_path, monkeypatch):
+    collector = tracing.TraceCollector(10, str(tmp_path / "traces.jsonl"), max_bytes=1 << 20)
+    threads = []
+    to_dict = tracing.Trace.to_dict
+
+    def recording(trace):
+        threads.append(threading.get_ident())
+        return to_dict(trace)
+
+    monkeypatch.setattr(tracing.Trace, "to_dict", recording)
+    root = tracing.Span("GET /", None)
+    root.end = root.start
+    collector.export(tracing.Trace(tracing._new_trace_id(), "01", root))
+    collector.close()
+    assert len(threads) == 1 and threads[0] != threading.get_ident()
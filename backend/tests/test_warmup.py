@@ -0,0 +1,61 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import auth
+from config import settings
+
+import warmup
+from main import app
+
+
+def test_ready_only_after_warmup(monkeypatch):
+    monkeypatch.setattr(warmup, "state", warmup.WarmupState())
+    client = TestClient(app)
+
+    cold = client.get("/ready")
+    assert cold.status_code == 503
+    assert cold.headers["retry-after"] == "1"
+    assert cold.json()["status"] == "warming_up"
+    assert client.get("/health").status_code == 200
+
+    assert warmup.run(app) is True
+    ready = client.get("/ready")
+    assert ready.status_code == 200
+    assert set(ready.json()["steps"]) == {name for name, _ in warmup.STEPS}
+
+
+@pytest.mark.parametrize("token_format", ["jwt", "compact"])
+def test_warmup_succeeds_with_every_token_format(monkeypatch, token_format):
+    monkeypatch.setattr(warmup, "state", warmup.WarmupState())
+    monkeypatch.setattr(settings, "token_format", token_format)
+    auth.token_cache.clear()
+
+    assert warmup.run(app) is True, warmup.state.error
+    assert TestClient(app).get("/ready").status_code == 200
+    auth.token_cache.clear()
+
+
+def test_failed_step_keeps_instance_unready(monkeypatch):
+    monkeypatch.setattr(warmup, "state", warmup.WarmupState())
+
+    def broken(app):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(warmup, "STEPS", [("broken", broken)])
+    assert warmup.run(app) is False
+    response = TestClient(app).get("/ready")
+    assert response.status_code == 503
+    assert response.json()["error"] == "broken: boom"
+
+
+def test_openapi_served_from_prebuilt_bytes_with_etag():
+    client = TestClient(app)
+    response = client.get("/api/openapi.json", headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert response.json() == app.openapi()
+    assert response.content == warmup.openapi_entry(app).body
+
+    revalidated = client.get("/api/openapi.json", headers={
+        "Accept-Encoding": "identity", "If-None-Match": response.headers["etag"],
+    })
+    assert revalidated.status_code == 304
@@ -0,0 +1,254 @@
+import json
+import logging
+import queue
+import random
+import re
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from logging.handlers import QueueListener, RotatingFileHandler
+from typing import Any, Deque, Dict, List, Optional
+
+from config import settings
+
+# In-process tracing, no collector service needed.
+#
+# TracingMiddleware opens a root span per request. Its trace id comes from
+# an incoming W3C `traceparent` header when there is one, so client test
+# runs can be matched to server work; otherwise a new id is generated. The
+# response carries `traceresponse` with the trace id and root span id.
+# Child spans come from `span(...)`: server_timing.phase opens one for every
+# phase, so dependencies (auth, behavior), handlers, serialization and each
+# InMemoryDB call are spans without further instrumentation.
+#
+# Finished traces go to a bounded in-memory buffer (slowest first on
+# /api/debug/traces) and, when `trace_file` is set, to a rotating JSON-lines
+# file, one trace per line. Either way the request path only queues the
+# Trace object: the buffer converts to dicts when it is read, and the file
+# is serialized and written on a QueueListener thread.
+
+_TRACEPARENT = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+def _new_trace_id() -> str:
+    return f"{random.getrandbits(128) or 1:032x}"
+
+
+def _new_span_id() -> str:
+    return f"{random.getrandbits(64) or 1:016x}"
+
+
+def parse_traceparent(value: Optional[str]):
+    """(trace_id, parent_span_id, flags) from a `traceparent` header, or
+    None if it is missing or invalid."""
+    if not value:
+        return None
+    match = _TRACEPARENT.match(value.strip().lower())
+    if match is None:
+        return None
+    version, trace_id, parent_id, flags = match.groups()
+    if version == "ff" or trace_id == "0" * 32 or parent_id == "0" * 16:
+        return None
+    return trace_id, parent_id, flags
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "start", "end", "attributes", "error")
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.span_id = _new_span_id()
+        self.parent_id = parent_id
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.attributes = attributes or {}
+        self.error: Optional[str] = None
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        end = self.end if self.end is not None else time.perf_counter()
+        record = {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round((end - self.start) * 1000, 3),
+        }
+        if self.attributes:
+            record["attributes"] = self.attributes
+        if self.error:
+            record["error"] = self.error
+        return record
+
+
+class Trace:
+    __slots__ = ("trace_id", "flags", "root", "spans", "started_at")
+
+    def __init__(self, trace_id: str, flags: str, root: Span):
+        self.trace_id = trace_id
+        self.flags = flags
+        self.root = root
+        self.spans: List[Span] = []
+        self.started_at = datetime.utcnow()
+
+    @property
+    def duration(self) -> float:
+        end = self.root.end if self.root.end is not None else time.perf_counter()
+        return end - self.root.start
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration * 1000, 3),
+            "status_code": self.root.attributes.get("http.status_code"),
+            "span_count": len(self.spans) + 1,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        origin = self.root.start
+        record = self.summary()
+        record["spans"] = [self.root.to_dict(origin)] + sorted(
+            (span.to_dict(origin) for span in self.spans), key=lambda span: span["start_ms"]
+        )
+        return record
+
+
+_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_span: ContextVar[Optional[Span]] = ContextVar("span", default=None)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Child span of the current one; a no-op outside a traced request."""
+    trace = _trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = _span.get()
+    current = Span(name, parent.span_id if parent is not None else trace.root.span_id, attributes)
+    token = _span.set(current)
+    try:
+        yield current
+    except BaseException as exc:
+        current.error = type(exc).__name__
+        raise
+    finally:
+        current.end = time.perf_counter()
+        _span.reset(token)
+        trace.spans.append(current)
+
+
+class _TraceFileListener(QueueListener):
+    """Serializes queued Trace objects into log records on the listener
+    thread (once: RotatingFileHandler formats twice to check the size)."""
+
+    def prepare(self, trace: Trace) -> logging.LogRecord:
+        return logging.makeLogRecord({"msg": json.dumps(trace.to_dict(), separators=(",", ":"))})
+
+
+class TraceCollector:
+    """Recent finished traces, plus the optional rotating file export."""
+
+    def __init__(self, size: int, path: Optional[str] = None,
+                 max_bytes: int = 0, backups: int = 0):
+        self._traces: Deque[Trace] = deque(maxlen=max(size, 1))
+        self._file_queue: Optional[queue.SimpleQueue] = None
+        self._file_listener: Optional[QueueListener] = None
+        if path:
+            handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._file_queue = queue.SimpleQueue()
+            self._file_listener = _TraceFileListener(self._file_queue, handler)
+            self._file_listener.start()
+
+    def export(self, trace: Trace) -> None:
+        self._traces.append(trace)
+        if self._file_queue is not None:
+            self._file_queue.put_nowait(trace)
+
+    def slowest(self, limit: int, name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Summaries (no spans) of the `limit` slowest buffered traces,
+        optionally only those whose root span name contains `name`."""
+        traces = [t for t in self._traces if name is None or name in t.root.name]
+        traces.sort(key=lambda t: t.duration, reverse=True)
+        return [t.summary() for t in traces[:limit]]
+
+    def get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        for trace in reversed(self._traces):
+            if trace.trace_id == trace_id:
+                return trace.to_dict()
+        return None
+
+    def clear(self) -> None:
+        self._traces.clear()
+
+    def close(self) -> None:
+        """Write out queued traces and stop the file export thread."""
+        if self._file_listener is not None:
+            self._file_listener.stop()
+            for handler in self._file_listener.handlers:
+                handler.close()
+            self._file_listener = self._file_queue = None
+
+
+collector = TraceCollector(
+    settings.trace_buffer_size,
+    settings.trace_file,
+    settings.trace_file_max_bytes,
+    settings.trace_file_backups,
+)
+
+
+def _header(headers, name: bytes) -> Optional[str]:
+    for key, value in headers:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+class TracingMiddleware:
+    """Pure ASGI middleware: one root span per HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.tracing_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        incoming = parse_traceparent(_header(scope.get("headers") or (), b"traceparent"))
+        if incoming is not None:
+            trace_id, parent_id, flags = incoming
+        else:
+            trace_id, parent_id, flags = _new_trace_id(), None, "01"
+        root = Span(f"{scope['method']} {scope['path']}", parent_id, {"http.method": scope["method"]})
+        trace = Trace(trace_id, flags, root)
+        trace_token = _trace.set(trace)
+        span_token = _span.set(root)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                root.attributes["http.status_code"] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"traceresponse", f"00-{trace_id}-{root.span_id}-{flags}".encode()))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as exc:
+            root.error = type(exc).__name__
+            raise
+        finally:
+            root.end = time.perf_counter()
+            route = scope.get("route")
+            if route is not None:
+                root.name = f"{scope['method']} {route.path}"
+                root.attributes["http.route"] = route.path
+            _span.reset(span_token)
+            _trace.reset(trace_token)
+            collector.export(trace)
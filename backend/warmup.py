@@ -0,0 +1,127 @@
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import catalog_cache
+from auth import create_access_token, decode_access_token
+from compression import SUPPORTED_ENCODINGS
+from constants import PIZZA_CATALOG, TEST_USERS, CountryCode
+from database import db
+from fast_json import dumps
+from models import QuoteRequest, QuoteResponse
+import pricing
+
+logger = logging.getLogger("omnipizza.warmup")
+
+# Startup warm-up, gating the /ready probe.
+#
+# The first request after a deploy would otherwise pay for work that only
+# happens once: FastAPI builds the OpenAPI schema on first fetch, the
+# catalog bodies and their compressed variants are rendered on first use,
+# pricing tables are built per country, and the auth and model code paths
+# are cold. run() does all of it up front, with no side effects on stored
+# data, and only then flips `state.ready`. /health stays a liveness check;
+# /ready is the one a load balancer should gate traffic on.
+#
+# The OpenAPI document is kept as pre-serialized bytes with an ETag and
+# compressed variants (catalog_cache.CachedBody), so schema fetches from
+# contract tests and client generators are served like the catalog.
+
+
+class WarmupState:
+    def __init__(self):
+        self.ready = False
+        self.started_at: Optional[datetime] = None
+        self.duration_ms: Optional[float] = None
+        self.steps: Dict[str, float] = {}
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "status": "ready" if self.ready else ("failed" if self.error else "warming_up"),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "duration_ms": self.duration_ms,
+            "steps": self.steps,
+            "error": self.error,
+        }
+
+
+state = WarmupState()
+_openapi_lock = threading.Lock()
+_openapi: Optional[catalog_cache.CachedBody] = None
+
+
+def openapi_entry(app) -> catalog_cache.CachedBody:
+    """The serialized OpenAPI document; built here if warm-up has not yet."""
+    global _openapi
+    if _openapi is None:
+        with _openapi_lock:
+            if _openapi is None:
+                _openapi = catalog_cache.CachedBody(dumps(app.openapi()))
+    return _openapi
+
+
+def _warm_openapi(app) -> None:
+    entry = openapi_entry(app)
+    for encoding in SUPPORTED_ENCODINGS:
+        entry.representation(encoding)
+
+
+def _warm_catalog(app) -> None:
+    catalog_cache.warm(SUPPORTED_ENCODINGS)
+
+
+def _warm_pricing(app) -> None:
+    # Request validation, pricing tables and response serialization, as
+    # POST /api/quote does them; quotes store nothing.
+    pizza_id = PIZZA_CATALOG[0]["id"]
+    for country in CountryCode:
+        pricing.get_table(country)
+        request = QuoteRequest(
+            country_code=country,
+            items=[{"pizza_id": pizza_id, "quantity": 1, "size": "large", "toppings": ["mushrooms"]}],
+            tip_percentage=10,
+        )
+        items = [item.dict() for item in request.items]
+        quote = db.quote_order(items, country, request.tip_percentage)
+        QuoteResponse(**quote).model_dump_json()
+
+
+def _warm_auth(app) -> None:
+    # Claims shaped like login's, so every token_format can encode them.
+    user = TEST_USERS["standard_user"]
+    token = create_access_token(
+        {"sub": user["username"], "behavior": user["behavior"], "sid": uuid.uuid4().hex},
+        timedelta(minutes=1),
+    )
+    decode_access_token(token)
+
+
+STEPS: List[Tuple[str, Callable]] = [
+    ("openapi", _warm_openapi),
+    ("catalog", _warm_catalog),
+    ("pricing", _warm_pricing),
+    ("auth", _warm_auth),
+]
+
+
+def run(app) -> bool:
+    """Run every warm-up step; `state.ready` is set only if all succeed."""
+    state.started_at = datetime.utcnow()
+    start = time.perf_counter()
+    for name, step in STEPS:
+        step_start = time.perf_counter()
+        try:
+            step(app)
+        except Exception as exc:
+            state.error = f"{name}: {exc}"
+            logger.exception("warmup.failed step=%s", name)
+            return False
+        state.steps[name] = round((time.perf_counter() - step_start) * 1000, 3)
+    state.duration_ms = round((time.perf_counter() - start) * 1000, 3)
+    state.ready = True
+    logger.info("warmup.ready duration_ms=%.1f", state.duration_ms)
+    return True
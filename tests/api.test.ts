@@ -461,6 +461,26 @@ describe('Debug Endpoints', () => {
     expect(res.data).toHaveProperty('fibonacci_35');
   });
 
+  it('should not block other requests during a latency spike', async () => {
+    const spike = axios.get(`${API_URL}/api/debug/latency-spike`, { params: { duration: 2 } });
+    const start = Date.now();
+    const health = await axios.get(`${API_URL}/health`);
+
+    expect(health.status).toBe(200);
+    expect(Date.now() - start).toBeLessThan(1000);
+    expect((await spike).data.delay_seconds).toBe(2);
+  });
+
+  it('should honour intensity and parallelism on /api/debug/cpu-load', async () => {
+    const res = await axios.get(`${API_URL}/api/debug/cpu-load`, {
+      params: { intensity: 20, parallelism: 2 },
+    });
+
+    expect(res.status).toBe(200);
+    expect(res.data.fibonacci_20).toBe(6765);
+    expect(res.data.parallelism).toBe(2);
+  });
+
   it('should return metrics as text/plain on /api/debug/metrics', async () => {
     const res = await axios.get(`${API_URL}/api/debug/metrics`);
 
@@ -527,3 +547,216 @@ describe('Atomic Profile Setup', () => {
     expect(got.data.notes).toBe('');
   });
 });
+
+// ---------------------------------------------------------------------------
+// Order history pagination — GET /api/orders?limit=&cursor=
+// ---------------------------------------------------------------------------
+describe('Order History Pagination', () => {
+  it('walks the history page by page via next_cursor, oldest first', async () => {
+    const token = await login('standard_user');
+    const headers = { Authorization: `Bearer ${token}` };
+
+    const created: string[] = [];
+    for (let i = 0; i < 3; i++) {
+      const res = await axios.post(
+        `${API_URL}/api/checkout`,
+        {
+          country_code: 'MX',
+          items: [{ pizza_id: 'p01', quantity: 1 }],
+          name: 'Test User',
+          address: 'Test Address 123',
+          phone: '5512345678',
+          colonia: 'Test Colonia',
+        },
+        { headers },
+      );
+      created.push(res.data.order_id);
+    }
+
+    const seen: string[] = [];
+    let cursor: string | null = null;
+    do {
+      const params: Record<string, string | number> = { limit: 2 };
+      if (cursor) params.cursor = cursor;
+      const res = await axios.get(`${API_URL}/api/orders`, { headers, params });
+      expect(res.status).toBe(200);
+      expect(res.data.orders.length).toBeLessThanOrEqual(2);
+      seen.push(...res.data.orders.map((o: { order_id: string }) => o.order_id));
+      cursor = res.data.next_cursor;
+    } while (cursor);
+
+    // The three new orders are the tail of the history, in creation order.
+    expect(seen.slice(-3)).toEqual(created);
+  });
+
+  it('rejects a malformed cursor with 400', async () => {
+    const token = await login('standard_user');
+    try {
+      await axios.get(`${API_URL}/api/orders`, {
+        headers: { Authorization: `Bearer ${token}` },
+        params: { limit: 2, cursor: 'not-a-cursor' },
+      });
+      expect.unreachable('Should have thrown');
+    } catch (err) {
+      const error = err as AxiosError;
+      expect(error.response?.status).toBe(400);
+    }
+  });
+});
+
+// ---------------------------------------------------------------------------
+// Batch checkout — POST /api/checkout/batch
+// ---------------------------------------------------------------------------
+describe('POST /api/checkout/batch', () => {
+  it('creates valid entries and reports per-entry failures', async () => {
+    const token = await login('standard_user');
+    const order = {
+      country_code: 'MX',
+      items: [{ pizza_id: 'p01', quantity: 1 }],
+      name: 'Test User',
+      address: 'Test Address 123',
+      phone: '5512345678',
+      colonia: 'Test Colonia',
+    };
+
+    const res = await axios.post(
+      `${API_URL}/api/checkout/batch`,
+      { orders: [order, { ...order, colonia: undefined }, order] },
+      { headers: { Authorization: `Bearer ${token}`, 'Content-Type': 'application/json' } },
+    );
+
+    expect(res.status).toBe(200);
+    expect(res.data.created).toBe(2);
+    expect(res.data.failed).toBe(1);
+    expect(res.data.results.map((r: { status_code: number }) => r.status_code)).toEqual([200, 400, 200]);
+    expect(res.data.results[0].order).toHaveProperty('order_id');
+    expect(res.data.results[1].error).toContain('colonia');
+  });
+});
+
+// ---------------------------------------------------------------------------
+// Price quote — POST /api/quote (no order is created)
+// ---------------------------------------------------------------------------
+describe('POST /api/quote', () => {
+  it('returns the same totals checkout charges, with per-item prices', async () => {
+    const token = await login('standard_user');
+    const headers = { Authorization: `Bearer ${token}`, 'Content-Type': 'application/json' };
+    const items = [{ pizza_id: 'p01', quantity: 2, size: 'large', toppings: ['bacon'] }];
+
+    const quote = await axios.post(
+      `${API_URL}/api/quote`,
+      { country_code: 'MX', items, tip_percentage: 10 },
+      { headers },
+    );
+    expect(quote.status).toBe(200);
+    expect(quote.data).not.toHaveProperty('order_id');
+    expect(quote.data.items).toHaveLength(1);
+    expect(quote.data.items[0].line_total).toBeCloseTo(quote.data.items[0].unit_price * 2, 2);
+
+    const order = await axios.post(
+      `${API_URL}/api/checkout`,
+      {
+        country_code: 'MX',
+        items,
+        name: 'Test User',
+        address: 'Test Address 123',
+        phone: '5512345678',
+        colonia: 'Test Colonia',
+        propina: 10,
+      },
+      { headers },
+    );
+    for (const key of ['subtotal', 'delivery_fee', 'tax', 'tip', 'total']) {
+      expect(quote.data[key]).toBe(order.data[key]);
+    }
+  });
+});
+
+// ---------------------------------------------------------------------------
+// Conditional GET — ETag / If-None-Match
+// ---------------------------------------------------------------------------
+describe('Conditional GET (ETag)', () => {
+  const accept304 = { validateStatus: (s: number) => s === 200 || s === 304 };
+
+  it('answers 304 for an unchanged catalog and countries list', async () => {
+    const token = await login('standard_user');
+    const headers = { Authorization: `Bearer ${token}`, 'X-Country-Code': 'US' };
+
+    for (const [path, h] of [['/api/countries', {}], ['/api/pizzas', headers]] as const) {
+      const first = await axios.get(`${API_URL}${path}`, { headers: h });
+      expect(first.headers.etag).toBeTruthy();
+      expect(first.headers['cache-control']).toBeTruthy();
+
+      const again = await axios.get(`${API_URL}${path}`, {
+        headers: { ...h, 'If-None-Match': first.headers.etag },
+        ...accept304,
+      });
+      expect(again.status).toBe(304);
+    }
+  });
+
+  it('changes the cart ETag when the cart is re-seeded', async () => {
+    const token = await login('standard_user');
+    const headers = { Authorization: `Bearer ${token}`, 'X-Country-Code': 'MX' };
+    await axios.post(`${API_URL}/api/cart`, { items: [{ pizza_id: 'p01', quantity: 1 }] }, { headers });
+
+    const first = await axios.get(`${API_URL}/api/cart`, { headers });
+    await axios.post(`${API_URL}/api/cart`, { items: [{ pizza_id: 'p02', quantity: 2 }] }, { headers });
+    const after = await axios.get(`${API_URL}/api/cart`, {
+      headers: { ...headers, 'If-None-Match': first.headers.etag },
+      ...accept304,
+    });
+    expect(after.status).toBe(200);
+    expect(after.headers.etag).not.toBe(first.headers.etag);
+  });
+});
+
+// ---------------------------------------------------------------------------
+// Order export — GET /api/orders/export (NDJSON stream)
+// ---------------------------------------------------------------------------
+describe('GET /api/orders/export', () => {
+  it('streams one order per line and filters by country', async () => {
+    const token = await login('standard_user');
+    const headers = { Authorization: `Bearer ${token}` };
+    await axios.post(
+      `${API_URL}/api/checkout`,
+      {
+        country_code: 'US',
+        items: [{ pizza_id: 'p01', quantity: 1 }],
+        name: 'Test User',
+        address: 'Test Address 123',
+        phone: '5551234567',
+        zip_code: '90210',
+      },
+      { headers },
+    );
+
+    const res = await axios.get(`${API_URL}/api/orders/export`, {
+      headers,
+      params: { country: 'US' },
+      responseType: 'text',
+    });
+    expect(res.status).toBe(200);
+    expect(res.headers['content-type']).toContain('application/x-ndjson');
+
+    const orders = (res.data as string).trim().split('\n').map((line) => JSON.parse(line));
+    expect(orders.length).toBeGreaterThan(0);
+    for (const order of orders) {
+      expect(order.country_code).toBe('US');
+      expect(order).toHaveProperty('order_id');
+    }
+  });
+
+  it('rejects an empty date range', async () => {
+    const token = await login('standard_user');
+    try {
+      await axios.get(`${API_URL}/api/orders/export`, {
+        headers: { Authorization: `Bearer ${token}` },
+        params: { since: '2026-01-02T00:00:00', until: '2026-01-01T00:00:00' },
+      });
+      expect.unreachable('Should have thrown');
+    } catch (error: any) {
+      expect(error.response.status).toBe(400);
+    }
+  });
+});